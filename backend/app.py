@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.utils import secure_filename
@@ -6,9 +6,24 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import time
 import json
-import PyPDF2
-import re
 import secrets
+import threading
+from scheduler import (
+    ENGINES, MAX_OPTIONS, MAX_TOTAL_SECTIONS, SLOT_TABLE, generate_options, offset_sections, parse_integer,
+    profile_generation, validate_instructors, validate_slot, with_rationales
+)
+from schedule_optimizer import MAX_TIME_BUDGET_MS
+from jobs import DONE, JobQueueFull
+from schedule_jobs import ScheduleJobManager
+from schedule_repair import repair_option
+from schedule_cache import ResultCache, is_cacheable, request_key
+from schedule_ranking import MAX_CANDIDATES, generate_ranked
+from schedule_store import DEFAULT_PAGE_SIZE, OptionStore, option_summary, page_classes
+from schedule_simulation import MAX_CHANGES, TimetableSnapshot
+from conflict_index import MAX_BATCH_CHECKS, ConflictIndex, validate_candidate
+from calendar_parser import EventJsonWriter
+from calendar_store import CalendarStore
+from calendar_jobs import CalendarJob, CalendarJobManager
 
 app = Flask(__name__)
 
@@ -36,6 +51,9 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Uploaded PDFs by content hash, with their parsed events
+calendar_store = CalendarStore(UPLOAD_FOLDER)
+
 db = SQLAlchemy(app)
 
 # Add CORS headers to all responses
@@ -143,151 +161,62 @@ class ClassItem(db.Model):
             "enrolled": self.enrolled
         }
 
-def categorize_event(title):
-    """Categorize event based on title keywords"""
-    title_lower = title.lower()
-    
-    event_keywords = {
-        'holiday': ['holiday', 'eid', 'independence', 'victory', 'martyrs', 'pohela boishakh', 'durga puja', 'christmas', 'new year'],
-        'exam': ['exam', 'final', 'midterm', 'mid-term', 'assessment', 'test'],
-        'advising': ['advising', 'advisor', 'counseling', 'guidance', 'academic planning'],
-        'evaluation': ['evaluation', 'survey', 'feedback', 'course evaluation', 'faculty evaluation', 'teaching evaluation'],
-        'registration': ['registration', 'enroll', 'add/drop', 'course selection', 'add drop', 'section change'],
-        'break': ['break', 'recess', 'vacation', 'intersession', 'no classes']
-    }
-    
-    for event_type, keywords in event_keywords.items():
-        if any(keyword in title_lower for keyword in keywords):
-            return event_type
-    
-    return 'other'
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def parse_events_from_text(text):
-    """Parse events from extracted PDF text"""
-    events = []
-    lines = text.split('\n')
+def receive_calendar_upload():
+    """
+    Validate the request's PDF and add it to the calendar store.
+
+    Returns:
+        tuple: (content hash, stored path, True if the PDF was already stored)
+
+    Raises:
+        ValueError: no file, or not a PDF
+    """
+    if 'file' not in request.files:
+        raise ValueError("No file provided")
     
-    # Abbreviated month map
-    month_abbr_map = {
-        'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04',
-        'may': '05', 'jun': '06', 'jul': '07', 'aug': '08',
-        'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12'
-    }
+    file = request.files['file']
     
-    # Full month map
-    month_map = {
-        'january': '01', 'february': '02', 'march': '03', 'april': '04',
-        'may': '05', 'june': '06', 'july': '07', 'august': '08',
-        'september': '09', 'october': '10', 'november': '11', 'december': '12'
-    }
+    if file.filename == '':
+        raise ValueError("No file selected")
     
-    for line in lines:
-        line = line.strip()
-        if not line or len(line) < 5:
-            continue
-        
-        found_date = None
-        title = line
-        day_of_week = None
-        
-        # Pattern 1: "6-Sep-25 Saturday" format (MAIN FORMAT IN NSU PDF)
-        match1 = re.search(r'(\d{1,2})-(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)-(\d{2})\s+(\w+)\s+(.+)', line, re.IGNORECASE)
-        if match1:
-            day = match1.group(1).zfill(2)
-            month = month_abbr_map[match1.group(2).lower()]
-            year = f"20{match1.group(3)}"
-            day_of_week = match1.group(4)
-            title = match1.group(5).strip()
-            found_date = f"{year}-{month}-{day}"
-        
-        # Pattern 2: "15 January 2025"
-        if not found_date:
-            match2 = re.search(r'(\d{1,2})\s+(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})', line, re.IGNORECASE)
-            if match2:
-                day = match2.group(1).zfill(2)
-                month = month_map[match2.group(2).lower()]
-                year = match2.group(3)
-                found_date = f"{year}-{month}-{day}"
-                title = line.replace(match2.group(0), '').strip()
-        
-        if found_date and title:
-            title = re.sub(r'\s+', ' ', title)
-            title = title.strip()
-            
-            if title and len(title) > 2 and len(title) < 300:
-                event_type = categorize_event(title)
-                
-                event = {
-                    'date': found_date,
-                    'title': title,
-                    'type': event_type,
-                    'dayOfWeek': day_of_week if day_of_week else ''
-                }
-                events.append(event)
-    
-    return events
-
-def parse_pdf_calendar(pdf_path):
-    """Extract academic calendar events from PDF"""
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from all pages
-            full_text = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                full_text += page_text + "\n"
-        
-        # Parse events from text
-        events = parse_events_from_text(full_text)
-        
-        return events
-        
-    except Exception as e:
-        print(f"Error parsing PDF: {e}")
-        return []
+    if not allowed_file(file.filename):
+        raise ValueError("Only PDF files are allowed")
+    
+    # Hash the upload while it streams to disk; a known PDF keeps its existing copy
+    print(f"Storing upload: {secure_filename(file.filename)}")
+    return calendar_store.save(file.stream)
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def extracted_events_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_events.json')
 
 @app.route("/api/upload-calendar", methods=["POST"])
 def upload_calendar():
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({"error": "Only PDF files are allowed"}), 400
-        
-        # Generate secure filename with timestamp
-        filename = secure_filename(file.filename)
-        timestamp = os.path.splitext(filename)[0] + "_" + str(int(time.time())) + ".pdf"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], timestamp)
-        
-        # Save the file
-        file.save(filepath)
+        try:
+            digest, filepath, duplicate = receive_calendar_upload()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        filename = os.path.basename(filepath)
         
-        # Parse the PDF and extract events
+        # Parse the PDF page by page, or replay the cached events of a known one,
+        # writing events to the JSON file as they are found
         print(f"Parsing PDF: {filepath}")
-        extracted_events = parse_pdf_calendar(filepath)
-        
-        # Save extracted events to JSON file
-        json_filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_events.json')
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(extracted_events, f, indent=2, ensure_ascii=False)
+        json_filepath = extracted_events_path()
+        with EventJsonWriter(json_filepath) as writer:
+            extracted_events, cached = calendar_store.parse(digest, sink=writer)
         
         print(f"Extracted {len(extracted_events)} events and saved to {json_filepath}")
         
         return jsonify({
             "message": "PDF uploaded successfully!",
-            "filename": timestamp,
+            "filename": filename,
             "filepath": filepath,
+            "contentHash": digest,
+            "duplicate": duplicate,
+            "cached": cached,
             "eventsExtracted": len(extracted_events),
             "eventsFile": "extracted_events.json",
             "events": extracted_events
@@ -297,9 +226,64 @@ def upload_calendar():
         print(f"Upload error: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ============ CALENDAR PARSE JOBS API ============
+
+calendar_jobs = CalendarJobManager()
+
+@app.route("/api/calendar-jobs", methods=["POST"])
+def submit_calendar_job():
+    """Store an uploaded PDF and parse it in the background; returns the job ID at once"""
+    try:
+        digest, filepath, duplicate = receive_calendar_upload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Upload error: {e}")
+        return jsonify({"error": str(e)}), 500
+    
+    job = CalendarJob(calendar_store, digest, os.path.basename(filepath), duplicate, extracted_events_path())
+    try:
+        calendar_jobs.submit_job(job)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    
+    return jsonify(job.to_dict()), 202
+
+@app.route("/api/calendar-jobs/<job_id>", methods=["GET"])
+def get_calendar_job(job_id):
+    """
+    Job status and progress with the events found so far.
+
+    Pass ?offset=N to receive only the events after the first N; the
+    response's nextOffset is the offset to ask for next.
+    """
+    job = calendar_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    offset = max(0, request.args.get('offset', 0, type=int))
+    result = job.to_dict()
+    events = job.events[offset:]
+    result["events"] = events
+    result["nextOffset"] = offset + len(events)
+    return jsonify(result), 200
+
+@app.route("/api/calendar-jobs/<job_id>/stream", methods=["GET"])
+def stream_calendar_job(job_id):
+    """NDJSON stream of progress and calendar events as soon as they are found"""
+    job = calendar_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    def generate():
+        for event in calendar_jobs.stream(job):
+            yield json.dumps(event) + "\n"
+    
+    return Response(generate(), mimetype="application/x-ndjson")
+
 @app.route("/api/academic-events", methods=["GET"])
 def get_academic_events():
-    json_filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_events.json')
+    json_filepath = extracted_events_path()
     if os.path.exists(json_filepath):
         try:
             with open(json_filepath, 'r', encoding='utf-8') as f:
@@ -320,425 +304,608 @@ def save_academic_events():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def integer_field(data, key, default=None):
+    """
+    Read an optional integer from a request body.
+
+    Args:
+        data: request JSON
+        key: field name
+        default: value used when the field is missing or null
+
+    Returns:
+        int: the field's value, or default
+    """
+    return parse_integer(data.get(key), key, default)
+
+def parse_generation_request(data):
+    """Validate a schedule generation request body; raises ValueError with a message for the client"""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    instructors = validate_instructors(data.get('instructors'))
+    
+    total_sections = integer_field(data, 'totalSections', 1)
+    if total_sections < 1 or total_sections > MAX_TOTAL_SECTIONS:
+        raise ValueError(f"totalSections must be between 1 and {MAX_TOTAL_SECTIONS}")
+    
+    num_options = integer_field(data, 'numOptions', 3)
+    if num_options < 1 or num_options > MAX_OPTIONS:
+        raise ValueError(f"numOptions must be between 1 and {MAX_OPTIONS}")
+    
+    engine = data.get('engine', 'greedy')
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of: {', '.join(ENGINES)}")
+    
+    time_budget_ms = integer_field(data, 'timeBudgetMs', 0)
+    if time_budget_ms < 0 or time_budget_ms > MAX_TIME_BUDGET_MS:
+        raise ValueError(f"timeBudgetMs must be between 0 and {MAX_TIME_BUDGET_MS}")
+    
+    # Ranked mode: build this many candidates and return the best numOptions
+    candidates = integer_field(data, 'candidates')
+    if candidates is not None:
+        if candidates < num_options or candidates > MAX_CANDIDATES:
+            raise ValueError(f"candidates must be between numOptions and {MAX_CANDIDATES}")
+    
+    # A seed makes the run reproducible; without one a fresh seed is drawn
+    seed = integer_field(data, 'seed')
+    
+    return {
+        "instructors": instructors,
+        "total_sections": total_sections,
+        "num_options": num_options,
+        "candidates": candidates,
+        "seed": seed,
+        "engine": engine,
+        "time_budget_ms": time_budget_ms,
+        "stats": bool(data.get('stats', False)),
+        "warm_start": bool(data.get('warmStart', False)),
+        "store": bool(data.get('store', False))
+    }
+
+def apply_warm_start(params):
+    """
+    Build around the committed timetable instead of an empty one.
+
+    Reads ClassItem and the booked InstructorTimetable rows in one query each,
+    passes them to the engines as fixed classes (their rooms and instructors
+    are booked before anything is placed) and reduces totalSections to the
+    sections the requested courses are still missing. New sections are
+    numbered after the highest committed one.
+
+    Returns:
+        dict: summary of what was loaded, for the response
+    """
+    classes = db.session.query(
+        ClassItem.courseCode, ClassItem.section, ClassItem.faculty,
+        ClassItem.days, ClassItem.time, ClassItem.room
+    ).all()
+    blocks = db.session.query(
+        InstructorTimetable.instructor_name, InstructorTimetable.days, InstructorTimetable.time_slot
+    ).filter(InstructorTimetable.is_available == False).all()
+    
+    fixed = {(faculty, days, time_slot, room) for _, _, faculty, days, time_slot, room in classes}
+    fixed.update((name, days, time_slot, None) for name, days, time_slot in blocks)
+    
+    courses = {inst.get('courseCode') for inst in params["instructors"]}
+    sections = {(code, section) for code, section, *_ in classes if code in courses}
+    numbers = [int(section) for _, section in sections if str(section).isdigit()]
+    missing = max(0, int(params["total_sections"]) - len(sections))
+    
+    # Sorted so the same timetable always gives the same cache key
+    params["fixed"] = sorted(fixed, key=lambda f: (f[0], f[1], f[2], f[3] or ""))
+    params["total_sections"] = missing
+    params["section_offset"] = max(numbers, default=0)
+    return {
+        "committedClasses": len(classes),
+        "unavailableBlocks": len(blocks),
+        "existingSections": len(sections),
+        "missingSections": missing
+    }
+
+schedule_cache = ResultCache()
+
+def wants_rationales():
+    """?rationale=1 asks for a rationale on every placed class of the returned options"""
+    return request.args.get('rationale', '0') in ('1', 'true')
+
+def options_response(options, rationale):
+    """Options as sent to the client; rationales are only built here, and only when asked for"""
+    if not rationale:
+        return options
+    return [dict(option, classes=with_rationales(option["classes"])) for option in options]
+
 @app.route("/api/generate-schedule", methods=["POST"])
 def generate_schedule():
-    import random
-    
     try:
-        data = request.json
-        instructors = data.get('instructors', [])
-        total_sections = data.get('totalSections', 1)
+        try:
+            params = parse_generation_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        if not instructors:
-            return jsonify({"error": "No instructor data provided"}), 400
-
-        # Regular classroom resources (non-lab rooms)
-        theory_rooms = [
-            'NAC210', 'NAC302', 'NAC411', 'NAC510', 'NAC612',
-            'SAC201', 'SAC304', 'SAC402', 'SAC505'
-        ]
+        warm_start = apply_warm_start(params) if params["warm_start"] else None
+        params["rationale"] = wants_rationales()
         
-        # Lab rooms (LIB prefix) - only for lab classes
-        lab_rooms = [
-            'LIB601', 'LIB602', 'LIB603', 'LIB604', 'LIB605',
-            'LIB606', 'LIB607', 'LIB608'
-        ]
+        # Seeded requests whose searches never stop on the clock give the same
+        # response every time, so it is cached; stats requests always run to
+        # measure a real generation, and stored runs need a schedule ID of their own
+        cache_key = None
+        if is_cacheable(params) and not params["stats"] and not params["store"]:
+            cache_key = request_key(params)
+            body = schedule_cache.get(cache_key)
+            if body is not None:
+                return Response(body, status=200, mimetype="application/json", headers={"X-Cache": "HIT"})
         
-        # Theory class time slots (1.5 hour slots)
-        time_slots = [
-            '08:00 AM - 09:30 AM',
-            '09:40 AM - 11:10 AM',
-            '11:20 AM - 12:50 PM',
-            '01:00 PM - 02:30 PM',
-            '02:40 PM - 04:10 PM',
-            '04:20 PM - 05:50 PM'
-        ]
+        # Options are independent, so they are built on the worker pool
+        started = time.perf_counter()
+        if params["candidates"]:
+            generated_schedules, seed = generate_ranked(
+                params["instructors"],
+                params["total_sections"],
+                params["candidates"],
+                params["num_options"],
+                seed=params["seed"],
+                engine=params["engine"],
+                time_budget_ms=params["time_budget_ms"],
+                stats=params["stats"],
+                fixed=params.get("fixed")
+            )
+        else:
+            generated_schedules, seed = generate_options(
+                params["instructors"],
+                params["total_sections"],
+                params["num_options"],
+                seed=params["seed"],
+                engine=params["engine"],
+                time_budget_ms=params["time_budget_ms"],
+                stats=params["stats"],
+                fixed=params.get("fixed")
+            )
         
-        # Lab time slots (3-hour slots)
-        lab_time_slots = [
-            '08:00 AM - 11:10 AM',
-            '09:40 AM - 12:50 PM',
-            '11:20 AM - 02:30 PM',
-            '12:50 PM - 04:10 PM',
-            '02:40 PM - 05:50 PM'
-        ]
+        result = {"schedules": generated_schedules, "seed": seed}
+        if params["stats"]:
+            # Taken off the options first so stored summaries do not repeat them
+            result["stats"] = {
+                "wallMs": round((time.perf_counter() - started) * 1000, 3),
+                "options": [option.pop("stats") for option in generated_schedules]
+            }
+        if warm_start:
+            for option in generated_schedules:
+                offset_sections(option, params["section_offset"])
+            result["warmStart"] = warm_start
+        if params["store"]:
+            # Keep the classes here; the client pages through them or commits by ID
+            result["scheduleId"] = schedule_store.put(generated_schedules, seed)
+            result["schedules"] = [option_summary(option) for option in generated_schedules]
+        else:
+            result["schedules"] = options_response(generated_schedules, params["rationale"])
+        if cache_key and is_cacheable(params, generated_schedules):
+            body = json.dumps(result)
+            schedule_cache.put(cache_key, body)
+            return Response(body, status=200, mimetype="application/json", headers={"X-Cache": "MISS"})
+        return jsonify(result), 200
         
-        # Single days for labs
-        single_days = ['S', 'M', 'T', 'W', 'R', 'A']
+    except Exception as e:
+        print(f"Algorithm Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/generate-schedule/profile", methods=["POST"])
+def profile_schedule():
+    """Run a generation request serially under the profiler; same body as /api/generate-schedule"""
+    try:
+        try:
+            params = parse_generation_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Theory day patterns
-        days = ['ST', 'MW', 'RA']
+        warm_start = apply_warm_start(params) if params["warm_start"] else None
         
-        generated_schedules = []
+        started = time.perf_counter()
+        generated_schedules, seed, hot_functions = profile_generation(
+            params["instructors"],
+            params["total_sections"],
+            params["num_options"],
+            seed=params["seed"],
+            engine=params["engine"],
+            time_budget_ms=params["time_budget_ms"],
+            fixed=params.get("fixed")
+        )
+        if warm_start:
+            for option in generated_schedules:
+                offset_sections(option, params["section_offset"])
         
-        # Generate 3 different options
-        for option_num in range(1, 4):
-            schedule_classes = []
-            used_theory_slots = set()  # (day, time, room) for theory classes
-            used_lab_slots = set()     # (day, time, room) for lab classes
-            
-            # Shuffle instructors to get different results each time
-            current_instructors = instructors.copy()
-            random.shuffle(current_instructors)
-            
-            # Use sequential section numbers
-            section_counter = 1
-            
-            # Track instructor schedules: {instructor_name: set( (day, time) ) }
-            instructor_schedules = {}
-            # Track assigned sections count
-            instructor_workload = {}
-            # Track primary assigned day pattern per instructor
-            instructor_primary_day = {}
-            
-            for inst in instructors:
-                name = inst.get('name')
-                instructor_schedules[name] = set()
-                instructor_workload[name] = 0
-                instructor_primary_day[name] = None
-            
-            # Queue for Round Robin distribution
-            instructor_queue = current_instructors.copy()
-            
-            # Limit iterations to prevent infinite loops
-            max_attempts = total_sections * 10 
-            attempts = 0
-            
-            # Track lab conflicts
-            lab_conflict_count = 0
-            lab_conflict_messages = []
-            
-            while section_counter <= total_sections and attempts < max_attempts:
-                attempts += 1
-                
-                if not instructor_queue:
-                    break
-                
-                inst = instructor_queue.pop(0)
-                
-                max_sections = int(inst.get('maxSections', 3))
-                current_load = instructor_workload.get(inst.get('name'), 0)
-                
-                if current_load >= max_sections:
-                    continue
-
-                instructor_queue.append(inst)
-                
-                section_num = section_counter
-                section_str = f"{section_num:02d}"
-                
-                assigned = False
-                name = inst.get('name', 'Unknown')
-                course = inst.get('courseCode', 'Unknown')
-                pref_days = inst.get('preferredDays', [])
-                pref_times = inst.get('availableTimes', [])
-                
-                # Lab configuration
-                has_lab = inst.get('hasLab', False)
-                lab_days_pref = inst.get('labDays', [])
-                lab_times_pref = inst.get('labTimes', [])
-                
-                inst_schedule = instructor_schedules.get(name, set())
-                
-                target_days = pref_days if pref_days else days
-                target_times = pref_times if pref_times else time_slots
-                
-                primary_day = instructor_primary_day.get(name)
-                
-                tier1_slots = []
-                tier2_slots = []
-                
-                for d in target_days:
-                    for t in target_times:
-                        if primary_day and d == primary_day:
-                            tier1_slots.append((d, t))
-                        else:
-                            tier2_slots.append((d, t))
-                
-                existing_times = [t for d, t in inst_schedule if d == primary_day]
-                if existing_times and tier1_slots:
-                    time_map = {t: i for i, t in enumerate(time_slots)}
-                    existing_indices = [time_map.get(t, 0) for t in existing_times]
-                    tier1_slots.sort(key=lambda slot: min(abs(time_map.get(slot[1], 0) - idx) for idx in existing_indices) if existing_indices else 0)
-                else:
-                    random.shuffle(tier1_slots)
-                
-                random.shuffle(tier2_slots)
-                
-                possible_slots = tier1_slots + tier2_slots
-                
-                # Try to find a room & time for theory class
-                for day_val, time_val in possible_slots:
-                    if assigned: break
-                    
-                    if (day_val, time_val) in inst_schedule:
-                        continue
-                    
-                    current_rooms = theory_rooms.copy()
-                    random.shuffle(current_rooms)
-                        
-                    for r in current_rooms:
-                        if (day_val, time_val, r) not in used_theory_slots:
-                            # Assign theory class
-                            used_theory_slots.add((day_val, time_val, r))
-                            inst_schedule.add((day_val, time_val))
-                            instructor_workload[name] = instructor_workload.get(name, 0) + 1
-                            
-                            if not instructor_primary_day[name]:
-                                instructor_primary_day[name] = day_val
-                                
-                            schedule_classes.append({
-                                "courseCode": course,
-                                "section": section_str,
-                                "faculty": name,
-                                "days": day_val,
-                                "time": time_val,
-                                "room": r,
-                                "type": "theory",
-                                "rationale": f"Matched {day_val} {time_val}"
-                            })
-                            assigned = True
-                            
-                            # If instructor has lab enabled, schedule lab class with same section
-                            if has_lab:
-                                lab_assigned = False
-                                lab_target_days = lab_days_pref if lab_days_pref else single_days
-                                lab_target_times = lab_times_pref if lab_times_pref else lab_time_slots
-                                
-                                # Shuffle for variety
-                                lab_day_list = list(lab_target_days)
-                                lab_time_list = list(lab_target_times)
-                                random.shuffle(lab_day_list)
-                                random.shuffle(lab_time_list)
-                                
-                                lab_conflict_reason = None
-                                
-                                for lab_day in lab_day_list:
-                                    if lab_assigned: break
-                                    for lab_time in lab_time_list:
-                                        if lab_assigned: break
-                                        
-                                        # Use comprehensive validation for instructor availability
-                                        # This checks:
-                                        # 1. Instructor doesn't have theory class during lab time
-                                        # 2. Instructor doesn't have another lab at same time
-                                        # 3. Handles overlapping time slots (3-hour labs vs 1.5-hour theory)
-                                        is_available, conflict_msg = validate_instructor_availability_for_lab(
-                                            name, 
-                                            inst_schedule, 
-                                            lab_day, 
-                                            lab_time, 
-                                            schedule_classes
-                                        )
-                                        
-                                        if not is_available:
-                                            lab_conflict_reason = conflict_msg
-                                            continue
-                                        
-                                        # Try to find available lab room
-                                        available_lab_rooms = lab_rooms.copy()
-                                        random.shuffle(available_lab_rooms)
-                                        
-                                        for lab_room in available_lab_rooms:
-                                            if (lab_day, lab_time, lab_room) not in used_lab_slots:
-                                                # Assign lab class
-                                                used_lab_slots.add((lab_day, lab_time, lab_room))
-                                                inst_schedule.add((lab_day, lab_time))
-                                                
-                                                schedule_classes.append({
-                                                    "courseCode": f"{course}L",  # Add "L" suffix for lab
-                                                    "section": section_str,      # Same section as theory
-                                                    "faculty": name,             # Same faculty
-                                                    "days": lab_day,
-                                                    "time": lab_time,
-                                                    "room": lab_room,
-                                                    "type": "lab",
-                                                    "rationale": f"Lab for {course} section {section_str}"
-                                                })
-                                                lab_assigned = True
-                                                break
-                                
-                                # If lab couldn't be assigned, add conflict entry with detailed reason
-                                if not lab_assigned:
-                                    lab_conflict_count += 1
-                                    conflict_detail = lab_conflict_reason or "No available lab room/time slot"
-                                    lab_conflict_messages.append(f"Could not schedule lab for {course} section {section_str}: {conflict_detail}")
-                                    schedule_classes.append({
-                                        "courseCode": f"{course}L",
-                                        "section": section_str,
-                                        "faculty": name,
-                                        "days": "TBD",
-                                        "time": "TBD",
-                                        "room": "TBD",
-                                        "type": "lab",
-                                        "conflict": True,
-                                        "rationale": conflict_detail
-                                    })
-                            
-                            break
-                            
-                if assigned:
-                    section_counter += 1
-                else:
-                    if inst in instructor_queue:
-                         instructor_queue.pop()
-                    pass
-            
-            # Post-check: If we couldn't fill all sections
-            conflict_count = 0
-            while section_counter <= total_sections:
-                 schedule_classes.append({
-                        "courseCode": "UNASSIGNED",
-                        "section": f"{section_counter:02d}",
-                        "faculty": "Unassigned (No Slots)",
-                        "days": "TBD",
-                        "time": "TBD",
-                        "room": "TBD",
-                        "type": "theory",
-                        "rationale": "Could not find valid slot for any instructor"
-                 })
-                 section_counter += 1
-                 conflict_count += 1
-            
-            # Prepare Workload Summary
-            workload_summary = [{"name": k, "count": v} for k, v in instructor_workload.items()]
-            
-            # Combine conflict messages
-            total_conflicts = conflict_count + lab_conflict_count
-            conflict_message = None
-            if total_conflicts > 0:
-                messages = []
-                if conflict_count > 0:
-                    messages.append(f"Could not schedule {conflict_count} section(s)")
-                if lab_conflict_count > 0:
-                    messages.append(f"Could not schedule {lab_conflict_count} lab(s)")
-                conflict_message = " and ".join(messages) + " due to availability conflicts."
-
-            generated_schedules.append({
-                "option": option_num,
-                "classes": schedule_classes,
-                "conflict": total_conflicts > 0,
-                "conflictCount": total_conflicts,
-                "conflictMessage": conflict_message,
-                "workload": workload_summary
-            })
-            
-        return jsonify({"schedules": generated_schedules}), 200
+        stats = [option.pop("stats") for option in generated_schedules]
+        return jsonify({
+            "schedules": options_response(generated_schedules, wants_rationales()),
+            "seed": seed,
+            "stats": {
+                "wallMs": round((time.perf_counter() - started) * 1000, 3),
+                "options": stats
+            },
+            "profile": hot_functions
+        }), 200
         
     except Exception as e:
-        print(f"Algorithm Error: {e}")
+        print(f"Profiling Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/schedule-cache", methods=["GET"])
+def get_schedule_cache():
+    """Size limits and hit/miss counters of the generation result cache"""
+    return jsonify(schedule_cache.stats()), 200
 
-def parse_time_to_minutes(time_str):
-    """Parse time string like '08:00 AM' to minutes from midnight"""
-    parts = time_str.strip().split()
-    time_part = parts[0]
-    period = parts[1] if len(parts) > 1 else 'AM'
-    
-    hours, minutes = map(int, time_part.split(':'))
-    if period == 'PM' and hours != 12:
-        hours += 12
-    elif period == 'AM' and hours == 12:
-        hours = 0
-    
-    return hours * 60 + minutes
+@app.route("/api/schedule-cache", methods=["DELETE"])
+def clear_schedule_cache():
+    schedule_cache.clear()
+    return jsonify({"message": "Schedule cache cleared"}), 200
+
+# ============ STORED SCHEDULES API ============
+
+schedule_store = OptionStore()
+
+# Serialises commits so one option is never written twice
+commit_lock = threading.Lock()
+
+# Clashes listed in a refused commit's response
+MAX_REPORTED_CONFLICTS = 50
+
+def find_generated_options(schedule_id):
+    """Options of a stored run or of a finished schedule job, or None"""
+    run = schedule_store.get(schedule_id)
+    if run:
+        return run["options"]
+    job = schedule_jobs.get(schedule_id)
+    if job and job.status == DONE:
+        return job.results()
+    return None
 
-def get_time_range(slot):
-    """Get start and end times from a slot like '08:00 AM - 09:30 AM'"""
-    parts = slot.split(' - ')
-    start = parse_time_to_minutes(parts[0])
-    end = parse_time_to_minutes(parts[1])
-    return start, end
+def find_generated_option(schedule_id, option_num):
+    options = find_generated_options(schedule_id)
+    if options is None:
+        return None
+    return next((o for o in options if o["option"] == option_num), None)
 
-def check_time_overlap(time1, time2):
-    """Check if two time slots overlap"""
+@app.route("/api/schedules/<schedule_id>", methods=["GET"])
+def get_stored_schedule(schedule_id):
+    """Summaries of a stored run's options, without their classes"""
+    options = find_generated_options(schedule_id)
+    if options is None:
+        return jsonify({"error": "Schedule not found or expired"}), 404
+    return jsonify({
+        "scheduleId": schedule_id,
+        "schedules": [option_summary(option) for option in options]
+    }), 200
+
+@app.route("/api/schedules/<schedule_id>/<int:option_num>", methods=["GET"])
+def get_stored_option(schedule_id, option_num):
+    """One page of an option's classes; ?offset=&limit=, and ?rationale=0 to leave rationales out"""
+    option = find_generated_option(schedule_id, option_num)
+    if option is None:
+        return jsonify({"error": "Schedule option not found or expired"}), 404
     try:
-        start1, end1 = get_time_range(time1)
-        start2, end2 = get_time_range(time2)
-        
-        # Check for overlap
-        return start1 < end2 and start2 < end1
-    except:
-        return False
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    rationale = request.args.get('rationale', '1') not in ('0', 'false')
+    return jsonify(page_classes(option, offset, limit, rationale)), 200
 
-def check_day_overlap(day1, day2):
+def committed_clashes(classes):
     """
-    Check if two day patterns overlap.
-    Handles both single days (S, M, T, W, R, A) and double day patterns (ST, MW, RA).
-    Returns True if any day in day1 overlaps with any day in day2.
+    Clashes of classes about to be committed with the committed timetable.
+
+    A class clashes when its course already has that section, when its
+    instructor or room is booked over it (ConflictIndex), or when its
+    instructor blocked the slot in InstructorTimetable.
+
+    Returns:
+        list: one dict per clash, naming the class and what it clashes with
     """
-    # Expand double day patterns to individual days
-    def expand_days(day_pattern):
-        if len(day_pattern) == 2:
-            return set(day_pattern)  # 'ST' -> {'S', 'T'}
-        return {day_pattern}  # 'S' -> {'S'}
-    
-    days1 = expand_days(day1)
-    days2 = expand_days(day2)
+    index = get_conflict_index()
+    courses = {cls["courseCode"] for cls in classes}
+    faculty = {cls["faculty"] for cls in classes}
+    sections = set(db.session.query(ClassItem.courseCode, ClassItem.section).filter(ClassItem.courseCode.in_(courses)).all())
+    blocks = {}
+    for name, days, time_slot in db.session.query(
+        InstructorTimetable.instructor_name, InstructorTimetable.days, InstructorTimetable.time_slot
+    ).filter(
+        InstructorTimetable.instructor_name.in_(faculty),
+        InstructorTimetable.is_available == False,
+        InstructorTimetable.course_code == None
+    ).all():
+        blocks.setdefault(name, []).append((days, time_slot, SLOT_TABLE.probe_mask(days, time_slot)))
     
-    # Check if there's any intersection
-    return bool(days1 & days2)
+    clashes = []
+    for cls in classes:
+        label = {"courseCode": cls["courseCode"], "section": cls["section"], "days": cls["days"], "time": cls["time"]}
+        if (cls["courseCode"], cls["section"]) in sections:
+            clashes.append(dict(label, reason="Section already exists"))
+        for key, value in (("faculty", cls["faculty"]), ("room", cls["room"])):
+            for other in index.conflicts(key, value, cls["days"], cls["time"]):
+                clashes.append(dict(label, reason=f"{value} is booked for {other['courseCode']} section {other['section']} on {other['days']} at {other['time']}"))
+        mask = SLOT_TABLE.probe_mask(cls["days"], cls["time"])
+        for days, time_slot, block_mask in blocks.get(cls["faculty"], []):
+            if mask & block_mask:
+                clashes.append(dict(label, reason=f"{cls['faculty']} is unavailable on {days} at {time_slot}"))
+    return clashes
 
-def check_instructor_lab_conflict(instructor_schedule, lab_day, lab_time):
+@app.route("/api/schedules/<schedule_id>/<int:option_num>/commit", methods=["POST"])
+def commit_stored_option(schedule_id, option_num):
     """
-    Check if an instructor has a conflict with a proposed lab slot.
+    Adopt a generated option: write its classes and timetable rows in one transaction.
     
-    Args:
-        instructor_schedule: set of (day, time) tuples representing instructor's current schedule
-        lab_day: the proposed lab day (single day like 'S' or double day like 'ST')
-        lab_time: the proposed lab time slot (e.g., '08:00 AM - 11:10 AM')
-    
-    Returns:
-        tuple: (has_conflict: bool, conflict_details: str or None)
+    Only one option of a run can be committed, and only when none of its
+    classes clashes with the committed timetable; otherwise the response is 409.
     """
-    for existing_day, existing_time in instructor_schedule:
-        # Check if days overlap
-        if check_day_overlap(lab_day, existing_day):
-            # Check if times overlap
-            if check_time_overlap(lab_time, existing_time):
-                return True, f"Conflict with existing class on {existing_day} at {existing_time}"
+    options = find_generated_options(schedule_id)
+    option = next((o for o in options or [] if o["option"] == option_num), None)
+    if option is None:
+        return jsonify({"error": "Schedule option not found or expired"}), 404
     
-    return False, None
+    with commit_lock:
+        committed = next((o["option"] for o in options if o.get("committed")), None)
+        if committed is not None:
+            return jsonify({"error": f"Option {committed} of this schedule has already been committed"}), 409
+        classes = [
+            cls for cls in option["classes"]
+            if cls.get("courseCode") != "UNASSIGNED" and cls.get("days") != "TBD"
+        ]
+        clashes = committed_clashes(classes)
+        if clashes:
+            return jsonify({
+                "error": f"{len(clashes)} class(es) clash with the committed timetable",
+                "conflicts": clashes[:MAX_REPORTED_CONFLICTS]
+            }), 409
+        try:
+            items = []
+            for cls in classes:
+                item = ClassItem(
+                    courseCode=cls["courseCode"],
+                    section=cls["section"],
+                    faculty=cls["faculty"],
+                    room=cls["room"],
+                    time=cls["time"],
+                    days=cls["days"]
+                )
+                db.session.add(item)
+                update_instructor_timetable(
+                    item.faculty, item.days, item.time, item.courseCode, item.section, item.room,
+                    commit=False
+                )
+                items.append(item)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Commit Error: {e}")
+            return jsonify({"error": str(e)}), 500
+        option["committed"] = True
+        record_class_writes(saved=items)
+    
+    return jsonify({
+        "message": "Schedule committed",
+        "scheduleId": schedule_id,
+        "option": option_num,
+        "classesCommitted": len(items),
+        "skipped": len(option["classes"]) - len(items)
+    }), 201
+
+# ============ WHAT-IF SIMULATION API ============
+
+# Committed timetable held in memory for simulations; dropped on every class write
+timetable_snapshot = None
+snapshot_lock = threading.Lock()
+
+def get_timetable_snapshot():
+    """The current TimetableSnapshot, loaded with one query when missing"""
+    global timetable_snapshot
+    with snapshot_lock:
+        if timetable_snapshot is None:
+            timetable_snapshot = TimetableSnapshot([item.to_dict() for item in ClassItem.query.all()])
+        return timetable_snapshot
+
+def invalidate_timetable_snapshot():
+    global timetable_snapshot
+    with snapshot_lock:
+        timetable_snapshot = None
+
+# Overlap index of committed classes per instructor and room, kept in step with every class write
+conflict_index = ConflictIndex()
 
-def validate_instructor_availability_for_lab(instructor_name, instructor_schedule, lab_day, lab_time, all_scheduled_classes):
+def get_conflict_index():
+    """The conflict index, loaded with one query on first use"""
+    with conflict_index.lock:
+        if not conflict_index.loaded:
+            conflict_index.load(item.to_dict() for item in ClassItem.query.all())
+    return conflict_index
+
+def record_class_writes(saved=(), deleted=()):
+    """Bring the in-memory views of ClassItem up to date after a committed write"""
+    invalidate_timetable_snapshot()
+    with conflict_index.lock:
+        if conflict_index.loaded:
+            for class_id in deleted:
+                conflict_index.remove(class_id)
+            for item in saved:
+                conflict_index.put(item.to_dict())
+
+def commit_overlay(overlay):
+    """Write an overlay's changes to ClassItem and InstructorTimetable in one transaction"""
+    try:
+        freed = []
+        saved = []
+        deleted = []
+        for class_id, cls in overlay.changes.items():
+            item = ClassItem.query.get(class_id)
+            old = overlay.snapshot.classes[class_id]
+            freed.append((old["faculty"], old["days"], old["time"]))
+            if cls is None:
+                db.session.delete(item)
+                deleted.append(class_id)
+                continue
+            saved.append(item)
+            item.faculty = cls["faculty"]
+            item.room = cls["room"]
+            item.time = cls["time"]
+            item.days = cls["days"]
+        db.session.flush()
+        
+        # Free every old slot first so a swap does not free what it just booked
+        for faculty, days, time_slot in freed:
+            free_instructor_slot(faculty, days, time_slot, commit=False)
+        for cls in overlay.changes.values():
+            if cls is not None:
+                update_instructor_timetable(
+                    cls["faculty"], cls["days"], cls["time"], cls["courseCode"], cls["section"], cls["room"],
+                    commit=False
+                )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    record_class_writes(saved=saved, deleted=deleted)
+
+@app.route("/api/simulate-schedule", methods=["POST"])
+def simulate_schedule():
     """
-    Comprehensive validation of instructor availability for a lab slot.
+    Apply hypothetical moves, swaps and deletions to the committed timetable
+    in memory and report the conflicts and score change; nothing is written
+    unless "commit" is true and the result is conflict-free.
+    """
+    try:
+        data = request.json or {}
+        changes = data.get('changes', [])
+        if not isinstance(changes, list) or not changes:
+            return jsonify({"error": "No changes provided"}), 400
+        if len(changes) > MAX_CHANGES:
+            return jsonify({"error": f"At most {MAX_CHANGES} changes per simulation"}), 400
+        
+        started = time.perf_counter()
+        overlay = get_timetable_snapshot().overlay()
+        try:
+            for change in changes:
+                overlay.apply(change)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conflicts = overlay.conflicts()
+        before, after, delta = overlay.score_delta()
+        result = {
+            "conflicts": conflicts,
+            "conflictCount": len(conflicts),
+            "scoreBefore": before,
+            "scoreAfter": after,
+            "scoreDelta": delta,
+            "changes": [
+                {"id": class_id, "deleted": cls is None, "class": cls}
+                for class_id, cls in overlay.changes.items()
+            ],
+            "committed": False,
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 3)
+        }
+        
+        if data.get('commit'):
+            if conflicts:
+                return jsonify(dict(result, error="Resolve the conflicts before committing")), 409
+            with commit_lock:
+                # The overlay was built on this snapshot; a write since then replaced it
+                if get_timetable_snapshot() is not overlay.snapshot:
+                    return jsonify(dict(result, error="The timetable changed; run the simulation again")), 409
+                commit_overlay(overlay)
+            result["committed"] = True
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        print(f"Simulation Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# ============ SCHEDULE GENERATION JOBS API ============
+
+schedule_jobs = ScheduleJobManager()
+
+@app.route("/api/schedule-jobs", methods=["POST"])
+def submit_schedule_job():
+    """Start generating schedules in the background; returns the job ID at once"""
+    try:
+        params = parse_generation_request(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if params["candidates"]:
+        return jsonify({"error": "Ranked generation (candidates) is only available from /api/generate-schedule"}), 400
+    if params["warm_start"]:
+        # Read in the request: job threads run outside the app context
+        apply_warm_start(params)
     
-    Checks:
-    1. Instructor doesn't have a theory class during the lab time
-    2. Instructor doesn't have another lab at the same time
-    3. Handles overlapping time slots (3-hour labs vs 1.5-hour theory)
+    try:
+        job = schedule_jobs.submit(params)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     
-    Args:
-        instructor_name: Name of the instructor
-        instructor_schedule: set of (day, time) tuples for this instructor
-        lab_day: Proposed lab day
-        lab_time: Proposed lab time slot
-        all_scheduled_classes: List of all classes scheduled so far in this option
+    return jsonify(job.to_dict()), 202
+
+@app.route("/api/schedule-jobs/<job_id>", methods=["GET"])
+def get_schedule_job(job_id):
+    """Job status and progress; includes the schedules once the job is done (?rationale=1 as for generation)"""
+    job = schedule_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
     
-    Returns:
-        tuple: (is_available: bool, conflict_message: str or None)
-    """
-    # Check 1 & 2: Check against instructor's current schedule (includes both theory and lab)
-    has_conflict, conflict_details = check_instructor_lab_conflict(instructor_schedule, lab_day, lab_time)
-    if has_conflict:
-        return False, f"Instructor {instructor_name} has a conflict: {conflict_details}"
-    
-    # Check 3: Additional check against all scheduled classes for this instructor
-    # This catches any edge cases where the schedule set might not be fully updated
-    for cls in all_scheduled_classes:
-        if cls.get('faculty') == instructor_name:
-            cls_day = cls.get('days', '')
-            cls_time = cls.get('time', '')
-            
-            if check_day_overlap(lab_day, cls_day) and check_time_overlap(lab_time, cls_time):
-                cls_type = cls.get('type', 'theory')
-                return False, f"Instructor {instructor_name} already has a {cls_type} class on {cls_day} at {cls_time}"
-    
-    return True, None
+    result = job.to_dict()
+    if job.status == DONE:
+        result["schedules"] = options_response(job.results(), wants_rationales())
+    return jsonify(result), 200
+
+@app.route("/api/schedule-jobs/<job_id>/stream", methods=["GET"])
+def stream_schedule_job(job_id):
+    """NDJSON stream of progress events and each option as soon as it is built"""
+    job = schedule_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    rationale = wants_rationales()
+    
+    def generate():
+        for event in schedule_jobs.stream(job):
+            if event["event"] == "option":
+                event["option"] = options_response([event["option"]], rationale)[0]
+            yield json.dumps(event) + "\n"
+    
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@app.route("/api/schedule-jobs/<job_id>/cancel", methods=["POST"])
+def cancel_schedule_job(job_id):
+    """Stop a queued or running job"""
+    job = schedule_jobs.cancel(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route("/api/repair-schedule", methods=["POST"])
+def repair_schedule():
+    """Re-place only the sections affected by an instructor or room change"""
+    try:
+        data = request.json or {}
+        schedule = data.get('schedule')
+        if not schedule or 'classes' not in schedule:
+            return jsonify({"error": "No schedule provided"}), 400
+        
+        try:
+            repaired = repair_option(schedule, data.get('instructors', []), data.get('delta', {}))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"schedule": options_response([repaired], wants_rationales())[0]}), 200
+        
+    except Exception as e:
+        print(f"Repair Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
 def seed_admin_users():
     """Seed default admin accounts if they don't exist"""
@@ -895,11 +1062,12 @@ def add_class():
     
     # Update instructor timetable
     update_instructor_timetable(item.faculty, item.days, item.time, item.courseCode, item.section, item.room)
+    record_class_writes(saved=[item])
     
     return jsonify(item.to_dict()), 201
 
-def update_instructor_timetable(instructor_name, days, time_slot, course_code, section, room):
-    """Update or create instructor timetable entry"""
+def update_instructor_timetable(instructor_name, days, time_slot, course_code, section, room, commit=True):
+    """Update or create instructor timetable entry; commit=False leaves the transaction open"""
     existing = InstructorTimetable.query.filter_by(
         instructor_name=instructor_name,
         days=days,
@@ -923,7 +1091,8 @@ def update_instructor_timetable(instructor_name, days, time_slot, course_code, s
         )
         db.session.add(entry)
     
-    db.session.commit()
+    if commit:
+        db.session.commit()
 
 @app.route("/api/classes/bulk", methods=["POST"])
 def add_classes_bulk():
@@ -945,6 +1114,7 @@ def add_classes_bulk():
     # Update instructor timetables
     for item in new_items:
         update_instructor_timetable(item.faculty, item.days, item.time, item.courseCode, item.section, item.room)
+    record_class_writes(saved=new_items)
     
     return jsonify([i.to_dict() for i in new_items]), 201
 
@@ -976,11 +1146,12 @@ def update_class(id):
     
     # Book new slot
     update_instructor_timetable(item.faculty, item.days, item.time, item.courseCode, item.section, item.room)
+    record_class_writes(saved=[item])
     
     return jsonify(item.to_dict()), 200
 
-def free_instructor_slot(instructor_name, days, time_slot):
-    """Free up an instructor's time slot"""
+def free_instructor_slot(instructor_name, days, time_slot, commit=True):
+    """Free up an instructor's time slot; commit=False leaves the transaction open"""
     entry = InstructorTimetable.query.filter_by(
         instructor_name=instructor_name,
         days=days,
@@ -1000,7 +1171,8 @@ def free_instructor_slot(instructor_name, days, time_slot):
             entry.course_code = None
             entry.section = None
             entry.room = None
-            db.session.commit()
+            if commit:
+                db.session.commit()
 
 @app.route("/api/classes/<int:id>", methods=["DELETE"])
 def delete_class(id):
@@ -1016,6 +1188,7 @@ def delete_class(id):
     
     # Free up instructor slot
     free_instructor_slot(faculty, days, time)
+    record_class_writes(deleted=[id])
     
     return jsonify({"message": "Deleted"}), 200
 
@@ -1053,27 +1226,40 @@ def check_instructor_availability():
     days = data.get("days")
     time_slot = data.get("timeSlot")
     exclude_class_id = data.get("excludeClassId")  # For editing existing class
+    room = data.get("room")  # Optional: also check the room
     
     if not instructor_name or not days or not time_slot:
         return jsonify({"error": "Missing required parameters"}), 400
+    try:
+        validate_slot(days, time_slot)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if exclude_class_id is not None:
+        try:
+            exclude_class_id = int(exclude_class_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "excludeClassId must be an integer"}), 400
     
-    # Check if instructor has a class at this time
-    query = ClassItem.query.filter_by(
-        faculty=instructor_name,
-        days=days,
-        time=time_slot
-    )
-    
-    if exclude_class_id:
-        query = query.filter(ClassItem.id != exclude_class_id)
-    
-    existing_class = query.first()
+    # True overlaps: "ST" clashes with "S", a 3-hour lab with the theory slots it spans
+    index = get_conflict_index()
+    conflicts = index.conflicts("faculty", instructor_name, days, time_slot, exclude_class_id)
+    room_conflicts = index.conflicts("room", room, days, time_slot, exclude_class_id) if room else []
     
-    if existing_class:
+    if conflicts:
+        return jsonify({
+            "available": False,
+            "message": f"Instructor is already teaching {conflicts[0]['courseCode']} at this time",
+            "conflictingClass": conflicts[0],
+            "conflictingClasses": conflicts,
+            "roomConflicts": room_conflicts
+        }), 200
+    if room_conflicts:
         return jsonify({
             "available": False,
-            "message": f"Instructor is already teaching {existing_class.courseCode} at this time",
-            "conflictingClass": existing_class.to_dict()
+            "message": f"Room {room} is already used by {room_conflicts[0]['courseCode']} at this time",
+            "conflictingClass": room_conflicts[0],
+            "conflictingClasses": [],
+            "roomConflicts": room_conflicts
         }), 200
     
     return jsonify({
@@ -1081,6 +1267,29 @@ def check_instructor_availability():
         "message": "Instructor is available"
     }), 200
 
+@app.route("/api/check-availability/batch", methods=["POST"])
+def check_availability_batch():
+    """Instructor and room conflicts for many candidate slots in one request"""
+    data = request.json or {}
+    candidates = data.get("candidates")
+    if not isinstance(candidates, list) or not candidates:
+        return jsonify({"error": "No candidates provided"}), 400
+    if len(candidates) > MAX_BATCH_CHECKS:
+        return jsonify({"error": f"At most {MAX_BATCH_CHECKS} candidates per request"}), 400
+    
+    for position, candidate in enumerate(candidates):
+        try:
+            validate_candidate(candidate)
+        except ValueError as e:
+            return jsonify({"error": str(e), "index": position}), 400
+    
+    started = time.perf_counter()
+    results = get_conflict_index().check_batch(candidates)
+    return jsonify({
+        "results": results,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 3)
+    }), 200
+
 @app.route("/api/available-sections/<course_code>", methods=["GET"])
 def get_available_sections(course_code):
     """Get available sections for a course"""
@@ -0,0 +1,197 @@
+"""Throughput benchmark for the calendar text parser.
+
+Builds a seeded synthetic calendar text (both date formats, lines holding
+both, undated header and note lines, titles from every event category),
+parses it with calendar_parser and with the original per-line re.search
+implementation kept below as the reference, checks that both produce the
+same events, and reports lines and events per second.
+
+Usage:
+    python bench_calendar.py                    # 100k lines
+    python bench_calendar.py --lines 1000000 --repeat 5
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import sys
+import time
+
+from calendar_parser import parse_events_from_text
+
+SHORT_MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+LONG_MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December"]
+WEEKDAYS = ["Saturday", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+TITLES = [
+    "First day of classes", "Last day of classes", "Mid-term Examination week",
+    "Final Exams begin", "Eid-ul-Fitr holiday", "Victory Day", "Pohela Boishakh",
+    "Advising for Spring semester", "Online course evaluation", "Faculty evaluation survey",
+    "Registration opens", "Add/Drop period", "Section change deadline", "Semester break",
+    "Intersession", "No classes", "Grade submission deadline", "Convocation rehearsal",
+    "Make-up classes for missed sessions", "Orientation for new students"
+]
+
+FILLER = [
+    "North South University", "Academic Calendar", "Date Day Event",
+    "All dates are subject to change", "Page", "Office of the Registrar", ""
+]
+
+
+def synthetic_text(lines, seed=0):
+    """Calendar-like text of the given line count, the same for the same seed"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        roll = rng.random()
+        day = rng.randint(1, 28)
+        title = rng.choice(TITLES)
+        if roll < 0.45:
+            out.append(f"{day}-{rng.choice(SHORT_MONTHS)}-{rng.randint(24, 27)} {rng.choice(WEEKDAYS)}   {title}")
+        elif roll < 0.65:
+            out.append(f"{day} {rng.choice(LONG_MONTHS)} {rng.randint(2024, 2027)} {title}")
+        elif roll < 0.68:
+            out.append(f"Until {day} {rng.choice(LONG_MONTHS)} 2026, see "
+                       f"{rng.randint(1, 28)}-{rng.choice(SHORT_MONTHS)}-26 {rng.choice(WEEKDAYS)} {title}")
+        else:
+            out.append(f"{rng.choice(FILLER)} {rng.randint(1, 99)}")
+    return "\n".join(out)
+
+
+def reference_categorize_event(title):
+    """categorize_event as originally written, for comparison"""
+    title_lower = title.lower()
+
+    event_keywords = {
+        'holiday': ['holiday', 'eid', 'independence', 'victory', 'martyrs', 'pohela boishakh', 'durga puja', 'christmas', 'new year'],
+        'exam': ['exam', 'final', 'midterm', 'mid-term', 'assessment', 'test'],
+        'advising': ['advising', 'advisor', 'counseling', 'guidance', 'academic planning'],
+        'evaluation': ['evaluation', 'survey', 'feedback', 'course evaluation', 'faculty evaluation', 'teaching evaluation'],
+        'registration': ['registration', 'enroll', 'add/drop', 'course selection', 'add drop', 'section change'],
+        'break': ['break', 'recess', 'vacation', 'intersession', 'no classes']
+    }
+
+    for event_type, keywords in event_keywords.items():
+        if any(keyword in title_lower for keyword in keywords):
+            return event_type
+
+    return 'other'
+
+def reference_parse_events(text):
+    """parse_events_from_text as originally written, for comparison"""
+    events = []
+    lines = text.split('\n')
+
+    month_abbr_map = {
+        'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04',
+        'may': '05', 'jun': '06', 'jul': '07', 'aug': '08',
+        'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12'
+    }
+
+    month_map = {
+        'january': '01', 'february': '02', 'march': '03', 'april': '04',
+        'may': '05', 'june': '06', 'july': '07', 'august': '08',
+        'september': '09', 'october': '10', 'november': '11', 'december': '12'
+    }
+
+    for line in lines:
+        line = line.strip()
+        if not line or len(line) < 5:
+            continue
+
+        found_date = None
+        title = line
+        day_of_week = None
+
+        match1 = re.search(r'(\d{1,2})-(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)-(\d{2})\s+(\w+)\s+(.+)', line, re.IGNORECASE)
+        if match1:
+            day = match1.group(1).zfill(2)
+            month = month_abbr_map[match1.group(2).lower()]
+            year = f"20{match1.group(3)}"
+            day_of_week = match1.group(4)
+            title = match1.group(5).strip()
+            found_date = f"{year}-{month}-{day}"
+
+        if not found_date:
+            match2 = re.search(r'(\d{1,2})\s+(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})', line, re.IGNORECASE)
+            if match2:
+                day = match2.group(1).zfill(2)
+                month = month_map[match2.group(2).lower()]
+                year = match2.group(3)
+                found_date = f"{year}-{month}-{day}"
+                title = line.replace(match2.group(0), '').strip()
+
+        if found_date and title:
+            title = re.sub(r'\s+', ' ', title)
+            title = title.strip()
+
+            if title and len(title) > 2 and len(title) < 300:
+                events.append({
+                    'date': found_date,
+                    'title': title,
+                    'type': reference_categorize_event(title),
+                    'dayOfWeek': day_of_week if day_of_week else ''
+                })
+
+    return events
+
+
+def best_time(parse, text, repeat):
+    """Fastest of repeat runs in seconds, with the events of the last run"""
+    best = None
+    events = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        events = parse(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, events
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calendar text parser")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also write the results here as JSON")
+    args = parser.parse_args(argv)
+
+    text = synthetic_text(args.lines, args.seed)
+    results = {}
+    outputs = {}
+    for name, parse in (("reference", reference_parse_events), ("compiled", parse_events_from_text)):
+        seconds, outputs[name] = best_time(parse, text, args.repeat)
+        results[name] = {
+            "wallMs": round(seconds * 1000, 3),
+            "linesPerSecond": round(args.lines / seconds),
+            "eventsPerSecond": round(len(outputs[name]) / seconds),
+            "events": len(outputs[name])
+        }
+        print(f"{name:10} {results[name]['wallMs']:>10.1f} ms {results[name]['linesPerSecond']:>10} lines/s "
+              f"{results[name]['events']:>8} events")
+
+    speedup = results["reference"]["wallMs"] / results["compiled"]["wallMs"]
+    print(f"speedup    {speedup:.2f}x")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "meta": {
+                    "lines": args.lines,
+                    "seed": args.seed,
+                    "repeat": args.repeat,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+                },
+                "results": results,
+                "speedup": round(speedup, 3)
+            }, f, indent=2)
+
+    if outputs["reference"] != outputs["compiled"]:
+        print("Compiled parser output differs from the reference")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
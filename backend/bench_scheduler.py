@@ -0,0 +1,250 @@
+"""Benchmark harness for the schedule generation engines.
+
+Builds seeded synthetic terms (instructors and rooms) of increasing size,
+runs an engine on each, and records wall time, attempts, conflicts, peak
+memory and throughput. Results are written as JSON and can be compared
+against a stored baseline to catch slowdowns.
+
+Usage:
+    python bench_scheduler.py                       # quick suite, greedy engine
+    python bench_scheduler.py --suite full --engine csp
+    python bench_scheduler.py --baseline bench_baseline.json
+    python bench_scheduler.py --save-baseline bench_baseline.json
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from scheduler import (
+    TIME_SLOTS, LAB_TIME_SLOTS, THEORY_DAYS, SINGLE_DAYS,
+    SlotTable, get_engine
+)
+
+# Section counts per suite; every size is crossed with LAB_RATIOS and TIGHTNESS
+SUITES = {
+    "quick": [10, 100, 500],
+    "full": [10, 100, 500, 1000, 2500, 5000]
+}
+
+# Share of instructors that also teach a lab
+LAB_RATIOS = [0.0, 0.5]
+
+# Share of instructors that restrict their days and times
+TIGHTNESS = [0.0, 0.7]
+
+# Sections each synthetic instructor may take on average
+SECTIONS_PER_INSTRUCTOR = 2.5
+
+# Rooms are sized so the term fits with this much slack
+ROOM_SLACK = 1.25
+
+# Relative wall-time increase reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def make_rooms(total_sections, lab_ratio, slack=ROOM_SLACK):
+    """
+    Synthetic room lists sized for a term.
+
+    Args:
+        total_sections: theory sections in the term
+        lab_ratio: share of sections that carry a lab
+        slack: capacity over the bare minimum
+
+    Returns:
+        tuple: (theory rooms, lab rooms)
+    """
+    theory_capacity = len(THEORY_DAYS) * len(TIME_SLOTS)
+    # Lab slots overlap each other, so a lab room holds about two per day
+    lab_capacity = len(SINGLE_DAYS) * 2
+    theory_count = max(1, math.ceil(total_sections * slack / theory_capacity))
+    lab_count = max(1, math.ceil(total_sections * lab_ratio * slack / lab_capacity))
+    return (
+        [f"BT{i:03d}" for i in range(theory_count)],
+        [f"BL{i:03d}" for i in range(lab_count)]
+    )
+
+def make_instructors(rng, count, lab_ratio, tightness):
+    """
+    Synthetic instructor dicts shaped like the AI schedule modal sends them.
+
+    Args:
+        rng: random.Random the term is drawn from
+        count: number of instructors
+        lab_ratio: share of instructors with hasLab
+        tightness: share of instructors that pick one day pattern and a
+            subset of times (and, for labs, two lab days)
+
+    Returns:
+        list: instructor dicts
+    """
+    instructors = []
+    for i in range(count):
+        restricted = rng.random() < tightness
+        has_lab = rng.random() < lab_ratio
+        inst = {
+            "name": f"BENCH{i:04d}",
+            "courseCode": f"CSE{100 + i % 400}",
+            "preferredDays": [rng.choice(THEORY_DAYS)] if restricted else [],
+            "availableTimes": sorted(rng.sample(TIME_SLOTS, 3)) if restricted else [],
+            "maxSections": rng.choice([2, 3, 3, 4]),
+            "hasLab": has_lab,
+            "labDays": sorted(rng.sample(SINGLE_DAYS, 2)) if restricted and has_lab else [],
+            "labTimes": []
+        }
+        instructors.append(inst)
+    return instructors
+
+def scenarios(suite):
+    """Scenario dicts for a suite, in a stable order"""
+    result = []
+    for sections in SUITES[suite]:
+        for lab_ratio in LAB_RATIOS:
+            for tightness in TIGHTNESS:
+                result.append({
+                    "name": f"s{sections}-lab{lab_ratio:g}-tight{tightness:g}",
+                    "sections": sections,
+                    "instructors": max(1, math.ceil(sections / SECTIONS_PER_INSTRUCTOR)),
+                    "labRatio": lab_ratio,
+                    "tightness": tightness
+                })
+    return result
+
+def run_scenario(scenario, engine='greedy', seed=0, repeat=3):
+    """
+    Run one scenario and measure it.
+
+    Wall time is the median of repeat runs; peak memory comes from one extra
+    run under tracemalloc, which would otherwise slow the timed runs down.
+
+    Returns:
+        dict: the scenario plus its metrics
+    """
+    rng = random.Random(f"{seed}-{scenario['name']}")
+    instructors = make_instructors(rng, scenario["instructors"], scenario["labRatio"], scenario["tightness"])
+    rooms = make_rooms(scenario["sections"], scenario["labRatio"])
+    build = get_engine(engine)
+
+    def run_once():
+        attempts = [0]
+
+        def progress(placed, count):
+            attempts[0] = count
+
+        table = SlotTable()
+        started = time.perf_counter()
+        option = build(instructors, scenario["sections"], 1, random.Random(seed), table=table, progress=progress, rooms=rooms)
+        return time.perf_counter() - started, attempts[0], option
+
+    times = []
+    for _ in range(max(1, repeat)):
+        elapsed, attempts, option = run_once()
+        times.append(elapsed)
+
+    tracemalloc.start()
+    run_once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall = statistics.median(times)
+    placed = sum(1 for c in option["classes"] if c["type"] == "theory" and c["courseCode"] != "UNASSIGNED")
+    return dict(
+        scenario,
+        engine=engine,
+        rooms=[len(rooms[0]), len(rooms[1])],
+        wallMs=round(wall * 1000, 3),
+        attempts=attempts,
+        conflictCount=option["conflictCount"],
+        sectionsPlaced=placed,
+        peakMemoryKb=round(peak / 1024, 1),
+        sectionsPerSecond=round(placed / wall, 1) if wall else None
+    )
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with a baseline run of the same scenarios.
+
+    A scenario regresses when its wall time grows by more than tolerance or
+    its conflict count grows at all; the conflict count is deterministic for
+    a seed, so any increase is a real change in the engine's output.
+
+    Returns:
+        list: regression messages (empty when nothing regressed)
+    """
+    previous = {(r["name"], r["engine"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["engine"]))
+        if before is None:
+            continue
+        ratio = result["wallMs"] / before["wallMs"] if before["wallMs"] else 1.0
+        result["baselineWallMs"] = before["wallMs"]
+        result["wallRatio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['name']} ({result['engine']}): {before['wallMs']}ms -> {result['wallMs']}ms")
+        if result["conflictCount"] > before["conflictCount"]:
+            regressions.append(
+                f"{result['name']} ({result['engine']}): conflicts {before['conflictCount']} -> {result['conflictCount']}"
+            )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the schedule generation engines")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--engine", action="append", choices=["greedy", "csp"],
+                        help="engine to run (repeatable, default greedy)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="baseline results to compare against")
+    parser.add_argument("--save-baseline", help="also write the results here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = []
+    for engine in args.engine or ["greedy"]:
+        for scenario in scenarios(args.suite):
+            result = run_scenario(scenario, engine, args.seed, args.repeat)
+            results.append(result)
+            print(f"{engine:6} {result['name']:28} {result['wallMs']:>10.1f} ms "
+                  f"{result['conflictCount']:>5} conflicts {result['peakMemoryKb']:>9.0f} KB "
+                  f"{result['sectionsPerSecond'] or 0:>9.0f} sections/s")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    report = {
+        "meta": {
+            "suite": args.suite,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "results": results,
+        "regressions": regressions
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print("\nRegressions against baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
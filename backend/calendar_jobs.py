@@ -0,0 +1,133 @@
+"""Background parsing of uploaded calendar PDFs.
+
+The upload request only stores the PDF; a CalendarJob parses it on a small
+local worker pool and publishes pages processed and each event as it is
+found, so clients poll the job or read its NDJSON stream and can show the
+first events while the rest of the PDF is still being read.
+"""
+import time
+
+from calendar_parser import EventJsonWriter
+from jobs import CANCELLED, DONE, FAILED, FINISHED, RUNNING, BackgroundJob, JobCancelled, JobManager
+
+# Parse jobs running at the same time; large PDFs fan out further on the PDF pool
+PARSE_JOB_WORKERS = 2
+
+# Parse jobs waiting or running before new uploads are refused
+MAX_PENDING_PARSE_JOBS = 16
+
+
+class CalendarJob(BackgroundJob):
+    """
+    State of one calendar parse job.
+
+    Args:
+        store: CalendarStore holding the PDF
+        digest: content hash of the PDF, as returned by CalendarStore.save
+        filename: name of the stored PDF
+        duplicate: the same PDF had been uploaded before
+        events_path: JSON file the events are written to as they are found
+    """
+
+    def __init__(self, store, digest, filename, duplicate, events_path):
+        super().__init__()
+        self.store = store
+        self.digest = digest
+        self.filename = filename
+        self.duplicate = duplicate
+        self.events_path = events_path
+        self.cached = None
+        self.events = []
+        self.pages_processed = 0
+        self.page_count = None
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "error": self.error,
+            "filename": self.filename,
+            "contentHash": self.digest,
+            "duplicate": self.duplicate,
+            "cached": self.cached,
+            "progress": {
+                "pagesProcessed": self.pages_processed,
+                "pageCount": self.page_count,
+                "eventsFound": len(self.events)
+            }
+        }
+
+    def run(self):
+        if self.cancel_event.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self._publish()
+
+        last_publish = 0.0
+
+        def publish_throttled():
+            nonlocal last_publish
+            now = time.monotonic()
+            if now - last_publish > 0.25:
+                last_publish = now
+                self._publish()
+
+        # Cancellation is checked on every event and page; the store then
+        # drops the partial parse instead of caching it
+        def sink(event):
+            if self.cancel_event.is_set():
+                raise JobCancelled()
+            writer(event)
+            self.events.append(event)
+            publish_throttled()
+
+        def progress(pages_processed, page_count):
+            if self.cancel_event.is_set():
+                raise JobCancelled()
+            self.pages_processed = pages_processed
+            self.page_count = page_count
+            publish_throttled()
+
+        try:
+            with EventJsonWriter(self.events_path) as writer:
+                _, self.cached = self.store.parse(self.digest, sink=sink, progress=progress)
+            print(f"Extracted {len(self.events)} events from {self.filename} and saved to {self.events_path}")
+            self._finish(DONE)
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            print(f"Calendar job {self.id} failed: {e}")
+            self.error = str(e)
+            self._finish(FAILED)
+
+
+class CalendarJobManager(JobManager):
+    """Runs calendar parse jobs and streams their events"""
+
+    def __init__(self, workers=PARSE_JOB_WORKERS, max_pending=MAX_PENDING_PARSE_JOBS):
+        super().__init__(workers, max_pending, name='calendar')
+
+    def stream(self, job, heartbeat=15.0):
+        """
+        Yield job events as they happen, ending when the job finishes.
+
+        Events are dicts: {"event": "progress", ...status} whenever the job
+        changes, {"event": "events", "events": [...]} with the calendar events
+        found since the last one, and a final {"event": <status>, ...status}.
+        """
+        sent = 0
+        version = -1
+        while True:
+            version = job.wait(version, heartbeat)
+            # Read before the events: a job only finishes after its last event
+            finished = job.status in FINISHED
+            found = len(job.events)
+            if sent < found:
+                yield {"event": "events", "events": job.events[sent:found]}
+                sent = found
+            status = job.to_dict()
+            if finished:
+                yield dict(status, event=job.status)
+                return
+            yield dict(status, event="progress")
@@ -0,0 +1,363 @@
+"""Academic calendar extraction from uploaded PDFs.
+
+Extraction is a generator pipeline: pages yield their lines, lines yield the
+events they match, and each event is handed to a sink as soon as it is
+found. No stage holds more than a few pages of text, so memory stays flat on
+multi-hundred-page calendar bundles and the first events are out before the
+last page is read.
+
+Page text extraction is CPU-bound, so large PDFs are split into page ranges
+that a process pool extracts in parallel, each worker opening the file
+itself; the ranges are read back in page order, so the events come out
+exactly as the serial path would produce them.
+
+Matching is compiled once at import: one regex covers both date formats and
+a keyword automaton assigns each title its type in one pass over the title.
+"""
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# PDFs with fewer pages are extracted serially: the pool's start-up and the
+# per-worker file parse cost more than they save
+PARALLEL_MIN_PAGES = 16
+
+# Page ranges handed out per worker; more ranges balance uneven pages better
+RANGES_PER_WORKER = 4
+
+# Bump when a change alters the events a PDF yields; cached parse results
+# are keyed by it
+PARSER_VERSION = 1
+
+# Abbreviated month map
+MONTH_ABBR_MAP = {
+    'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04',
+    'may': '05', 'jun': '06', 'jul': '07', 'aug': '08',
+    'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12'
+}
+
+# Full month map
+MONTH_MAP = {
+    'january': '01', 'february': '02', 'march': '03', 'april': '04',
+    'may': '05', 'june': '06', 'july': '07', 'august': '08',
+    'september': '09', 'october': '10', 'november': '11', 'december': '12'
+}
+
+EVENT_KEYWORDS = {
+    'holiday': ['holiday', 'eid', 'independence', 'victory', 'martyrs', 'pohela boishakh', 'durga puja', 'christmas', 'new year'],
+    'exam': ['exam', 'final', 'midterm', 'mid-term', 'assessment', 'test'],
+    'advising': ['advising', 'advisor', 'counseling', 'guidance', 'academic planning'],
+    'evaluation': ['evaluation', 'survey', 'feedback', 'course evaluation', 'faculty evaluation', 'teaching evaluation'],
+    'registration': ['registration', 'enroll', 'add/drop', 'course selection', 'add drop', 'section change'],
+    'break': ['break', 'recess', 'vacation', 'intersession', 'no classes']
+}
+
+# Both date formats in one pattern, sharing the leading day digits:
+# "6-Sep-25 Saturday <title>" (MAIN FORMAT IN NSU PDF) or "15 January 2025"
+DATE_PATTERN = re.compile(
+    r'(?P<day>\d{1,2})(?:'
+    r'-(?P<abbr>Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)-(?P<yy>\d{2})\s+(?P<dow>\w+)\s+(?P<title>.+)'
+    r'|\s+(?P<month>January|February|March|April|May|June|July|August|September|October|November|December)\s+(?P<year>\d{4}))',
+    re.IGNORECASE
+)
+
+# The short format on its own: a line holding both formats uses the short
+# one, even when the long one comes first
+ABBR_DATE_PATTERN = re.compile(r'(\d{1,2})-(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)-(\d{2})\s+(\w+)\s+(.+)', re.IGNORECASE)
+
+WHITESPACE = re.compile(r'\s+')
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick matcher that finds which keyword groups occur in a text.
+
+    The trie of all keywords is compiled at construction into a deterministic
+    automaton (every failure link followed ahead of time), so classify reads
+    each character of the text once with a single dict lookup.
+
+    Args:
+        groups: dict of group name -> keywords, in priority order
+        default: group returned when no keyword occurs
+    """
+
+    def __init__(self, groups, default='other'):
+        self.names = list(groups) + [default]
+        none = len(groups)
+        goto = [{}]
+        best = [none]   # state -> highest-priority group ending there
+        for priority, keywords in enumerate(groups.values()):
+            for keyword in keywords:
+                state = 0
+                for ch in keyword:
+                    if ch not in goto[state]:
+                        goto.append({})
+                        best.append(none)
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                best[state] = min(best[state], priority)
+
+        # Breadth first, so a state's failure target is finished before it
+        self.delta = [None] * len(goto)
+        self.delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            best[state] = min(best[state], best[fail[state]])
+            self.delta[state] = {**self.delta[fail[state]], **goto[state]}
+            for ch, child in goto[state].items():
+                fail[child] = self.delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(child)
+        self.best = best
+
+    def classify(self, text):
+        """Name of the highest-priority group with a keyword in text"""
+        delta = self.delta
+        best = self.best
+        found = len(self.names) - 1
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+        return self.names[found]
+
+
+CATEGORIZER = KeywordAutomaton(EVENT_KEYWORDS)
+
+
+def categorize_event(title):
+    """Categorize event based on title keywords"""
+    return CATEGORIZER.classify(title.lower())
+
+def parse_line(line):
+    """
+    Match one line of calendar text.
+
+    Args:
+        line: a line of extracted PDF text
+
+    Returns:
+        dict: the event with date, title, type and dayOfWeek, or None if the
+            line holds no dated event
+    """
+    line = line.strip()
+    if not line or len(line) < 5:
+        return None
+
+    day_of_week = None
+    match = DATE_PATTERN.search(line)
+    if match is None:
+        return None
+
+    if match.group('month') is not None:
+        # Long format first; a short-format date later in the line still wins
+        short = ABBR_DATE_PATTERN.search(line, match.start() + 1)
+        if short is None:
+            found_date = f"{match.group('year')}-{MONTH_MAP[match.group('month').lower()]}-{match.group('day').zfill(2)}"
+            title = line.replace(match.group(0), '').strip()
+        else:
+            day, abbr, yy, day_of_week, title = short.groups()
+            found_date = f"20{yy}-{MONTH_ABBR_MAP[abbr.lower()]}-{day.zfill(2)}"
+            title = title.strip()
+    else:
+        day_of_week = match.group('dow')
+        found_date = f"20{match.group('yy')}-{MONTH_ABBR_MAP[match.group('abbr').lower()]}-{match.group('day').zfill(2)}"
+        title = match.group('title').strip()
+
+    if not title:
+        return None
+
+    title = WHITESPACE.sub(' ', title).strip()
+    if not title or len(title) <= 2 or len(title) >= 300:
+        return None
+
+    return {
+        'date': found_date,
+        'title': title,
+        'type': categorize_event(title),
+        'dayOfWeek': day_of_week if day_of_week else ''
+    }
+
+def pdf_workers():
+    """Processes used to extract large PDFs; CALENDAR_WORKERS=1 keeps every file serial"""
+    return int(os.environ.get('CALENDAR_WORKERS', 0)) or os.cpu_count() or 1
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def get_pdf_pool():
+    """Process pool shared by all uploads, created on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=pdf_workers(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pdf_pool
+
+def reset_pdf_pool():
+    """Drop the shared pool, e.g. after a worker crashed and broke it"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+def page_ranges(page_count, workers):
+    """Split pages 0..page_count into contiguous (start, stop) ranges, in page order"""
+    size = max(1, -(-page_count // (workers * RANGES_PER_WORKER)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def pdf_page_count(pdf_path):
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def iter_page_range(pdf_path, start, stop):
+    """Yield the text of pages start..stop, opening the file independently"""
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for index in range(start, stop):
+            yield pdf_reader.pages[index].extract_text() or ""
+
+def extract_page_range(pdf_path, start, stop):
+    """Text of pages start..stop; the unit of work on the PDF pool"""
+    return list(iter_page_range(pdf_path, start, stop))
+
+def iter_pdf_pages(pdf_path, progress=None):
+    """
+    Yield the text of each PDF page in page order.
+
+    Files of PARALLEL_MIN_PAGES pages or more are extracted on the process
+    pool, with at most two ranges per worker in flight so memory stays
+    bounded; smaller files, or a single configured worker, stay serial.
+
+    Args:
+        pdf_path: path of the PDF file
+        progress: optional callable(pages_processed, page_count), called once
+            the page count is known and again after each page has been consumed
+    """
+    page_count = pdf_page_count(pdf_path)
+    if progress is not None:
+        progress(0, page_count)
+    for pages_processed, text in enumerate(_iter_pdf_texts(pdf_path, page_count), start=1):
+        yield text
+        if progress is not None:
+            progress(pages_processed, page_count)
+
+def _iter_pdf_texts(pdf_path, page_count):
+    workers = pdf_workers()
+    if page_count < PARALLEL_MIN_PAGES or workers < 2:
+        yield from iter_page_range(pdf_path, 0, page_count)
+        return
+
+    ranges = deque(page_ranges(page_count, workers))
+    pending = deque()
+    pages_read = 0
+    try:
+        pool = get_pdf_pool()
+        while ranges or pending:
+            while ranges and len(pending) < workers * 2:
+                pending.append(pool.submit(extract_page_range, pdf_path, *ranges.popleft()))
+            texts = pending.popleft().result()
+            yield from texts
+            pages_read += len(texts)
+    except BrokenProcessPool:
+        print("PDF pool broke, extracting the remaining pages serially")
+        reset_pdf_pool()
+        yield from iter_page_range(pdf_path, pages_read, page_count)
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_lines(pages):
+    """Yield the lines of each page text"""
+    for page_text in pages:
+        yield from page_text.split('\n')
+
+def iter_events(lines):
+    """Yield the event of every line that matches a calendar date pattern"""
+    for line in lines:
+        event = parse_line(line)
+        if event is not None:
+            yield event
+
+def parse_events_from_text(text):
+    """Parse events from extracted PDF text"""
+    return list(iter_events(text.split('\n')))
+
+def iter_pdf_events(pdf_path, progress=None):
+    """Yield the events of a PDF in document order as its pages are read; see iter_pdf_pages for progress"""
+    return iter_events(iter_lines(iter_pdf_pages(pdf_path, progress)))
+
+def parse_pdf_calendar(pdf_path, sink=None):
+    """
+    Extract academic calendar events from PDF.
+
+    Args:
+        pdf_path: path of the PDF file
+        sink: optional callable given each event as soon as it is found
+
+    Returns:
+        list: the events in document order; if a page cannot be read, the
+            events found before it (they have already reached the sink)
+    """
+    events = []
+    try:
+        for event in iter_pdf_events(pdf_path):
+            if sink is not None:
+                sink(event)
+            events.append(event)
+    except Exception as e:
+        print(f"Error parsing PDF: {e}")
+    return events
+
+
+class EventJsonWriter:
+    """
+    Sink that writes events to a JSON array file as they arrive.
+
+    The output matches json.dump(events, f, indent=2, ensure_ascii=False).
+    Events go to a temporary file next to path, which replaces path only
+    when the writer closes cleanly, so readers never see a half-written list.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = None
+        self.file = None
+        self.count = 0
+
+    def __enter__(self):
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        self.file = os.fdopen(fd, 'w', encoding='utf-8')
+        return self
+
+    def __call__(self, event):
+        text = json.dumps(event, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        self.file.write(('[\n  ' if self.count == 0 else ',\n  ') + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.file.close()
+            os.remove(self.tmp_path)
+            return False
+        self.file.write('\n]' if self.count else '[]')
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return False
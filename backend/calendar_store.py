@@ -0,0 +1,122 @@
+"""Content-addressed storage of uploaded calendar PDFs.
+
+An upload is hashed with SHA-256 while it streams to disk and stored as
+<hash>.pdf, so uploading the same PDF again keeps the existing copy instead
+of writing another one. The events parsed from a PDF are cached next to it
+under (content hash, PARSER_VERSION): a known calendar is answered from the
+cache without opening the PDF, and a parser change that bumps the version
+makes every PDF parse afresh.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from calendar_parser import PARSER_VERSION, EventJsonWriter, iter_pdf_events
+
+# Bytes read from the upload stream at a time
+CHUNK_SIZE = 64 * 1024
+
+
+class CalendarStore:
+    """
+    Uploaded PDFs and their parsed events in one folder.
+
+    Args:
+        folder: directory for the PDFs; parse results go to its "parsed" subfolder
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.parsed_folder = os.path.join(folder, 'parsed')
+        os.makedirs(self.parsed_folder, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def pdf_path(self, digest):
+        return os.path.join(self.folder, f"{digest}.pdf")
+
+    def events_path(self, digest):
+        return os.path.join(self.parsed_folder, f"{digest}-v{PARSER_VERSION}.json")
+
+    def save(self, stream):
+        """
+        Write an upload to the store, hashing it on the way.
+
+        Args:
+            stream: binary file object, e.g. the upload's FileStorage.stream
+
+        Returns:
+            tuple: (hex SHA-256 digest, path of the stored PDF, True if the
+                same content was already stored)
+        """
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        digest = sha.hexdigest()
+        path = self.pdf_path(digest)
+        with self.lock:
+            duplicate = os.path.exists(path)
+            if duplicate:
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        return digest, path, duplicate
+
+    def cached_events(self, digest):
+        """Events parsed from this content by the current parser version, or None"""
+        try:
+            with open(self.events_path(digest), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable parse cache for {digest}: {e}")
+            return None
+
+    def parse(self, digest, sink=None, progress=None):
+        """
+        Events of a stored PDF, streamed into sink in document order.
+
+        A cached result is replayed without touching the PDF. Otherwise the
+        PDF is parsed and, if every page could be read, the result is cached.
+
+        Args:
+            digest: content hash returned by save
+            sink: optional callable given each event
+            progress: optional callable(pages_processed, page_count); not
+                called for a cached result
+
+        Returns:
+            tuple: (events, True if they came from the cache)
+
+        Raises:
+            Exception: whatever reading the PDF, sink or progress raised; the
+                events found before it have gone to sink, but nothing is cached
+        """
+        cached = self.cached_events(digest)
+        if cached is not None:
+            if sink is not None:
+                for event in cached:
+                    sink(event)
+            return cached, True
+
+        events = []
+        with EventJsonWriter(self.events_path(digest)) as cache_writer:
+            for event in iter_pdf_events(self.pdf_path(digest), progress):
+                if sink is not None:
+                    sink(event)
+                cache_writer(event)
+                events.append(event)
+        return events, False
@@ -0,0 +1,161 @@
+"""In-memory overlap index over the committed classes.
+
+Every class is kept with its SlotTable occupancy mask (one bit per 5 minutes
+of every single day its pattern covers), grouped per instructor and per
+room. A query ANDs the candidate slot's mask with the group's union mask
+first, so the common "free" answer costs one integer AND; only on a hit are
+the group's classes scanned to name the conflicting ones. Because masks are
+built from single days and minute ranges, "ST" overlaps "S" and a 3-hour lab
+overlaps the 1.5-hour theory slots it spans.
+"""
+import threading
+
+from scheduler import SLOT_TABLE, parse_integer, validate_slot
+
+# Most candidates accepted by one batch availability check
+MAX_BATCH_CHECKS = 1000
+
+# Candidate fields that must be strings when present
+CANDIDATE_FIELDS = ("instructorName", "room", "days", "timeSlot")
+
+
+def validate_candidate(candidate):
+    """
+    Check the shape of one batch candidate, leaving its slot to check_batch.
+
+    Args:
+        candidate: the candidate as sent by the client
+
+    Raises:
+        ValueError: if the candidate is not an object, a CANDIDATE_FIELDS entry
+            is present but not a string, or excludeClassId is not an integer
+    """
+    if not isinstance(candidate, dict):
+        raise ValueError("Each candidate must be an object")
+    for field in CANDIDATE_FIELDS:
+        if candidate.get(field) is not None and not isinstance(candidate[field], str):
+            raise ValueError(f"{field} must be a string")
+    candidate["excludeClassId"] = parse_integer(candidate.get("excludeClassId"), "excludeClassId")
+
+
+class ConflictIndex:
+    """
+    Thread-safe per-instructor and per-room index of class masks.
+
+    Classes are the dicts ClassItem.to_dict returns; the app keeps the index
+    in step by calling put and remove on every class write.
+    """
+
+    def __init__(self, table=SLOT_TABLE):
+        self.table = table
+        self.classes = {}       # class ID -> (class dict, mask)
+        self.groups = {"faculty": {}, "room": {}}   # key -> value -> {class ID: mask}
+        self.unions = {"faculty": {}, "room": {}}   # key -> value -> OR of the group's masks
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def mask(self, days, time_slot):
+        """Mask of a slot; never interned, so request strings cannot grow the shared table"""
+        if not days or not time_slot or days == "TBD" or time_slot == "TBD":
+            return 0
+        return self.table.probe_mask(days, time_slot)
+
+    def load(self, classes):
+        """Replace the index contents with these classes"""
+        with self.lock:
+            self.classes.clear()
+            for key in self.groups:
+                self.groups[key].clear()
+                self.unions[key].clear()
+            for cls in classes:
+                self.put(cls)
+            self.loaded = True
+
+    def put(self, cls):
+        """Add a class, or re-index it after its slot, room or instructor changed"""
+        with self.lock:
+            self.remove(cls["id"])
+            mask = self.mask(cls.get("days"), cls.get("time"))
+            self.classes[cls["id"]] = (cls, mask)
+            for key in self.groups:
+                self.groups[key].setdefault(cls.get(key), {})[cls["id"]] = mask
+                unions = self.unions[key]
+                unions[cls.get(key)] = unions.get(cls.get(key), 0) | mask
+
+    def remove(self, class_id):
+        with self.lock:
+            entry = self.classes.pop(class_id, None)
+            if entry is None:
+                return
+            cls = entry[0]
+            for key in self.groups:
+                group = self.groups[key][cls.get(key)]
+                del group[class_id]
+                # Masks can overlap, so the union is rebuilt from what is left
+                union = 0
+                for mask in group.values():
+                    union |= mask
+                self.unions[key][cls.get(key)] = union
+
+    def conflicts(self, key, value, days, time_slot, exclude=None):
+        """
+        Classes of one instructor (key "faculty") or room (key "room") that overlap a slot.
+
+        Args:
+            key: "faculty" or "room"
+            value: instructor name or room
+            days: day pattern, single day or pair
+            time_slot: time slot string; check request values with validate_slot
+                first, since an unparseable slot never conflicts
+            exclude: class ID to ignore, e.g. the class being edited
+
+        Returns:
+            list: overlapping class dicts
+        """
+        mask = self.mask(days, time_slot)
+        with self.lock:
+            if not self.unions[key].get(value, 0) & mask:
+                return []
+            return [
+                self.classes[class_id][0]
+                for class_id, class_mask in self.groups[key][value].items()
+                if class_mask & mask and class_id != exclude
+            ]
+
+    def check_batch(self, candidates):
+        """
+        Instructor and room conflicts for many candidate placements at once.
+
+        Args:
+            candidates: dicts with instructorName and/or room, days, timeSlot
+                and an optional excludeClassId
+
+        Returns:
+            list: one result per candidate, in order; a candidate with missing
+                or malformed days or time gets an "error" instead of conflicts
+        """
+        results = []
+        with self.lock:
+            for position, candidate in enumerate(candidates):
+                days = candidate.get("days")
+                time_slot = candidate.get("timeSlot")
+                if not days or not time_slot:
+                    results.append({"index": position, "error": "days and timeSlot are required"})
+                    continue
+                try:
+                    validate_slot(days, time_slot)
+                except ValueError as e:
+                    results.append({"index": position, "error": str(e)})
+                    continue
+                exclude = candidate.get("excludeClassId")
+                instructor = candidate.get("instructorName")
+                room = candidate.get("room")
+                instructor_conflicts = self.conflicts("faculty", instructor, days, time_slot, exclude) if instructor else []
+                room_conflicts = self.conflicts("room", room, days, time_slot, exclude) if room else []
+                results.append({
+                    "index": position,
+                    "available": not instructor_conflicts and not room_conflicts,
+                    "instructorConflicts": instructor_conflicts,
+                    "roomConflicts": room_conflicts
+                })
+        return results
@@ -0,0 +1,515 @@
+"""Constraint-propagation engine for /api/generate-schedule (engine "csp").
+
+Every section becomes a theory variable, plus a lab variable when its
+instructor teaches a lab. Values are slot IDs from the shared SlotTable.
+Rooms of one kind are interchangeable, so a value stays in a domain while at
+least one room of its kind is free for the slot.
+
+Section quotas are fixed first by a round-robin max-flow over
+(instructor, slot, room capacity), so the search never has to prove a
+pigeonhole infeasibility the slow way. The search then assigns the most
+constrained variable first, forward-checks instructor and room conflicts
+against the remaining domains, and on a wipe-out jumps straight back to the
+most recent variable that caused it (FC-CBJ).
+"""
+import random
+import time
+from collections import deque
+
+from scheduler import (
+    SLOT_TABLE, THEORY_ROOMS, LAB_ROOMS, TIME_SLOTS, LAB_TIME_SLOTS,
+    THEORY_DAYS, SINGLE_DAYS, PROGRESS_EVERY, ClassColumns, conflict_fields, fixed_occupancy, fixed_workload
+)
+
+# Wall-clock limit for one option; what is left is completed greedily
+CSP_TIME_LIMIT = 10.0
+
+# Times a variable may run out of values before it is dropped as a conflict.
+# Lab rooms are the scarce resource, and without a cap a surplus of labs makes
+# the search re-prove the same pigeonhole over and over.
+FAILURE_LIMIT = 20
+
+THEORY = 'theory'
+LAB = 'lab'
+
+
+class _FlowNetwork:
+    """Residual graph with unit augmentations, used to fix section quotas"""
+
+    def __init__(self):
+        self.graph = []
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, cap):
+        self.graph[u].append([v, cap, len(self.graph[v])])
+        self.graph[v].append([u, 0, len(self.graph[u]) - 1])
+
+    def augment(self, source, sink):
+        """Push one unit from source to sink along a shortest path; return True on success"""
+        parent = {source: None}
+        queue = deque([source])
+        while queue and sink not in parent:
+            u = queue.popleft()
+            for i, (v, cap, _) in enumerate(self.graph[u]):
+                if cap > 0 and v not in parent:
+                    parent[v] = (u, i)
+                    queue.append(v)
+        if sink not in parent:
+            return False
+
+        v = sink
+        while parent[v] is not None:
+            u, i = parent[v]
+            edge = self.graph[u][i]
+            edge[1] -= 1
+            self.graph[v][edge[2]][1] += 1
+            v = u
+        return True
+
+
+def theory_domain(inst, table):
+    """Slot IDs an instructor may teach theory in, in preference order"""
+    target_days = inst.get('preferredDays', []) or THEORY_DAYS
+    target_times = inst.get('availableTimes', []) or TIME_SLOTS
+    slots = (table.slot_id(d, t) for d in target_days for t in target_times)
+    return [s for s in dict.fromkeys(slots) if table.slot_masks[s]]
+
+def lab_domain(inst, table):
+    """Slot IDs an instructor's labs may use"""
+    target_days = inst.get('labDays', []) or SINGLE_DAYS
+    target_times = inst.get('labTimes', []) or LAB_TIME_SLOTS
+    slots = (table.slot_id(d, t) for d in target_days for t in target_times)
+    return [s for s in dict.fromkeys(slots) if table.slot_masks[s]]
+
+def allocate_quotas(entries, domains, total_sections, room_count, committed=None):
+    """
+    Hand out sections round-robin, keeping every handed-out section placeable.
+
+    Each step tries to route one more unit from the instructor through an
+    (instructor, slot) pair to a slot with a free room. An instructor whose
+    unit cannot be routed is retired, exactly like the greedy queue drops an
+    instructor that found no slot, but without wasting placement attempts.
+
+    Args:
+        entries: instructor dicts in round-robin order
+        domains: theory slot IDs per entry
+        total_sections: sections wanted
+        room_count: rooms available per slot
+        committed: optional name -> sections already taught (see
+            fixed_workload), counted against maxSections
+
+    Returns:
+        list: entry index for each section, in section order
+    """
+    network = _FlowNetwork()
+    sink = network.add_node()
+    entry_nodes = [network.add_node() for _ in entries]
+    pair_nodes = {}
+    slot_nodes = {}
+
+    for index, inst in enumerate(entries):
+        name = inst.get('name')
+        for slot in domains[index]:
+            if slot not in slot_nodes:
+                slot_nodes[slot] = network.add_node()
+                network.add_edge(slot_nodes[slot], sink, room_count)
+            # One class per instructor per slot, shared by entries with the same name
+            if (name, slot) not in pair_nodes:
+                pair_nodes[(name, slot)] = network.add_node()
+                network.add_edge(pair_nodes[(name, slot)], slot_nodes[slot], 1)
+            network.add_edge(entry_nodes[index], pair_nodes[(name, slot)], 1)
+
+    sequence = []
+    load = dict(committed or {})
+    active = list(range(len(entries)))
+    while len(sequence) < total_sections and active:
+        still_active = []
+        for index in active:
+            if len(sequence) >= total_sections:
+                break
+            name = entries[index].get('name')
+            if load.get(name, 0) >= int(entries[index].get('maxSections', 3)):
+                continue
+            if network.augment(entry_nodes[index], sink):
+                load[name] = load.get(name, 0) + 1
+                sequence.append(index)
+                still_active.append(index)
+        active = still_active
+
+    return sequence
+
+
+class _Frame:
+    __slots__ = ('var', 'values', 'index', 'pruned', 'touched')
+
+    def __init__(self, var, values):
+        self.var = var
+        self.values = values
+        self.index = 0
+        self.pruned = []
+        self.touched = {}
+
+
+class CSPSearch:
+    """
+    Forward checking with conflict-directed backjumping over slot variables.
+
+    Args:
+        variables: list of (instructor name, kind, domain slot IDs)
+        table: SlotTable the slot IDs come from
+        rng: random.Random used to order values
+        progress: optional callback(theory_placed, nodes), see generate_option
+        rooms: (theory rooms, lab rooms) the variables may use
+        room_busy: optional room ID -> mask of rooms already taken by committed classes
+    """
+
+    def __init__(self, variables, table, rng, progress=None, rooms=(THEORY_ROOMS, LAB_ROOMS), room_busy=None):
+        self.table = table
+        self.progress = progress
+        self.theory_placed = 0
+        self.names = [v[0] for v in variables]
+        self.kinds = [v[1] for v in variables]
+        self.alive = [set(v[2]) for v in variables]
+        # Least constraining value first: slots that overlap few others in the
+        # same domain pack rooms tighter (08:00/11:20/02:40 labs before 09:40)
+        self.order = []
+        for _, _, domain in variables:
+            values = list(domain)
+            rng.shuffle(values)
+            domain_set = set(domain)
+            values.sort(key=lambda s: len(table.overlaps[s] & domain_set))
+            self.order.append(values)
+
+        self.rooms = {
+            THEORY: [table.room_id(r) for r in rooms[0]],
+            LAB: [table.room_id(r) for r in rooms[1]]
+        }
+        self.room_busy = dict(room_busy or {})
+        self.assignment = {}    # var -> (slot, room)
+        self.dropped = set()
+        self.nodes = 0
+
+        self.by_name = {}
+        for var, name in enumerate(self.names):
+            self.by_name.setdefault(name, []).append(var)
+
+        self.pruners = [[] for _ in variables]
+        self.conf = [set() for _ in variables]
+        self.failures = [0] * len(variables)
+        self.depth = {}
+
+        # Unassigned variables indexed by domain size (MRV) and by slot (room fullness)
+        self.buckets = {}
+        self.holders = {THEORY: {}, LAB: {}}
+        for var in range(len(variables)):
+            self._to_pool(var)
+
+    def _to_pool(self, var):
+        self.buckets.setdefault(len(self.alive[var]), set()).add(var)
+        holders = self.holders[self.kinds[var]]
+        for slot in self.alive[var]:
+            holders.setdefault(slot, set()).add(var)
+
+    def _from_pool(self, var):
+        self.buckets[len(self.alive[var])].discard(var)
+        holders = self.holders[self.kinds[var]]
+        for slot in self.alive[var]:
+            holders[slot].discard(var)
+
+    def _select(self):
+        """Most constrained unassigned variable (smallest remaining domain)"""
+        for size in sorted(self.buckets):
+            if self.buckets[size]:
+                return next(iter(self.buckets[size]))
+        return None
+
+    def _free_room(self, kind, slot):
+        mask = self.table.slot_masks[slot]
+        for room in self.rooms[kind]:
+            if not self.room_busy.get(room, 0) & mask:
+                return room
+        return None
+
+    def _remove(self, frame, var, slot):
+        size = len(self.alive[var])
+        self.buckets[size].discard(var)
+        self.buckets.setdefault(size - 1, set()).add(var)
+        self.alive[var].discard(slot)
+        self.holders[self.kinds[var]][slot].discard(var)
+        frame.pruned.append((var, slot))
+        if var not in frame.touched:
+            frame.touched[var] = None
+            self.pruners[var].append(frame.var)
+
+    def _assign(self, frame, slot):
+        """Book slot for the frame's variable and forward-check; return the wiped-out variable, if any"""
+        var = frame.var
+        kind = self.kinds[var]
+        room = self._free_room(kind, slot)
+        if room is None:
+            return var
+
+        mask = self.table.slot_masks[slot]
+        self.room_busy[room] = self.room_busy.get(room, 0) | mask
+        self.assignment[var] = (slot, room)
+        if kind == THEORY:
+            self.theory_placed += 1
+        overlapping = self.table.overlaps[slot]
+
+        # Instructor conflicts: same name, overlapping slot, any kind
+        for other in self.by_name[self.names[var]]:
+            if other in self.assignment or other in self.dropped or other == var:
+                continue
+            for other_slot in overlapping & self.alive[other]:
+                self._remove(frame, other, other_slot)
+
+        # Room conflicts: overlapping slots of the same kind with no room left
+        holders = self.holders[kind]
+        for other_slot in overlapping:
+            waiting = holders.get(other_slot)
+            if waiting and self._free_room(kind, other_slot) is None:
+                for other in list(waiting):
+                    self._remove(frame, other, other_slot)
+
+        for other in frame.touched:
+            if not self.alive[other]:
+                return other
+        return None
+
+    def _unassign(self, frame):
+        var = frame.var
+        for other, slot in reversed(frame.pruned):
+            if other in self.dropped:
+                self.alive[other].add(slot)
+                continue
+            size = len(self.alive[other])
+            self.buckets[size].discard(other)
+            self.buckets.setdefault(size + 1, set()).add(other)
+            self.alive[other].add(slot)
+            self.holders[self.kinds[other]].setdefault(slot, set()).add(other)
+        for other in frame.touched:
+            self.pruners[other].pop()
+        frame.pruned = []
+        frame.touched = {}
+
+        if var in self.assignment:
+            slot, room = self.assignment.pop(var)
+            if self.kinds[var] == THEORY:
+                self.theory_placed -= 1
+            self.room_busy[room] &= ~self.table.slot_masks[slot]
+
+    def _try_values(self, frame):
+        """Advance the frame to its next consistent value; return False when exhausted"""
+        self._unassign(frame)
+        var = frame.var
+        while frame.index < len(frame.values):
+            slot = frame.values[frame.index]
+            frame.index += 1
+            if slot not in self.alive[var]:
+                continue
+            self.nodes += 1
+            wiped = self._assign(frame, slot)
+            if wiped is None:
+                return True
+            if wiped != var:
+                self.conf[var].update(p for p in self.pruners[wiped] if p != var)
+            self._unassign(frame)
+        return False
+
+    def solve(self, deadline):
+        """
+        Search until every variable is assigned or dropped.
+
+        A variable whose failure involves no earlier choice cannot be placed
+        whatever the others do, and one that keeps failing is not worth more
+        search; either is dropped and reported as a conflict.
+
+        Returns:
+            True when done, False when the deadline passed first
+        """
+        stack = []
+        steps = 0
+        while True:
+            if time.monotonic() > deadline:
+                return False
+            steps += 1
+            if self.progress and steps % PROGRESS_EVERY == 0:
+                self.progress(self.theory_placed, self.nodes)
+
+            var = self._select()
+            if var is None:
+                return True
+
+            self._from_pool(var)
+            self.conf[var] = set()
+            frame = _Frame(var, [s for s in self.order[var] if s in self.alive[var]])
+            self.depth[var] = len(stack)
+            stack.append(frame)
+
+            while not self._try_values(stack[-1]):
+                failed = stack.pop()
+                culprits = self.conf[failed.var] | set(self.pruners[failed.var])
+                self.failures[failed.var] += 1
+                if not culprits or self.failures[failed.var] > FAILURE_LIMIT:
+                    self.dropped.add(failed.var)
+                    break
+
+                self._to_pool(failed.var)
+                if time.monotonic() > deadline:
+                    return False
+
+                # Jump back to the most recent culprit, undoing everything above it
+                target = max(culprits, key=self.depth.get)
+                while stack[-1].var != target:
+                    skipped = stack.pop()
+                    self._unassign(skipped)
+                    self._to_pool(skipped.var)
+                self.conf[target].update(c for c in culprits if c != target)
+
+    def drop(self, var):
+        """Take a variable out of the problem (it will be reported as a conflict)"""
+        self._from_pool(var)
+        self.dropped.add(var)
+
+    def complete_greedily(self):
+        """After a timeout, place what is left on its first consistent value without backtracking"""
+        while True:
+            var = self._select()
+            if var is None:
+                return
+            self._from_pool(var)
+            frame = _Frame(var, [s for s in self.order[var] if s in self.alive[var]])
+            if not self._try_values(frame):
+                self.dropped.add(var)
+
+
+def solve_option(instructors, total_sections, option_num=1, rng=None, table=SLOT_TABLE, progress=None, rooms=None, stats=None, fixed=None, compact=False, time_limit=CSP_TIME_LIMIT):
+    """
+    Build one schedule option with the constraint-propagation engine.
+
+    Takes the same arguments and returns the same option dict as
+    scheduler.generate_option, so the two engines are interchangeable.
+    Committed (fixed) classes are taken out of the domains up front: a slot
+    is dropped when the instructor is booked over it or no room of its kind
+    is left free.
+    """
+    rng = rng or random.Random()
+    table = table.scoped()
+    rooms = rooms or (THEORY_ROOMS, LAB_ROOMS)
+    deadline = time.monotonic() + time_limit
+    phase_start = time.perf_counter()
+
+    def lap(phase):
+        nonlocal phase_start
+        if stats is not None:
+            now = time.perf_counter()
+            stats.add_time(phase, now - phase_start)
+            phase_start = now
+
+    entries = instructors.copy()
+    rng.shuffle(entries)
+    room_busy, instructor_busy = fixed_occupancy(fixed, table)
+    room_ids = {THEORY: [table.room_id(r) for r in rooms[0]], LAB: [table.room_id(r) for r in rooms[1]]}
+
+    def usable(name, kind, domain):
+        if not room_busy and not instructor_busy:
+            return domain
+        busy = instructor_busy.get(name, 0)
+        masks = table.slot_masks
+        return [
+            s for s in domain
+            if not busy & masks[s] and any(not room_busy.get(r, 0) & masks[s] for r in room_ids[kind])
+        ]
+
+    theory_domains = [usable(inst.get('name'), THEORY, theory_domain(inst, table)) for inst in entries]
+    lap("domains")
+    sequence = allocate_quotas(entries, theory_domains, total_sections, len(rooms[0]), fixed_workload(fixed))
+    lap("quotas")
+
+    # One theory variable per section, followed by its lab variable
+    variables = []
+    sections = []   # (entry index, theory var, lab var or None)
+    lab_domains = {}
+    for index in sequence:
+        inst = entries[index]
+        name = inst.get('name')
+        theory_var = len(variables)
+        variables.append((name, THEORY, theory_domains[index]))
+        lab_var = None
+        if inst.get('hasLab', False):
+            if index not in lab_domains:
+                lab_domains[index] = usable(name, LAB, lab_domain(inst, table))
+            lab_var = len(variables)
+            variables.append((name, LAB, lab_domains[index]))
+        sections.append((index, theory_var, lab_var))
+
+    search = CSPSearch(variables, table, rng, progress, rooms, room_busy)
+    for var, (_, _, domain) in enumerate(variables):
+        if not domain:
+            search.drop(var)
+
+    lap("setup")
+    solved = search.solve(deadline)
+    lap("search")
+    if not solved:
+        search.complete_greedily()
+        lap("greedyCompletion")
+    if progress:
+        progress(search.theory_placed, search.nodes)
+
+    option = _build_option(entries, sections, search, total_sections, option_num, table, compact)
+    if not solved:
+        # Where the search stopped depends on machine speed, so the same seed
+        # can give different classes
+        option["timedOut"] = True
+    lap("build")
+    if stats is not None:
+        stats.count("nodes", search.nodes)
+        stats.count("variables", len(variables))
+        stats.count("dropped", len(search.dropped))
+        stats.count("sectionsPlaced", search.theory_placed)
+        stats.count("timedOut", int(not solved))
+    return option
+
+def _build_option(entries, sections, search, total_sections, option_num, table, compact=False):
+    """Turn solved variables into the option dict the client expects (ClassColumns with compact)"""
+    columns = ClassColumns()
+    workload = {inst.get('name'): 0 for inst in entries}
+    lab_conflict_count = 0
+    section_counter = 0
+
+    for index, theory_var, lab_var in sections:
+        inst = entries[index]
+        name = inst.get('name', 'Unknown')
+        course = inst.get('courseCode', 'Unknown')
+        if theory_var not in search.assignment:
+            continue
+
+        section_counter += 1
+        workload[name] = workload.get(name, 0) + 1
+        columns.add(table, name, course, section_counter, False, *search.assignment[theory_var])
+
+        if lab_var is None:
+            continue
+        if lab_var in search.assignment:
+            columns.add(table, name, course, section_counter, True, *search.assignment[lab_var])
+        else:
+            lab_conflict_count += 1
+            columns.add(table, name, course, section_counter, True,
+                        reason="No lab slot fits the instructor's theory classes and free lab rooms")
+
+    conflict_count = max(0, total_sections - section_counter)
+    columns.unassigned_from = section_counter + 1
+    columns.unassigned = conflict_count
+
+    option = {"option": option_num}
+    if compact:
+        option["columns"] = columns
+    else:
+        option["classes"] = columns.to_dicts()
+    option.update(conflict_fields(conflict_count, lab_conflict_count))
+    option["workload"] = [{"name": k, "count": v} for k, v in workload.items()]
+    return option
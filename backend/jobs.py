@@ -0,0 +1,113 @@
+"""Background jobs shared by schedule generation and calendar parsing.
+
+A BackgroundJob runs on a JobManager's small local thread pool and publishes
+every change, so the HTTP request that submitted it returns at once and
+clients follow the job by polling its status or reading its NDJSON stream.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished jobs are kept this long (seconds) and at most this many
+JOB_TTL = 15 * 60
+MAX_FINISHED_JOBS = 100
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+FINISHED = (DONE, CANCELLED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when a JobManager already has max_pending jobs waiting or running"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's callbacks to stop it once it has been cancelled"""
+
+
+class BackgroundJob:
+    """Status of a job run by JobManager, shared between its worker and readers"""
+
+    def __init__(self):
+        self.id = secrets.token_hex(8)
+        self.status = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.changed = threading.Condition()
+        self.version = 0
+
+    def _publish(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until the job changes past version or finishes; return the current version"""
+        with self.changed:
+            if self.version == version and self.status not in FINISHED:
+                self.changed.wait(timeout)
+            return self.version
+
+    def run(self):
+        raise NotImplementedError
+
+    def _finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        self._publish()
+
+
+class JobManager:
+    """
+    Runs BackgroundJobs on a bounded local worker pool and keeps their results.
+
+    Subclasses add the stream method their job type's readers follow.
+    """
+
+    def __init__(self, workers, max_pending, name):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-job')
+        self.max_pending = max_pending
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit_job(self, job):
+        """Queue any BackgroundJob; raises JobQueueFull past max_pending"""
+        with self.lock:
+            self._expire()
+            pending = sum(1 for queued in self.jobs.values() if queued.status not in FINISHED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} {self.name} jobs are already pending")
+            self.jobs[job.id] = job
+        self.executor.submit(job.run)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop; returns the job or None if it is unknown"""
+        job = self.get(job_id)
+        if job and job.status not in FINISHED:
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                job._finish(CANCELLED)
+        return job
+
+    def _expire(self):
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job.status in FINISHED]
+        for job in finished:
+            if now - job.finished_at > JOB_TTL:
+                del self.jobs[job.id]
+        finished = [job for job in finished if job.id in self.jobs]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
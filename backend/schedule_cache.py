@@ -0,0 +1,155 @@
+"""Content-addressed cache for seeded schedule generation results.
+
+A request that names a seed gives the same options every time as long as no
+search stops on the clock: the optimizer (timeBudgetMs > 0) and a CSP run that
+hits its time limit depend on machine speed, so those responses are never
+cached (see is_cacheable). Everything else can be reused.
+
+Responses are stored as encoded JSON bodies under a SHA-256 of the canonical
+request (instructors, section count, options, seed, engine, time budget, and
+for warm starts the committed classes) and the room/slot configuration, so a
+repeated request skips both the generation and the JSON encoding. Entries
+expire after CACHE_TTL seconds and the least recently used ones are evicted
+past the entry and byte limits.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from scheduler import THEORY_ROOMS, LAB_ROOMS, TIME_SLOTS, LAB_TIME_SLOTS, THEORY_DAYS, SINGLE_DAYS
+
+# Cached responses kept at most, by count and by total body size
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds a cached response stays valid
+CACHE_TTL = 60 * 60
+
+# Rooms and slots the engines place into; part of every key so a change to
+# them never serves a schedule built for the old configuration
+SLOT_CONFIG = {
+    "theoryRooms": THEORY_ROOMS,
+    "labRooms": LAB_ROOMS,
+    "timeSlots": TIME_SLOTS,
+    "labTimeSlots": LAB_TIME_SLOTS,
+    "theoryDays": THEORY_DAYS,
+    "singleDays": SINGLE_DAYS
+}
+
+
+def request_key(params):
+    """
+    Canonical hash of a generation request.
+
+    Dict keys are sorted, but list order is kept: instructor and preference
+    order feed the seeded shuffles, so reordering them changes the result.
+
+    Args:
+        params: parsed request as returned by parse_generation_request
+
+    Returns:
+        str: hex SHA-256 digest
+    """
+    payload = {
+        "instructors": params["instructors"],
+        "totalSections": int(params["total_sections"]),
+        "numOptions": params["num_options"],
+        "candidates": params.get("candidates"),
+        "seed": params["seed"],
+        "engine": params["engine"],
+        "timeBudgetMs": params["time_budget_ms"],
+        "fixed": params.get("fixed"),
+        "sectionOffset": params.get("section_offset", 0),
+        "rationale": params.get("rationale", False),
+        "config": SLOT_CONFIG
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(params, options=None):
+    """
+    Whether a generation request, and its result when given, may be cached.
+
+    Args:
+        params: parsed request as returned by parse_generation_request
+        options: the generated options, checked for CSP runs that timed out
+
+    Returns:
+        bool: True when the same request is guaranteed to give the same response
+    """
+    if params["seed"] is None or params["time_budget_ms"]:
+        return False
+    # Ranked CSP runs return only the winning candidates, so a candidate that
+    # timed out would go unseen
+    if params["engine"] == "csp" and params.get("candidates"):
+        return False
+    return not any(option.get("timedOut") for option in options or [])
+
+
+class ResultCache:
+    """Thread-safe LRU cache of response bodies with a TTL and size limits"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (expires_at, body)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached body for key, or None on a miss or expired entry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, body):
+        """Store a body; bodies larger than the whole cache are not kept"""
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, body)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, body = self.entries.pop(key)
+        self.size -= len(body)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None
+            }
@@ -0,0 +1,226 @@
+"""Background schedule-generation jobs.
+
+A ScheduleJob spreads the shards of its options over the shared option pool
+and publishes progress and each option as soon as it is finished; see jobs
+for how jobs are queued and followed.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from jobs import CANCELLED, DONE, FAILED, FINISHED, RUNNING, BackgroundJob, JobManager
+from scheduler import (
+    GenerationCancelled, build_option, get_option_pool, merge_option, new_seed, offset_sections,
+    option_seeds, option_tasks, reset_option_pool, solve_shard
+)
+
+# Jobs running at the same time
+JOB_WORKERS = 2
+
+# Seconds between cancellation checks and progress updates while a job runs
+JOB_POLL_INTERVAL = 0.25
+
+# Jobs waiting or running before new submissions are refused
+MAX_PENDING_JOBS = 16
+
+
+class ScheduleJob(BackgroundJob):
+    """State of one generation job"""
+
+    def __init__(self, params):
+        super().__init__()
+        self.params = params
+        self.options = []
+        self.sections_placed = 0
+        self.attempts = 0
+
+    def best_conflict_count(self):
+        counts = [o["conflictCount"] for o in self.options]
+        return min(counts) if counts else None
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "error": self.error,
+            "seed": self.params["seed"],
+            "progress": {
+                "optionsReady": len(self.options),
+                "numOptions": self.params["num_options"],
+                "sectionsPlaced": self.sections_placed,
+                "attempts": self.attempts,
+                "bestConflictCount": self.best_conflict_count()
+            }
+        }
+
+    def results(self):
+        """The finished options in option order; they finish in any order"""
+        return sorted(self.options, key=lambda option: option["option"])
+
+    def run(self):
+        params = self.params
+        if self.cancel_event.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self._publish()
+
+        try:
+            self._run_pooled(params)
+            self._finish(DONE)
+        except GenerationCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            print(f"Schedule job {self.id} failed: {e}")
+            self.error = str(e)
+            self._finish(FAILED)
+
+    def _run_pooled(self, params):
+        """
+        Solve every (option, shard) task on the shared option pool.
+
+        Each option is merged and published as soon as its last shard
+        finishes, and cancellation is checked between finished tasks; a task
+        already running on the pool is left to finish. Falls back to
+        _run_serial if the pool breaks.
+        """
+        seeds = option_seeds(params["seed"], params["num_options"])
+        stats = params.get("stats", False)
+        fixed = params.get("fixed")
+        plan, tasks, budgets = option_tasks(
+            params["instructors"], params["total_sections"], seeds, params["time_budget_ms"], fixed
+        )
+        pool = get_option_pool()
+        futures = {}
+        try:
+            for index, (task, budget) in enumerate(zip(tasks, budgets)):
+                # Counters are always collected: they feed the attempts progress
+                future = pool.submit(solve_shard, *task, params["engine"], budget, None, True, fixed)
+                futures[future] = index
+        except BrokenProcessPool:
+            self._pool_broke(futures, params, seeds)
+            return
+
+        results = {}
+        pending = set(futures)
+        try:
+            while pending:
+                if self.cancel_event.is_set():
+                    raise GenerationCancelled()
+                done, pending = wait(pending, timeout=JOB_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if self.cancel_event.is_set():
+                        raise GenerationCancelled()
+                    index = futures[future]
+                    shard = future.result()
+                    counters = shard["stats"]["counters"]
+                    self.sections_placed += counters.get("sectionsPlaced", 0)
+                    self.attempts += counters.get("attempts", 0) + counters.get("nodes", 0)
+                    if not stats:
+                        shard.pop("stats")
+                    results[index] = shard
+                    option_index = index // len(plan)
+                    shard_indexes = range(option_index * len(plan), (option_index + 1) * len(plan))
+                    if all(i in results for i in shard_indexes):
+                        self._add_option(params, plan, seeds, option_index, [results.pop(i) for i in shard_indexes])
+                    self._publish()
+        except BrokenProcessPool:
+            self._pool_broke(pending, params, seeds)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _add_option(self, params, plan, seeds, option_index, shard_options):
+        option_num = option_index + 1
+        if len(plan) == 1:
+            option = shard_options[0]
+        else:
+            option = merge_option(
+                params["instructors"], params["total_sections"], option_num, seeds[option_index],
+                params["engine"], params["time_budget_ms"], params.get("stats", False),
+                shard_options, params.get("fixed"), plan
+            )
+        offset_sections(option, params.get("section_offset", 0))
+        self.options.append(option)
+
+    def _pool_broke(self, futures, params, seeds):
+        print(f"Option pool broke, finishing schedule job {self.id} serially")
+        reset_option_pool()
+        for future in futures:
+            future.cancel()
+        done = {option["option"] for option in self.options}
+        self._run_serial(params, [(n, seed) for n, seed in enumerate(seeds, start=1) if n not in done])
+
+    def _run_serial(self, params, numbered_seeds):
+        """Build the given (option number, seed) pairs one after another in this thread"""
+        attempts_before = self.attempts
+        last_publish = 0.0
+
+        def progress(placed, attempts):
+            nonlocal last_publish
+            if self.cancel_event.is_set():
+                raise GenerationCancelled()
+            self.attempts = attempts_before + attempts
+            now = time.monotonic()
+            if now - last_publish > JOB_POLL_INTERVAL:
+                last_publish = now
+                self._publish()
+
+        for option_num, seed in numbered_seeds:
+            option = build_option(
+                params["instructors"], params["total_sections"], option_num, seed,
+                params["engine"], params["time_budget_ms"], progress=progress,
+                stats=params.get("stats", False), fixed=params.get("fixed")
+            )
+            offset_sections(option, params.get("section_offset", 0))
+            attempts_before = self.attempts
+            self.sections_placed += sum(
+                1 for c in option["classes"] if c.get("type") != "lab" and c.get("courseCode") != "UNASSIGNED"
+            )
+            self.options.append(option)
+            self._publish()
+
+
+class ScheduleJobManager(JobManager):
+    """Runs schedule jobs and streams their options"""
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS):
+        super().__init__(workers, max_pending, name='schedule')
+
+    def submit(self, params):
+        """
+        Queue a job for the given generation parameters.
+
+        Args:
+            params: dict with instructors, total_sections, num_options, seed,
+                engine and time_budget_ms; a missing seed is filled in
+
+        Returns:
+            ScheduleJob: the queued job
+        """
+        if params.get("seed") is None:
+            params["seed"] = new_seed()
+        return self.submit_job(ScheduleJob(params))
+
+    def stream(self, job, heartbeat=15.0):
+        """
+        Yield job events as they happen, ending when the job finishes.
+
+        Events are dicts: {"event": "progress", ...status} whenever the job
+        changes, {"event": "option", "option": ...} once per finished option,
+        and a final {"event": <status>, ...status}.
+        """
+        sent = 0
+        version = -1
+        while True:
+            version = job.wait(version, heartbeat)
+            # Read before the options: a job only finishes after its last option
+            finished = job.status in FINISHED
+            while sent < len(job.options):
+                yield {"event": "option", "option": job.options[sent]}
+                sent += 1
+            status = job.to_dict()
+            if finished:
+                yield dict(status, event=job.status)
+                return
+            yield dict(status, event="progress")
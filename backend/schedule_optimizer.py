@@ -0,0 +1,379 @@
+"""Anytime local-search improvement for generated schedule options.
+
+optimize_option takes an option built by either engine and runs simulated
+annealing over it until its time budget runs out. Moves keep every hard
+constraint (room and instructor overlaps, instructor preferences), so any
+state the search visits is a valid schedule and the best one seen can be
+returned at the deadline. Preferences being hard, they carry no cost term.
+"""
+import math
+import random
+import time
+
+from scheduler import (
+    SLOT_TABLE, THEORY_ROOMS, LAB_ROOMS, TIME_SLOTS, LAB_TIME_SLOTS,
+    THEORY_DAYS, SINGLE_DAYS, conflict_summary, fixed_occupancy, get_time_range
+)
+
+# Cost of each schedule defect; the search minimises the weighted sum
+SCORE_WEIGHTS = {
+    "labConflicts": 1000,       # lab left as TBD
+    "gapMinutes": 0.1,          # idle time between an instructor's classes on one day
+    "extraDayPatterns": 20,     # theory spread over more than the primary day pattern
+    "roomChurn": 3              # extra rooms an instructor has to move between
+}
+
+# Upper bound on timeBudgetMs accepted from a request
+MAX_TIME_BUDGET_MS = 30000
+
+# Normal changeover between consecutive slots, not counted as a gap
+CHANGEOVER_MINUTES = 10
+
+# Starting and final annealing temperatures, in cost units
+START_TEMPERATURE = 50.0
+END_TEMPERATURE = 0.5
+
+
+def slot_intervals(table, slot_id):
+    """(single day index, start, end) for every day a slot covers, cached on the table"""
+    intervals = table.intervals.get(slot_id)
+    if intervals is None:
+        days, time_str = table.slots[slot_id]
+        try:
+            start, end = get_time_range(time_str)
+            intervals = tuple((table.single_day_index[d], start, end) for d in sorted(set(days)))
+        except (ValueError, IndexError, KeyError):
+            intervals = ()
+        table.intervals[slot_id] = intervals
+    return intervals
+
+
+class ScheduleState:
+    """
+    Mutable view of one option used by the local search.
+
+    Placed classes are kept as parallel lists indexed by class position, with
+    room and instructor occupancy bitsets so a move is validated with two ANDs.
+    Cost components are kept per instructor; a move touches at most two
+    instructors, so re-scoring it never walks the whole schedule. Committed
+    (fixed) classes are pre-booked in the bitsets and never moved.
+
+    Classes move between the rooms passed in (THEORY_ROOMS and LAB_ROOMS by
+    default) and any room the option already uses for their kind, so an
+    option built with custom rooms keeps to them.
+    """
+
+    def __init__(self, classes, instructors, table=SLOT_TABLE, weights=SCORE_WEIGHTS, fixed=None, rooms=None):
+        self.table = table = table.scoped()
+        self.weights = weights
+        self.classes = classes
+        self.slot = []
+        self.room = []
+        self.kind = []
+        self.faculty = []
+        self.domain = []
+        theory_rooms, lab_rooms = rooms or (THEORY_ROOMS, LAB_ROOMS)
+        self.rooms = {
+            "theory": list(dict.fromkeys(table.room_id(r) for r in theory_rooms)),
+            "lab": list(dict.fromkeys(table.room_id(r) for r in lab_rooms))
+        }
+        known_rooms = {kind: set(ids) for kind, ids in self.rooms.items()}
+        self.room_busy, self.instructor_busy = fixed_occupancy(fixed, table)
+        self.by_faculty = {}
+
+        entries = {(inst.get('name'), inst.get('courseCode')): inst for inst in instructors}
+        domains = {}
+        for index, cls in enumerate(classes):
+            kind = cls.get("type", "theory")
+            name = cls.get("faculty")
+            course = cls.get("courseCode", "")
+            if kind == "lab" and course.endswith("L"):
+                course = course[:-1]
+            inst = entries.get((name, course), {})
+
+            key = (name, course, kind)
+            if key not in domains:
+                domains[key] = self._domain(inst, kind)
+            domain = domains[key]
+
+            self.kind.append(kind)
+            self.faculty.append(name)
+            self.domain.append(domain)
+            if cls.get("days") == "TBD" or cls.get("courseCode") == "UNASSIGNED":
+                self.slot.append(None)
+                self.room.append(None)
+            else:
+                slot = table.slot_id(cls["days"], cls["time"])
+                room = table.room_id(cls["room"])
+                self.slot.append(slot)
+                self.room.append(room)
+                self._book(index, slot, room)
+                if kind in known_rooms and room not in known_rooms[kind]:
+                    known_rooms[kind].add(room)
+                    self.rooms[kind].append(room)
+            if cls.get("courseCode") != "UNASSIGNED":
+                self.by_faculty.setdefault(name, []).append(index)
+
+        self.movable = [i for i, cls in enumerate(classes) if cls.get("courseCode") != "UNASSIGNED" and self.domain[i]]
+        self.costs = {name: self._instructor_cost(name) for name in self.by_faculty}
+        self.total = sum(self._weighted(c) for c in self.costs.values())
+
+    def _domain(self, inst, kind):
+        """Slots a class may move to: the instructor's chosen days and times, or all of them"""
+        if kind == "lab":
+            days, times = inst.get('labDays', []), inst.get('labTimes', [])
+            default_days, default_times = SINGLE_DAYS, LAB_TIME_SLOTS
+        else:
+            days, times = inst.get('preferredDays', []), inst.get('availableTimes', [])
+            default_days, default_times = THEORY_DAYS, TIME_SLOTS
+        domain = [self.table.slot_id(d, t) for d in (days or default_days) for t in (times or default_times)]
+        return [s for s in dict.fromkeys(domain) if self.table.slot_masks[s]]
+
+    def _book(self, index, slot, room):
+        mask = self.table.slot_masks[slot]
+        name = self.faculty[index]
+        self.room_busy[room] = self.room_busy.get(room, 0) | mask
+        self.instructor_busy[name] = self.instructor_busy.get(name, 0) | mask
+
+    def _release(self, index):
+        mask = self.table.slot_masks[self.slot[index]]
+        name = self.faculty[index]
+        self.room_busy[self.room[index]] &= ~mask
+        self.instructor_busy[name] &= ~mask
+
+    def _instructor_cost(self, name):
+        """Raw cost components for one instructor's classes"""
+        lab_conflicts = 0
+        patterns = set()
+        rooms = set()
+        by_day = {}
+        for index in self.by_faculty.get(name, ()):
+            slot = self.slot[index]
+            if slot is None:
+                if self.kind[index] == "lab":
+                    lab_conflicts += 1
+                continue
+            if self.kind[index] == "theory":
+                patterns.add(self.table.slots[slot][0])
+                rooms.add(self.room[index])
+            for day, start, end in slot_intervals(self.table, slot):
+                by_day.setdefault(day, []).append((start, end))
+
+        gap_minutes = 0
+        for intervals in by_day.values():
+            intervals.sort()
+            for (_, end), (start, _) in zip(intervals, intervals[1:]):
+                gap_minutes += max(0, start - end - CHANGEOVER_MINUTES)
+
+        return (lab_conflicts, gap_minutes, max(0, len(patterns) - 1), max(0, len(rooms) - 1))
+
+    def _weighted(self, cost):
+        w = self.weights
+        return (cost[0] * w["labConflicts"] + cost[1] * w["gapMinutes"]
+                + cost[2] * w["extraDayPatterns"] + cost[3] * w["roomChurn"])
+
+    def breakdown(self):
+        """Score components over the whole schedule, as returned to the client"""
+        totals = [sum(c[i] for c in self.costs.values()) for i in range(4)]
+        return {
+            "total": round(self.total, 2),
+            "labConflicts": totals[0],
+            "gapMinutes": totals[1],
+            "extraDayPatterns": totals[2],
+            "roomChurn": totals[3]
+        }
+
+    def _free_room(self, kind, slot, rng, prefer=None):
+        mask = self.table.slot_masks[slot]
+        if prefer is not None and not self.room_busy.get(prefer, 0) & mask:
+            return prefer
+        rooms = self.rooms[kind]
+        if not rooms:
+            return None
+        start = rng.randrange(len(rooms))
+        for offset in range(len(rooms)):
+            room = rooms[(start + offset) % len(rooms)]
+            if not self.room_busy.get(room, 0) & mask:
+                return room
+        return None
+
+    def propose(self, rng):
+        """
+        Apply a random move and return (delta, undo) or None when it was not valid.
+
+        Moves: relocate a class to another slot of its domain, change its room,
+        swap the slots of two classes of the same kind, or place a TBD lab.
+        """
+        index = rng.choice(self.movable)
+        kind = self.kind[index]
+        name = self.faculty[index]
+        old = (self.slot[index], self.room[index])
+        move = rng.random()
+
+        if old[0] is not None and move < 0.3:
+            # Swap with another placed class of the same kind
+            other = rng.choice(self.movable)
+            other_old = (self.slot[other], self.room[other])
+            if other == index or self.kind[other] != kind or other_old[0] is None:
+                return None
+            if other_old[0] not in self.domain[index] or old[0] not in self.domain[other]:
+                return None
+            other_name = self.faculty[other]
+            self._release(index)
+            self._release(other)
+            blocked = (self.instructor_busy.get(name, 0) & self.table.slot_masks[other_old[0]]
+                       or self.instructor_busy.get(other_name, 0) & self.table.slot_masks[old[0]])
+            self._book(index, *old)
+            self._book(other, *other_old)
+            if blocked:
+                return None
+            return self._apply({index: other_old, other: old})
+
+        if old[0] is not None and move < 0.45:
+            # Same slot, different room
+            self._release(index)
+            room = self._free_room(kind, old[0], rng)
+            self._book(index, *old)
+            if room is None or room == old[1]:
+                return None
+            return self._apply({index: (old[0], room)})
+
+        # Relocate (or place, for a TBD lab) within the domain
+        slot = rng.choice(self.domain[index])
+        if old[0] is not None:
+            if slot == old[0]:
+                return None
+            self._release(index)
+        mask = self.table.slot_masks[slot]
+        room = None
+        if not self.instructor_busy.get(name, 0) & mask:
+            room = self._free_room(kind, slot, rng, prefer=old[1])
+        if old[0] is not None:
+            self._book(index, *old)
+        if room is None:
+            return None
+        return self._apply({index: (slot, room)})
+
+    def _apply(self, changes):
+        """Move classes to new (slot, room) pairs; return (delta, undo)"""
+        undo = {i: (self.slot[i], self.room[i]) for i in changes}
+        self._set(changes)
+        names = {self.faculty[i] for i in changes}
+        before = sum(self._weighted(self.costs[n]) for n in names)
+        old_costs = {n: self.costs[n] for n in names}
+        for n in names:
+            self.costs[n] = self._instructor_cost(n)
+        delta = sum(self._weighted(self.costs[n]) for n in names) - before
+        self.total += delta
+        return delta, (undo, old_costs, delta)
+
+    def _set(self, changes):
+        for i in changes:
+            if self.slot[i] is not None:
+                self._release(i)
+        for i, (slot, room) in changes.items():
+            self.slot[i] = slot
+            self.room[i] = room
+            if slot is not None:
+                self._book(i, slot, room)
+
+    def revert(self, undo):
+        changes, old_costs, delta = undo
+        self._set(changes)
+        self.costs.update(old_costs)
+        self.total -= delta
+
+    def snapshot(self):
+        return list(self.slot), list(self.room)
+
+    def to_classes(self, snapshot):
+        """Rebuild the class list from a (slots, rooms) snapshot"""
+        slots, rooms = snapshot
+        classes = []
+        for index, cls in enumerate(self.classes):
+            cls = dict(cls)
+            slot = slots[index]
+            if slot is not None and cls.get("courseCode") != "UNASSIGNED":
+                day_val, time_val = self.table.slots[slot]
+                cls.update(days=day_val, time=time_val, room=self.table.rooms[rooms[index]])
+                # A placed class is explained by with_rationales, not by a stale conflict reason
+                cls.pop("conflict", None)
+                cls.pop("rationale", None)
+            classes.append(cls)
+        return classes
+
+
+def optimize_option(option, instructors, time_budget_ms, rng=None, table=SLOT_TABLE, weights=SCORE_WEIGHTS, progress=None, stats=None, fixed=None, rooms=None):
+    """
+    Improve an option by simulated annealing until the time budget is spent.
+
+    Args:
+        option: option dict from generate_option or solve_option
+        instructors: the instructor dicts the option was built from
+        time_budget_ms: wall-clock budget for the search
+        rng: random.Random driving the moves
+        table: SlotTable the option's slots are interned in
+        weights: cost per defect, see SCORE_WEIGHTS
+        progress: optional callback(sections_placed, iterations), see generate_option
+        stats: optional GenerationStats; the search is timed as the "optimize" phase
+        fixed: committed classes moves must not collide with, see generate_option
+        rooms: optional (theory rooms, lab rooms) the option was built with
+
+    Returns:
+        dict: the best option found, with "score" and "optimizer" summaries
+    """
+    rng = rng or random.Random()
+    started = time.perf_counter()
+    budget = max(0, time_budget_ms) / 1000.0
+
+    state = ScheduleState(option["classes"], instructors, table, weights, fixed, rooms)
+    initial = state.breakdown()
+    best_total = state.total
+    best = state.snapshot()
+    iterations = 0
+    accepted = 0
+
+    placed = sum(1 for c in option["classes"] if c.get("type") == "theory" and c.get("courseCode") != "UNASSIGNED")
+    if state.movable:
+        elapsed = 0.0
+        temperature = START_TEMPERATURE
+        while elapsed < budget:
+            iterations += 1
+            if iterations % 64 == 0:
+                elapsed = time.perf_counter() - started
+                temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** min(1.0, elapsed / budget)
+                if progress:
+                    progress(placed, iterations)
+
+            result = state.propose(rng)
+            if result is None:
+                continue
+            delta, undo = result
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                accepted += 1
+                if state.total < best_total - 1e-9:
+                    best_total = state.total
+                    best = state.snapshot()
+            else:
+                state.revert(undo)
+
+    # Score the best snapshot, not wherever the walk ended
+    final = ScheduleState(state.to_classes(best), instructors, table, weights, fixed, rooms)
+    classes = final.to_classes(final.snapshot())
+
+    result = dict(option)
+    result["classes"] = classes
+    result.update(conflict_summary(classes))
+    if stats is not None:
+        stats.add_time("optimize", time.perf_counter() - started)
+        stats.count("optimizerIterations", iterations)
+        stats.count("optimizerAccepted", accepted)
+    result["score"] = final.breakdown()
+    result["optimizer"] = {
+        "timeBudgetMs": time_budget_ms,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        "iterations": iterations,
+        "accepted": accepted,
+        "initialScore": initial
+    }
+    return result
@@ -0,0 +1,246 @@
+"""Batch scoring of many schedule candidates with NumPy.
+
+generate_ranked builds a few hundred independent candidates (on the option
+pool), encodes all of them at once as flat class arrays (candidate,
+instructor, slot, room, kind) and scores the whole batch with array
+operations. It then returns the best K with their score breakdowns.
+Candidates come back from the pool as compact ClassColumns and are read as
+arrays directly, so class dicts are only built for the K winners; every
+score is a NumPy reduction over the batch.
+"""
+import random
+
+import numpy as np
+
+from csp_solver import lab_domain, theory_domain
+from scheduler import SLOT_TABLE, THEORY_ROOMS, LAB_ROOMS, expand_option, generate_options
+from schedule_optimizer import CHANGEOVER_MINUTES, optimize_option, slot_intervals
+
+# Cost of each defect when ranking candidates; lower totals rank first
+RANK_WEIGHTS = {
+    "unassigned": 1000,         # theory section left UNASSIGNED
+    "labConflicts": 1000,       # lab left as TBD
+    "preferenceMisses": 50,     # class outside the instructor's chosen days/times
+    "gapMinutes": 0.1,          # idle time between an instructor's classes on one day
+    "roomSpread": 5,            # std-dev of classes per room, theory and lab rooms
+    "workloadVariance": 10      # variance of sections per instructor
+}
+
+# Upper bound on candidates accepted from a request
+MAX_CANDIDATES = 500
+
+
+def _preferred_slots(instructors, table, kind):
+    """Per instructor, the slot IDs they chose, or None when they left the choice open"""
+    if kind == "lab":
+        keys, domain = ('labDays', 'labTimes'), lab_domain
+    else:
+        keys, domain = ('preferredDays', 'availableTimes'), theory_domain
+    return [domain(inst, table) if (inst.get(keys[0]) or inst.get(keys[1])) else None for inst in instructors]
+
+def _preference_matrix(preferred_slots, slot_count):
+    """(instructors + 1) x slots bool matrix of preferred slots; the extra row accepts everything"""
+    preferred = np.ones((len(preferred_slots) + 1, slot_count), dtype=bool)
+    for row, slots in enumerate(preferred_slots):
+        if slots is not None:
+            preferred[row] = False
+            preferred[row, slots] = True
+    return preferred
+
+def _slot_arrays(table):
+    """Per-slot day indices (two columns, -1 padded), start and end minutes"""
+    count = len(table.slots)
+    days = np.full((count, 2), -1, dtype=np.int64)
+    start = np.zeros(count, dtype=np.int64)
+    end = np.zeros(count, dtype=np.int64)
+    for slot in range(count):
+        for k, (day, slot_start, slot_end) in enumerate(slot_intervals(table, slot)[:2]):
+            days[slot, k] = day
+            start[slot], end[slot] = slot_start, slot_end
+    return days, start, end
+
+def _encode_classes(classes, faculty_index, unknown, table):
+    """Placed-class rows (faculty, slot, room, is_lab) of class dicts, plus unassigned and lab-conflict counts"""
+    faculty, slot, room, is_lab = [], [], [], []
+    unassigned = lab_conflicts = 0
+    for cls in classes:
+        if cls.get("courseCode") == "UNASSIGNED":
+            unassigned += 1
+        elif cls.get("conflict") or cls.get("days") == "TBD":
+            lab_conflicts += 1
+        else:
+            faculty.append(faculty_index.get(cls["faculty"], unknown))
+            slot.append(table.slot_id(cls["days"], cls["time"]))
+            room.append(table.room_id(cls["room"]))
+            is_lab.append(cls.get("type") == "lab")
+    rows = (
+        np.asarray(faculty, dtype=np.int64),
+        np.asarray(slot, dtype=np.int64),
+        np.asarray(room, dtype=np.int64),
+        np.asarray(is_lab, dtype=bool)
+    )
+    return rows, unassigned, lab_conflicts
+
+def _lookup(ids, values):
+    """Array mapping each key of ids (dict of small int -> value) to values(value)"""
+    table = np.zeros(max(ids, default=-1) + 1, dtype=np.int64)
+    for key, value in ids.items():
+        table[key] = values(value)
+    return table
+
+def _encode_columns(columns, faculty_index, unknown, table):
+    """Same rows as _encode_classes, read straight from ClassColumns without building dicts"""
+    placed = np.asarray(columns.reason) < 0
+    # Slot and room IDs come from the table that built the option (maybe in a
+    # worker process), so they are re-interned here by name
+    slots = _lookup(columns.slot_keys, lambda key: table.slot_id(*key))
+    rooms = _lookup(columns.room_names, table.room_id)
+    names = np.asarray([faculty_index.get(name, unknown) for name in columns.names], dtype=np.int64)
+    rows = (
+        names[np.asarray(columns.faculty)[placed]],
+        slots[np.asarray(columns.slot)[placed]],
+        rooms[np.asarray(columns.room)[placed]],
+        np.asarray(columns.lab, dtype=bool)[placed]
+    )
+    return rows, columns.unassigned, int((~placed).sum())
+
+def score_candidates(options, instructors, table=SLOT_TABLE, weights=RANK_WEIGHTS):
+    """
+    Score a batch of options at once.
+
+    Args:
+        options: option dicts from generate_option or solve_option, with
+            "classes" or compact "columns"
+        instructors: the instructor dicts the options were built from
+        table: SlotTable the options' slots are interned in
+        weights: cost per defect, see RANK_WEIGHTS
+
+    Returns:
+        list: one score breakdown dict per option, in input order
+    """
+    table = table.scoped()
+    count = len(options)
+    by_name = {}
+    for inst in instructors:
+        by_name.setdefault(inst.get('name'), inst)
+    named = list(by_name.values())
+    faculty_index = {name: i for i, name in enumerate(by_name)}
+    unknown = len(named)
+
+    # Encode every placed class of every candidate as one row
+    parts = []
+    unassigned = np.zeros(count)
+    lab_conflicts = np.zeros(count)
+    workload = np.zeros((count, len(faculty_index)))
+    for c, option in enumerate(options):
+        if "columns" in option:
+            rows, unassigned[c], lab_conflicts[c] = _encode_columns(option["columns"], faculty_index, unknown, table)
+        else:
+            rows, unassigned[c], lab_conflicts[c] = _encode_classes(option["classes"], faculty_index, unknown, table)
+        parts.append((np.full(len(rows[0]), c, dtype=np.int64),) + rows)
+        for entry in option.get("workload", []):
+            if entry["name"] in faculty_index:
+                workload[c, faculty_index[entry["name"]]] = entry["count"]
+
+    # Matrices are built after encoding so every slot the batch uses is interned
+    if parts:
+        cand, faculty, slot, room, is_lab = (np.concatenate(column) for column in zip(*parts))
+    else:
+        cand = faculty = slot = room = np.zeros(0, dtype=np.int64)
+        is_lab = np.zeros(0, dtype=bool)
+    room_columns = [[table.room_id(r) for r in rooms] for rooms in (THEORY_ROOMS, LAB_ROOMS)]
+    theory_slots = _preferred_slots(named, table, "theory")
+    lab_slots = _preferred_slots(named, table, "lab")
+    theory_pref = _preference_matrix(theory_slots, len(table.slots))
+    lab_pref = _preference_matrix(lab_slots, len(table.slots))
+    slot_days, slot_start, slot_end = _slot_arrays(table)
+
+    # Preference hits: one fancy-index lookup per kind
+    hit = np.where(is_lab, lab_pref[faculty, slot], theory_pref[faculty, slot])
+    hits = np.bincount(cand, weights=hit.astype(float), minlength=count)
+    misses = np.bincount(cand, minlength=count) - hits
+
+    # Room utilisation spread: classes per room, std-dev within each room kind
+    usage = np.zeros((count, len(table.rooms)))
+    np.add.at(usage, (cand, room), 1)
+    spread = np.zeros(count)
+    for columns in room_columns:
+        spread += usage[:, columns].std(axis=1)
+
+    # Idle gaps: one interval per (class, day), sorted by candidate, instructor,
+    # day and start; consecutive rows of the same group give the gap
+    row_cand = np.concatenate([cand, cand])
+    row_faculty = np.concatenate([faculty, faculty])
+    row_day = np.concatenate([slot_days[slot, 0], slot_days[slot, 1]])
+    row_start = np.concatenate([slot_start[slot], slot_start[slot]])
+    row_end = np.concatenate([slot_end[slot], slot_end[slot]])
+    keep = row_day >= 0
+    row_cand, row_faculty, row_day = row_cand[keep], row_faculty[keep], row_day[keep]
+    row_start, row_end = row_start[keep], row_end[keep]
+    order = np.lexsort((row_start, row_day, row_faculty, row_cand))
+    row_cand, row_faculty, row_day = row_cand[order], row_faculty[order], row_day[order]
+    row_start, row_end = row_start[order], row_end[order]
+    same = (
+        (row_cand[1:] == row_cand[:-1])
+        & (row_faculty[1:] == row_faculty[:-1])
+        & (row_day[1:] == row_day[:-1])
+    )
+    gap = np.where(same, row_start[1:] - row_end[:-1] - CHANGEOVER_MINUTES, 0)
+    gaps = np.bincount(row_cand[:-1], weights=np.maximum(gap, 0), minlength=count) if len(gap) else np.zeros(count)
+
+    variance = workload.var(axis=1) if workload.shape[1] else np.zeros(count)
+
+    components = {
+        "unassigned": unassigned,
+        "labConflicts": lab_conflicts,
+        "preferenceMisses": misses,
+        "gapMinutes": gaps,
+        "roomSpread": spread,
+        "workloadVariance": variance
+    }
+    total = sum(weights.get(name, 0) * values for name, values in components.items())
+
+    return [
+        dict(
+            {name: round(float(values[c]), 3) for name, values in components.items()},
+            preferenceHits=int(hits[c]),
+            total=round(float(total[c]), 3)
+        )
+        for c in range(count)
+    ]
+
+def generate_ranked(instructors, total_sections, candidates, top_k=3, seed=None, engine='greedy', time_budget_ms=0, stats=False, fixed=None):
+    """
+    Build many candidates, score them as a batch and keep the best top_k.
+
+    The optimizer budget, if any, is spent only on the winners, which are
+    then scored again.
+
+    Returns:
+        tuple: (top_k options ranked best first, each with "rank", "candidate" and "ranking", seed)
+    """
+    # Candidates stay compact; only the winners are expanded to class dicts
+    options, seed = generate_options(
+        instructors, total_sections, candidates, seed=seed, engine=engine, stats=stats, fixed=fixed, compact=True
+    )
+    scores = score_candidates(options, instructors)
+    best = sorted(range(len(options)), key=lambda i: (scores[i]["total"], i))[:top_k]
+    winners = [expand_option(options[i]) for i in best]
+
+    if time_budget_ms:
+        winners = [
+            optimize_option(option, instructors, time_budget_ms, random.Random(option["seed"]), fixed=fixed)
+            for option in winners
+        ]
+        rescored = score_candidates(winners, instructors)
+        order = sorted(range(len(winners)), key=lambda i: (rescored[i]["total"], i))
+        winners = [winners[i] for i in order]
+        ranking = [rescored[i] for i in order]
+    else:
+        ranking = [scores[i] for i in best]
+
+    ranked = []
+    for rank, (option, score) in enumerate(zip(winners, ranking), start=1):
+        option = dict(option, candidate=option["option"], option=rank, rank=rank, ranking=score)
+        ranked.append(option)
+    return ranked, seed
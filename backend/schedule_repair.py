@@ -0,0 +1,426 @@
+"""Incremental repair of a generated schedule option.
+
+repair_option applies a delta (instructors added, removed or updated, rooms
+taken out) to an existing option. Classes the delta does not touch keep their
+slot and room; only the affected sections are re-placed, against occupancy
+bitsets of everything that stays. The search work therefore grows with the
+size of the change, and the returned change list tells the client exactly
+which classes moved.
+"""
+import random
+
+from csp_solver import lab_domain, theory_domain
+from scheduler import SLOT_TABLE, THEORY_ROOMS, LAB_ROOMS, OccupancyIndex, conflict_summary, unassigned_class
+
+
+def apply_delta(instructors, delta):
+    """
+    Apply an instructor delta to an instructor list.
+
+    Args:
+        instructors: instructor dicts the option was built from
+        delta: dict with optional "addInstructors" (instructor dicts),
+            "removeInstructors" (names) and "updateInstructors" (dicts with a
+            name and the fields that changed)
+
+    Returns:
+        tuple: (new instructor list, set of names whose sections may move)
+    """
+    known = {inst.get('name') for inst in instructors}
+    removed = set(delta.get('removeInstructors', []))
+    updates = {}
+    for update in delta.get('updateInstructors', []):
+        updates[update.get('name')] = update
+
+    for name in removed | set(updates):
+        if name not in known:
+            raise ValueError(f"Instructor {name} is not part of the schedule")
+
+    result = []
+    for inst in instructors:
+        name = inst.get('name')
+        if name in removed:
+            continue
+        if name in updates:
+            inst = dict(inst, **updates[name])
+        result.append(inst)
+
+    added = set()
+    for inst in delta.get('addInstructors', []):
+        name = inst.get('name')
+        if not name:
+            raise ValueError("Added instructors need a name")
+        if name in known - removed or name in added:
+            raise ValueError(f"Instructor {name} is already part of the schedule")
+        added.add(name)
+        result.append(inst)
+
+    return result, removed | set(updates) | added
+
+
+def _is_placed(cls):
+    return cls is not None and cls.get("courseCode") != "UNASSIGNED" and cls.get("days") != "TBD"
+
+def _section_key(section):
+    return len(section), section
+
+def _placement(cls):
+    if not _is_placed(cls):
+        return None
+    return {"courseCode": cls["courseCode"], "faculty": cls.get("faculty"), "days": cls["days"], "time": cls["time"], "room": cls["room"]}
+
+
+class _Repair:
+    """Occupancy of the kept classes plus the placement helpers that use it"""
+
+    def __init__(self, instructors, removed_rooms, rng, table):
+        self.table = table
+        self.rng = rng
+        self.occupancy = OccupancyIndex(table)
+        # One instructor may have a row per course: rows are keyed by
+        # (name, courseCode), while the calendar and the load are per name
+        self.rows = {}
+        self.keys_by_name = {}
+        for inst in instructors:
+            key = (inst.get('name'), inst.get('courseCode'))
+            if key not in self.rows:
+                self.rows[key] = inst
+                self.keys_by_name.setdefault(key[0], []).append(key)
+        self.load = {name: 0 for name in self.keys_by_name}
+        self.primary_days = {}
+        self.rooms = {
+            "theory": [table.room_id(r) for r in THEORY_ROOMS if r not in removed_rooms],
+            "lab": [table.room_id(r) for r in LAB_ROOMS if r not in removed_rooms]
+        }
+        self._domains = {}
+
+    def row_key(self, name, course):
+        """Key of the row teaching course for name, or the name's first row; None if name is gone"""
+        keys = self.keys_by_name.get(name)
+        if not keys:
+            return None
+        return (name, course) if (name, course) in self.rows else keys[0]
+
+    def has_lab(self, key):
+        return bool(self.rows[key].get('hasLab', False))
+
+    def domain(self, key, kind):
+        if (key, kind) not in self._domains:
+            inst = self.rows[key]
+            if kind == "lab":
+                self._domains[(key, kind)] = lab_domain(inst, self.table)
+            else:
+                self._domains[(key, kind)] = theory_domain(inst, self.table)
+        return self._domains[(key, kind)]
+
+    def slot_of(self, cls):
+        return self.table.slot_id(cls["days"], cls["time"])
+
+    def keep(self, cls):
+        self.occupancy.book(cls["faculty"], self.table.room_id(cls["room"]), self.slot_of(cls))
+
+    def capacity(self, key):
+        """Sections the row may still take; like the generator, its maxSections caps the name's total"""
+        return int(self.rows[key].get('maxSections', 3)) - self.load[key[0]]
+
+    def _free_room(self, kind, slot, prefer=None):
+        mask = self.table.slot_masks[slot]
+        if prefer is not None and prefer in self.rooms[kind] and self.occupancy.room_free(prefer, mask):
+            return prefer
+        rooms = [r for r in self.rooms[kind] if self.occupancy.room_free(r, mask)]
+        return self.rng.choice(rooms) if rooms else None
+
+    def _ordered(self, domain, keep_slot=None, primary=None):
+        """Candidate slots: the current slot first, then the primary day pattern, then the rest"""
+        rest = [s for s in domain if s != keep_slot]
+        self.rng.shuffle(rest)
+        if primary:
+            rest.sort(key=lambda s: self.table.slots[s][0] != primary)
+        return ([keep_slot] if keep_slot in domain else []) + rest
+
+    def place_lab(self, key, keep=None, extra_busy=0):
+        """Find (slot, room) for a lab of the row key, preferring the lab's current placement"""
+        name = key[0]
+        keep_slot = self.slot_of(keep) if _is_placed(keep) else None
+        keep_room = self.table.room_id(keep["room"]) if keep_slot is not None else None
+        busy = self.occupancy.instructor_busy.get(name, 0) | extra_busy
+        for slot in self._ordered(self.domain(key, "lab"), keep_slot):
+            if busy & self.table.slot_masks[slot]:
+                continue
+            room = self._free_room("lab", slot, keep_room if slot == keep_slot else None)
+            if room is not None:
+                return slot, room
+        return None
+
+    def place_section(self, key, need_lab, keep=None, keep_lab=None):
+        """
+        Find a theory placement for the row key, with a lab when need_lab.
+
+        A theory slot that also leaves room for the lab wins; otherwise the
+        first theory slot that fits is used and the lab is left to the caller.
+
+        Returns:
+            tuple: ((slot, room), (lab slot, lab room) or None), or None if no theory slot fits
+        """
+        keep_slot = self.slot_of(keep) if _is_placed(keep) else None
+        keep_room = self.table.room_id(keep["room"]) if keep_slot is not None else None
+        name = key[0]
+        primary = self.primary_days.get(name)
+        fallback = None
+        for slot in self._ordered(self.domain(key, "theory"), keep_slot, primary):
+            mask = self.table.slot_masks[slot]
+            if not self.occupancy.instructor_free(name, mask):
+                continue
+            room = self._free_room("theory", slot, keep_room if slot == keep_slot else None)
+            if room is None:
+                continue
+            if not need_lab:
+                return (slot, room), None
+            lab = self.place_lab(key, keep_lab, extra_busy=mask)
+            if lab is not None:
+                return (slot, room), lab
+            if fallback is None:
+                fallback = (slot, room)
+        if fallback is None:
+            return None
+        return fallback, None
+
+    def book(self, name, slot, room):
+        self.occupancy.book(name, room, slot)
+
+
+def repair_option(option, instructors, delta, rng=None, table=SLOT_TABLE):
+    """
+    Re-place only the sections of an option affected by a delta.
+
+    Sections move when their instructor is removed, updated so that the class
+    no longer fits (preferences, lab flag, maxSections) or when their room is
+    taken out. A moved section keeps its course and is only given to rows
+    teaching that course; unassigned sections and TBD labs are retried
+    against the new instructor list. Everything else keeps its slot and room.
+
+    Args:
+        option: option dict from generate_option or solve_option
+        instructors: the instructor dicts the option was built from
+        delta: see apply_delta; "removeRooms" lists rooms no longer available
+        rng: random.Random used to break ties
+        table: SlotTable the option's slots are interned in
+
+    Returns:
+        dict: the repaired option, with a "repair" summary listing each change
+    """
+    rng = rng or random.Random()
+    table = table.scoped()
+    new_instructors, affected = apply_delta(instructors, delta)
+    removed_rooms = set(delta.get('removeRooms', []))
+    repair = _Repair(new_instructors, removed_rooms, rng, table)
+
+    # Group classes by section; section numbers are unique within an option
+    sections = {}
+    for cls in option["classes"]:
+        entry = sections.setdefault(cls["section"], {"theory": None, "lab": None})
+        entry[cls.get("type", "theory")] = dict(cls)
+
+    def room_ok(cls):
+        return cls["room"] not in removed_rooms
+
+    # Only instructors named in the delta have their classes re-checked
+    # against their preferences; the rest only lose a room that was removed
+    def theory_fits(cls, key):
+        if key[0] in affected and repair.slot_of(cls) not in repair.domain(key, "theory"):
+            return False
+        return room_ok(cls)
+
+    def lab_fits(cls, theory, key):
+        if key[0] not in affected:
+            return room_ok(cls)
+        if not (room_ok(cls) and repair.slot_of(cls) in repair.domain(key, "lab")):
+            return False
+        return not (table.slot_masks[repair.slot_of(cls)] & table.slot_masks[repair.slot_of(theory)])
+
+    # Sort every section into kept, moved within its instructor, or orphaned.
+    # A section keeps its courseCode; its row is the instructor's row for that course
+    row_of = {}
+    keep_theory = []
+    move_theory = []    # same instructor, new theory slot
+    move_lab = []       # theory kept, lab needs a new slot
+    orphans = []        # needs a (possibly new) instructor
+    for section, entry in sections.items():
+        theory, lab = entry["theory"], entry["lab"]
+        if not _is_placed(theory):
+            orphans.append(section)
+            continue
+        key = repair.row_key(theory["faculty"], theory["courseCode"])
+        if key is None:
+            orphans.append(section)
+            continue
+        row_of[section] = key
+        if not theory_fits(theory, key):
+            move_theory.append(section)
+            continue
+        keep_theory.append(section)
+        if repair.has_lab(key) and not (_is_placed(lab) and lab_fits(lab, theory, key)):
+            move_lab.append(section)
+
+    # Keep sections in section order so over-quota instructors lose their last ones
+    keep_theory.sort(key=_section_key)
+    for section in keep_theory:
+        theory = sections[section]["theory"]
+        key = row_of[section]
+        if repair.capacity(key) <= 0:
+            orphans.append(section)
+            continue
+        repair.load[key[0]] += 1
+        repair.keep(theory)
+        lab = sections[section]["lab"]
+        if section not in move_lab and repair.has_lab(key) and _is_placed(lab):
+            repair.keep(lab)
+    keep_theory = [s for s in keep_theory if s not in orphans]
+    move_lab = [s for s in move_lab if s not in orphans]
+
+    for section in keep_theory:
+        theory = sections[section]["theory"]
+        repair.primary_days.setdefault(theory["faculty"], theory["days"])
+
+    placed = {}     # section -> (row key, (slot, room), lab or None, lab needed)
+
+    for section in move_theory:
+        theory = sections[section]["theory"]
+        key = row_of[section]
+        if repair.capacity(key) <= 0:
+            orphans.append(section)
+            continue
+        need_lab = repair.has_lab(key)
+        found = repair.place_section(key, need_lab, theory, sections[section]["lab"])
+        if found is None:
+            orphans.append(section)
+            continue
+        _commit(repair, placed, section, key, found, need_lab)
+
+    for section in move_lab:
+        key = row_of[section]
+        lab = repair.place_lab(key, sections[section]["lab"])
+        if lab is not None:
+            repair.book(key[0], *lab)
+        placed[section] = (key, None, lab, True)
+
+    # An orphan keeps its course, so only rows teaching it may take it: their
+    # hasLab and domains are the course's own. An unassigned section has no
+    # course yet and may go to any row. The least loaded instructor goes first
+    for section in sorted(orphans, key=_section_key):
+        theory = sections[section]["theory"]
+        course = theory["courseCode"] if _is_placed(theory) else None
+        candidates = [key for key in repair.rows if repair.capacity(key) > 0 and course in (None, key[1])]
+        rng.shuffle(candidates)
+        candidates.sort(key=lambda k: repair.load[k[0]])
+        for key in candidates:
+            need_lab = repair.has_lab(key)
+            found = repair.place_section(key, need_lab)
+            if found is not None:
+                _commit(repair, placed, section, key, found, need_lab)
+                break
+        else:
+            placed[section] = None
+
+    classes = _rebuild(option["classes"], sections, placed, repair)
+    changes = _diff(option["classes"], classes)
+    workload = [{"name": name, "count": repair.load[name]} for name in repair.keys_by_name]
+
+    result = dict(option)
+    result["classes"] = classes
+    result["workload"] = workload
+    result.update(conflict_summary(classes))
+    changed = {(c["section"], c["type"]) for c in changes}
+    result["repair"] = {
+        "changes": changes,
+        "kept": sum(1 for c in classes if _is_placed(c) and (c["section"], c["type"]) not in changed)
+    }
+    return result
+
+def _commit(repair, placed, section, key, found, need_lab):
+    name = key[0]
+    (slot, room), lab = found
+    repair.book(name, slot, room)
+    if lab is not None:
+        repair.book(name, *lab)
+    repair.load[name] += 1
+    repair.primary_days.setdefault(name, repair.table.slots[slot][0])
+    placed[section] = (key, (slot, room), lab, need_lab)
+
+def _rebuild(original, sections, placed, repair):
+    """Class list in the original order with the repaired sections swapped in"""
+    table = repair.table
+    classes = []
+    emitted = set()
+    for cls in original:
+        section = cls["section"]
+        if section in emitted:
+            continue
+        emitted.add(section)
+        entry = sections[section]
+        theory, lab = entry["theory"], entry["lab"]
+
+        if section not in placed:
+            classes.append(theory)
+            key = repair.row_key(theory["faculty"], theory["courseCode"]) if _is_placed(theory) else None
+            if lab is not None and key is not None and repair.has_lab(key):
+                lab["courseCode"] = f"{theory['courseCode']}L"
+                classes.append(lab)
+            continue
+
+        if placed[section] is None:
+            classes.append(unassigned_class(section))
+            continue
+
+        (name, course), theory_place, lab_place, need_lab = placed[section]
+        # A section keeps its course; only an unassigned one takes its new row's
+        course = theory["courseCode"] if _is_placed(theory) else (course or 'Unknown')
+        if theory_place is None:
+            classes.append(theory)
+        else:
+            day_val, time_val = table.slots[theory_place[0]]
+            classes.append({
+                "courseCode": course,
+                "section": section,
+                "faculty": name,
+                "days": day_val,
+                "time": time_val,
+                "room": table.rooms[theory_place[1]],
+                "type": "theory"
+            })
+        if not need_lab:
+            continue
+        if lab_place is None:
+            classes.append({
+                "courseCode": f"{course}L",
+                "section": section,
+                "faculty": name,
+                "days": "TBD",
+                "time": "TBD",
+                "room": "TBD",
+                "type": "lab",
+                "conflict": True,
+                "rationale": "No lab slot fits the instructor's theory classes and free lab rooms"
+            })
+        else:
+            lab_day, lab_time = table.slots[lab_place[0]]
+            classes.append({
+                "courseCode": f"{course}L",
+                "section": section,
+                "faculty": name,
+                "days": lab_day,
+                "time": lab_time,
+                "room": table.rooms[lab_place[1]],
+                "type": "lab"
+            })
+    return classes
+
+def _diff(before, after):
+    """Classes whose instructor, slot or room differ between two class lists"""
+    old = {(c["section"], c.get("type", "theory")): _placement(c) for c in before}
+    new = {(c["section"], c.get("type", "theory")): _placement(c) for c in after}
+    changes = []
+    for key in list(old) + [k for k in new if k not in old]:
+        if old.get(key) != new.get(key):
+            changes.append({"section": key[0], "type": key[1], "from": old.get(key), "to": new.get(key)})
+    return changes
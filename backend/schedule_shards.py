@@ -0,0 +1,235 @@
+"""Decomposition of a generation request into independent shards.
+
+Two instructors interact only if they can want overlapping slots of the
+same kind: they then compete for the same room pool (theory or lab). An
+entry that repeats an instructor name shares that instructor's calendar.
+plan_shards builds that conflict graph with union-find over interned slots
+and splits the instructors into its connected components. Each component is
+solved on its own and merge_shards stitches the results back into one
+option, renumbering sections and verifying that no room or instructor is
+double-booked across shards.
+"""
+from csp_solver import lab_domain, theory_domain
+from scheduler import SLOT_TABLE, OccupancyIndex, conflict_summary, fixed_workload, unassigned_class
+
+
+class ShardMergeError(Exception):
+    """Raised when merged shards double-book a room or an instructor"""
+
+
+def conflict_components(instructors, table=SLOT_TABLE):
+    """
+    Group instructors that can interfere with each other.
+
+    Args:
+        instructors: list of instructor dicts
+        table: SlotTable used to intern the candidate slots
+
+    Returns:
+        list: lists of instructor indices, one per component, ordered by first member
+    """
+    table = table.scoped()
+    parent = list(range(len(instructors)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    first_by_name = {}
+    owners = {}     # (kind, slot) -> first instructor index that may use it
+    for i, inst in enumerate(instructors):
+        name = inst.get('name')
+        if name in first_by_name:
+            union(i, first_by_name[name])
+        else:
+            first_by_name[name] = i
+
+        domains = [('theory', theory_domain(inst, table))]
+        if inst.get('hasLab', False):
+            domains.append(('lab', lab_domain(inst, table)))
+        for kind, domain in domains:
+            for slot in domain:
+                owner = owners.setdefault((kind, slot), i)
+                if owner != i:
+                    union(i, owner)
+
+    # Different slots that overlap in time still compete for the same rooms
+    for (kind, slot), owner in owners.items():
+        for other in table.overlaps[slot]:
+            other_owner = owners.get((kind, other))
+            if other_owner is not None:
+                union(owner, other_owner)
+
+    groups = {}
+    for i in range(len(instructors)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+def split_sections(instructors, components, total_sections, committed=None):
+    """
+    Share total_sections among components the way round-robin would.
+
+    Every instructor takes one section per round until it reaches maxSections
+    (less the sections committed lists for it) or the sections run out; a
+    component's quota is what its instructors took.
+    Components are interleaved within a round so a partial last round is
+    shared in proportion to their size, as the shuffled queue would on average.
+
+    Returns:
+        list: section quota per component
+    """
+    order = []
+    for rank in range(max(len(component) for component in components)):
+        order.extend(component[rank] for component in components if rank < len(component))
+    committed = committed or {}
+    caps = {i: int(instructors[i].get('maxSections', 3)) - committed.get(instructors[i].get('name'), 0) for i in order}
+    taken = dict.fromkeys(order, 0)
+    remaining = total_sections
+    while remaining > 0:
+        progressed = False
+        for i in order:
+            if remaining == 0:
+                break
+            if taken[i] < caps[i]:
+                taken[i] += 1
+                remaining -= 1
+                progressed = True
+        if not progressed:
+            break
+    return [sum(taken[i] for i in component) for component in components]
+
+def plan_shards(instructors, total_sections, table=SLOT_TABLE, fixed=None):
+    """
+    Split a request into shards; fixed (committed classes) count against maxSections.
+
+    Returns:
+        list: (instructor list, section quota) per shard; a single shard with
+            the original arguments when the problem does not decompose
+    """
+    components = conflict_components(instructors, table)
+    if len(components) < 2:
+        return [(instructors, total_sections)]
+    quotas = split_sections(instructors, components, total_sections, fixed_workload(fixed))
+    return [
+        ([instructors[i] for i in component], quota)
+        for component, quota in zip(components, quotas)
+        if quota > 0
+    ] or [(instructors, total_sections)]
+
+def shard_budgets(quotas, time_budget_ms):
+    """
+    Share an option's optimizer budget among its shards in proportion to their quotas.
+
+    Args:
+        quotas: section quota per shard
+        time_budget_ms: the option's local-search budget
+
+    Returns:
+        list: whole milliseconds per shard, summing to time_budget_ms
+    """
+    total = sum(quotas)
+    if not time_budget_ms or not total:
+        return [0] * len(quotas)
+    budgets = [time_budget_ms * quota // total for quota in quotas]
+    for index in range(time_budget_ms - sum(budgets)):
+        budgets[index % len(budgets)] += 1
+    return budgets
+
+def rebalance_shards(plan, shard_options, option_num, seed, engine='greedy', time_budget_ms=0, stats=False, fixed=None):
+    """
+    Move the sections shards could not place to shards with spare capacity.
+
+    Quotas are fixed before solving, so a shard whose instructors run out of
+    slots leaves UNASSIGNED rows even when another shard could take them.
+    Those rows are dropped, the lost sections are handed to shards that
+    placed their whole quota and have maxSections to spare, in shard order,
+    and only the shards that gained sections are solved again. Sections no
+    shard can take are reported as UNASSIGNED again by merge_shards.
+
+    Args:
+        plan: (instructor list, section quota) per shard, from plan_shards
+        shard_options: expanded options solved for the plan, in shard order
+        option_num, seed, engine, stats, fixed: as for solve_shard; shard seeds
+            are derived from seed as the callers derive them
+        time_budget_ms: what is left of the option's optimizer budget, shared
+            among the shards solved again (see shard_budgets)
+
+    Returns:
+        list: shard options with the sections moved
+    """
+    from scheduler import option_seeds, solve_shard
+
+    unplaced = [sum(1 for c in o["classes"] if c.get("courseCode") == "UNASSIGNED") for o in shard_options]
+    lost = sum(unplaced)
+    if not lost:
+        return shard_options
+
+    committed = fixed_workload(fixed)
+    extra = [0] * len(plan)
+    for index, (shard_instructors, quota) in enumerate(plan):
+        if unplaced[index] or not lost:
+            continue
+        capacity = sum(max(0, int(inst.get('maxSections', 3)) - committed.get(inst.get('name'), 0)) for inst in shard_instructors)
+        spare = capacity - quota
+        extra[index] = max(0, min(spare, lost))
+        lost -= extra[index]
+
+    rebalanced = []
+    shard_seeds = option_seeds(seed, len(plan))
+    budgets = iter(shard_budgets([quota + extra[i] for i, (_, quota) in enumerate(plan) if extra[i]], time_budget_ms))
+    for index, ((shard_instructors, quota), option) in enumerate(zip(plan, shard_options)):
+        if extra[index]:
+            option = solve_shard(shard_instructors, quota + extra[index], option_num, shard_seeds[index],
+                                 engine, next(budgets), stats=stats, fixed=fixed)
+        elif unplaced[index]:
+            option = dict(option, classes=[c for c in option["classes"] if c.get("courseCode") != "UNASSIGNED"])
+        rebalanced.append(option)
+    return rebalanced
+
+def merge_shards(shard_options, total_sections, option_num, table=SLOT_TABLE):
+    """
+    Combine shard options into one, renumbering sections in shard order.
+
+    Sections the quotas could not hand to any instructor are reported as
+    UNASSIGNED, as generate_option does.
+
+    Raises:
+        ShardMergeError: if two shards booked the same room or instructor at once
+    """
+    classes = []
+    workload = []
+    table = table.scoped()
+    occupancy = OccupancyIndex(table)
+    section_counter = 0
+    for shard in shard_options:
+        renumbered = {}
+        for cls in shard["classes"]:
+            if cls["section"] not in renumbered:
+                section_counter += 1
+                renumbered[cls["section"]] = f"{section_counter:02d}"
+            cls = dict(cls, section=renumbered[cls["section"]])
+            if cls.get("courseCode") != "UNASSIGNED" and cls.get("days") != "TBD":
+                slot = table.slot_id(cls["days"], cls["time"])
+                room = table.room_id(cls["room"])
+                mask = table.slot_masks[slot]
+                if not occupancy.room_free(room, mask) or not occupancy.instructor_free(cls["faculty"], mask):
+                    raise ShardMergeError(f"Shards overlap at {cls['days']} {cls['time']} in {cls['room']}")
+                occupancy.book(cls["faculty"], room, slot)
+            classes.append(cls)
+        workload.extend(shard["workload"])
+
+    while section_counter < total_sections:
+        section_counter += 1
+        classes.append(unassigned_class(f"{section_counter:02d}"))
+
+    option = {"option": option_num, "classes": classes}
+    option.update(conflict_summary(classes))
+    option["workload"] = workload
+    return option
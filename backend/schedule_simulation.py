@@ -0,0 +1,211 @@
+"""What-if simulation over the committed timetable.
+
+TimetableSnapshot holds the committed classes in memory with their
+occupancy masks and per-room / per-instructor indexes. An Overlay records
+hypothetical moves, swaps and deletions on top of it copy-on-write: only
+the classes a change touches are copied, the snapshot itself is never
+modified, so any number of overlays can share one snapshot. Conflicts and
+score deltas are computed for the touched classes and instructors only.
+"""
+from scheduler import LAB_ROOMS, SLOT_TABLE, THEORY_ROOMS, SlotTable, validate_slot
+from schedule_optimizer import ScheduleState
+
+# Fields a move may change
+MOVE_FIELDS = ('days', 'time', 'room', 'faculty')
+
+# Most changes accepted in one simulation
+MAX_CHANGES = 500
+
+
+def class_mask(cls, table=SLOT_TABLE):
+    """
+    Occupancy mask of a class dict; TBD or unparseable slots never conflict.
+
+    The mask is probed, not interned, so simulated slots never grow the
+    shared table; Overlay.move validates the slots it is given.
+    """
+    if not cls.get("days") or not cls.get("time") or cls["days"] == "TBD":
+        return 0
+    return table.probe_mask(cls["days"], cls["time"])
+
+def class_type(cls):
+    """ClassItem rows carry no type; labs are the "L" courses or sit in lab rooms"""
+    return "lab" if cls.get("room") in LAB_ROOMS or str(cls.get("courseCode", "")).endswith("L") else "theory"
+
+
+class TimetableSnapshot:
+    """
+    Read-only view of the committed timetable.
+
+    Args:
+        classes: class dicts as returned by ClassItem.to_dict (with "id")
+        table: SlotTable used for the occupancy masks
+    """
+
+    def __init__(self, classes, table=SLOT_TABLE):
+        self.table = table
+        self.classes = {}
+        self.masks = {}
+        self.by_room = {}
+        self.by_faculty = {}
+        for cls in classes:
+            class_id = cls["id"]
+            self.classes[class_id] = cls
+            self.masks[class_id] = class_mask(cls, table)
+            self.by_room.setdefault(cls.get("room"), []).append(class_id)
+            self.by_faculty.setdefault(cls.get("faculty"), []).append(class_id)
+
+    def overlay(self):
+        return Overlay(self)
+
+
+class Overlay:
+    """
+    Hypothetical changes on top of a TimetableSnapshot.
+
+    changes maps a class ID to its new dict, or to None when it is deleted;
+    every other class is read from the snapshot.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.changes = {}
+
+    def get(self, class_id):
+        if class_id in self.changes:
+            return self.changes[class_id]
+        return self.snapshot.classes.get(class_id)
+
+    def _existing(self, class_id):
+        cls = self.get(class_id)
+        if cls is None:
+            raise ValueError(f"Class {class_id} does not exist")
+        return cls
+
+    def move(self, class_id, **fields):
+        unknown = set(fields) - set(MOVE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot change {', '.join(sorted(unknown))}; a move may set {', '.join(MOVE_FIELDS)}")
+        if "room" in fields and fields["room"] not in THEORY_ROOMS + LAB_ROOMS:
+            raise ValueError(f"Unknown room: {fields['room']}")
+        if "faculty" in fields and (not isinstance(fields["faculty"], str) or not fields["faculty"]):
+            raise ValueError("faculty must be a non-empty string")
+        moved = dict(self._existing(class_id), **fields)
+        if "days" in fields or "time" in fields:
+            validate_slot(moved.get("days"), moved.get("time"))
+        self.changes[class_id] = moved
+
+    def swap(self, first_id, second_id):
+        """Exchange the days, time and room of two classes"""
+        first = self._existing(first_id)
+        second = self._existing(second_id)
+        slot_fields = ('days', 'time', 'room')
+        self.changes[first_id] = dict(first, **{k: second[k] for k in slot_fields})
+        self.changes[second_id] = dict(second, **{k: first[k] for k in slot_fields})
+
+    def delete(self, class_id):
+        self._existing(class_id)
+        self.changes[class_id] = None
+
+    def apply(self, change):
+        """
+        Apply one change dict from a simulation request.
+
+        Args:
+            change: {"op": "move", "id", ...MOVE_FIELDS}, {"op": "swap", "ids": [a, b]}
+                or {"op": "delete", "id"}
+
+        Raises:
+            ValueError: for a change that is not an object, an unknown op, a
+                missing class id, a class that does not exist or a bad field
+        """
+        if not isinstance(change, dict):
+            raise ValueError("Each change must be an object")
+        op = change.get("op")
+        if op in ("move", "delete") and change.get("id") is None:
+            raise ValueError(f"{op} needs a class id")
+        if op == "move":
+            self.move(change["id"], **{k: v for k, v in change.items() if k not in ("op", "id")})
+        elif op == "swap":
+            ids = change.get("ids")
+            if not isinstance(ids, list) or len(ids) != 2 or None in ids:
+                raise ValueError("swap needs exactly two class ids")
+            self.swap(*ids)
+        elif op == "delete":
+            self.delete(change["id"])
+        else:
+            raise ValueError(f"Unknown op: {op}")
+
+    def _neighbours(self, index, key, value):
+        """IDs of live classes whose key (room or faculty) equals value, overlay included"""
+        for class_id in index.get(value, ()):
+            if class_id not in self.changes:
+                yield class_id
+        for class_id, cls in self.changes.items():
+            if cls is not None and cls.get(key) == value:
+                yield class_id
+
+    def conflicts(self):
+        """Room and instructor double-bookings that involve a changed class"""
+        table = self.snapshot.table
+        found = []
+        seen = set()
+        for class_id, cls in self.changes.items():
+            if cls is None:
+                continue
+            mask = class_mask(cls, table)
+            if not mask:
+                continue
+            for kind, index, key in (("room", self.snapshot.by_room, "room"),
+                                     ("instructor", self.snapshot.by_faculty, "faculty")):
+                for other_id in self._neighbours(index, key, cls.get(key)):
+                    if other_id == class_id:
+                        continue
+                    pair = (kind, min(class_id, other_id), max(class_id, other_id))
+                    if pair in seen:
+                        continue
+                    other = self.get(other_id)
+                    other_mask = self.snapshot.masks[other_id] if other_id not in self.changes else class_mask(other, table)
+                    if mask & other_mask:
+                        seen.add(pair)
+                        found.append({
+                            "type": kind,
+                            "classId": class_id,
+                            "withClassId": other_id,
+                            "message": (f"{cls['courseCode']} section {cls['section']} and "
+                                        f"{other['courseCode']} section {other['section']} overlap "
+                                        f"in {cls[key]} on {cls['days']} at {cls['time']}")
+                        })
+        return found
+
+    def _score(self, classes, table):
+        classes = [dict(cls, type=class_type(cls)) for cls in classes]
+        return ScheduleState(classes, [], table).breakdown()
+
+    def score_delta(self):
+        """
+        Schedule score of the affected instructors before and after the changes.
+
+        Only instructors with a changed class are scored, which is what makes
+        a simulation cost milliseconds instead of a pass over the timetable.
+
+        Returns:
+            tuple: (before, after, delta) breakdown dicts, see ScheduleState.breakdown
+        """
+        names = set()
+        for class_id, cls in self.changes.items():
+            names.add(self.snapshot.classes[class_id].get("faculty"))
+            if cls is not None:
+                names.add(cls.get("faculty"))
+        before = []
+        after = []
+        for name in names:
+            before.extend(self.snapshot.classes[i] for i in self.snapshot.by_faculty.get(name, ()))
+            after.extend(self.get(i) for i in self._neighbours(self.snapshot.by_faculty, "faculty", name))
+        # ScheduleState interns the slots and rooms it scores; a scratch table
+        # keeps simulated strings out of the shared one
+        table = SlotTable()
+        before = self._score(before, table)
+        after = self._score(after, table)
+        delta = {k: round(after[k] - before[k], 2) for k in before}
+        return before, after, delta
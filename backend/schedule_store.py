@@ -0,0 +1,98 @@
+"""Server-side store of generated schedule options.
+
+/api/generate-schedule can keep its options here instead of sending them in
+full: the client gets a schedule ID and a one-line summary per option, reads
+the classes page by page, and adopts an option by ID without posting its
+class list back. Runs expire after STORE_TTL seconds and the least recently
+used ones are evicted past STORE_MAX_RUNS.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from scheduler import with_rationales
+
+# Generation runs kept at most
+STORE_MAX_RUNS = 64
+
+# Seconds a stored run stays available after it was last read
+STORE_TTL = 30 * 60
+
+# Classes returned per page when the client does not ask for a size, and the most it may ask for
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+def option_summary(option):
+    """Everything about an option except its classes"""
+    summary = {k: v for k, v in option.items() if k != "classes"}
+    summary["classCount"] = len(option["classes"])
+    return summary
+
+def page_classes(option, offset=0, limit=DEFAULT_PAGE_SIZE, rationale=True):
+    """
+    One page of an option's classes.
+
+    Args:
+        option: stored option dict
+        offset: index of the first class to return
+        limit: classes per page, capped at MAX_PAGE_SIZE
+        rationale: give every placed class its rationale; without it no
+            rationale is returned, conflict reasons included
+
+    Returns:
+        dict: the page with its offset, limit, total and next offset (None on the last page)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    classes = option["classes"][offset:offset + limit]
+    if rationale:
+        classes = with_rationales(classes)
+    else:
+        classes = [{k: v for k, v in cls.items() if k != "rationale"} for cls in classes]
+    end = offset + len(classes)
+    return {
+        "option": option["option"],
+        "offset": offset,
+        "limit": limit,
+        "total": len(option["classes"]),
+        "nextOffset": end if end < len(option["classes"]) else None,
+        "classes": classes
+    }
+
+
+class OptionStore:
+    """Thread-safe LRU store of generation runs with a TTL"""
+
+    def __init__(self, max_runs=STORE_MAX_RUNS, ttl=STORE_TTL):
+        self.max_runs = max_runs
+        self.ttl = ttl
+        self.runs = OrderedDict()   # schedule ID -> (expires_at, run dict)
+        self.lock = threading.Lock()
+
+    def put(self, options, seed):
+        """Store a run's options; returns its schedule ID"""
+        schedule_id = secrets.token_hex(8)
+        with self.lock:
+            self.runs[schedule_id] = (time.monotonic() + self.ttl, {"options": options, "seed": seed})
+            while len(self.runs) > self.max_runs:
+                self.runs.popitem(last=False)
+        return schedule_id
+
+    def get(self, schedule_id):
+        """Return the stored run and refresh its expiry, or None if it is unknown or expired"""
+        with self.lock:
+            entry = self.runs.get(schedule_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.runs[schedule_id]
+                return None
+            self.runs[schedule_id] = (time.monotonic() + self.ttl, entry[1])
+            self.runs.move_to_end(schedule_id)
+            return entry[1]
+
+    def discard(self, schedule_id):
+        with self.lock:
+            self.runs.pop(schedule_id, None)
@@ -0,0 +1,1530 @@
+"""Scheduling core used by the AI schedule generator.
+
+Every day pattern, time slot and room is interned into an integer ID once,
+and occupancy is kept as bitsets over (single day x 5-minute block). Room and
+instructor conflict tests are then a single AND of two integers instead of
+re-parsing "08:00 AM - 09:30 AM" strings inside the placement loops.
+"""
+import multiprocessing
+import os
+import heapq
+import random
+import re
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+# Regular classroom resources (non-lab rooms)
+THEORY_ROOMS = [
+    'NAC210', 'NAC302', 'NAC411', 'NAC510', 'NAC612',
+    'SAC201', 'SAC304', 'SAC402', 'SAC505'
+]
+
+# Lab rooms (LIB prefix) - only for lab classes
+LAB_ROOMS = [
+    'LIB601', 'LIB602', 'LIB603', 'LIB604', 'LIB605',
+    'LIB606', 'LIB607', 'LIB608'
+]
+
+# Theory class time slots (1.5 hour slots)
+TIME_SLOTS = [
+    '08:00 AM - 09:30 AM',
+    '09:40 AM - 11:10 AM',
+    '11:20 AM - 12:50 PM',
+    '01:00 PM - 02:30 PM',
+    '02:40 PM - 04:10 PM',
+    '04:20 PM - 05:50 PM'
+]
+
+# Lab time slots (3-hour slots)
+LAB_TIME_SLOTS = [
+    '08:00 AM - 11:10 AM',
+    '09:40 AM - 12:50 PM',
+    '11:20 AM - 02:30 PM',
+    '12:50 PM - 04:10 PM',
+    '02:40 PM - 05:50 PM'
+]
+
+# Single days for labs
+SINGLE_DAYS = ['S', 'M', 'T', 'W', 'R', 'A']
+
+# Theory day patterns
+THEORY_DAYS = ['ST', 'MW', 'RA']
+
+# Occupancy resolution: one bit per 5 minutes of a single day
+BLOCK_MINUTES = 5
+BLOCKS_PER_DAY = 24 * 60 // BLOCK_MINUTES
+
+# Option builders selectable with the "engine" request field
+ENGINES = ('greedy', 'csp')
+
+# Largest numOptions accepted from a single request
+MAX_OPTIONS = 50
+
+# Largest totalSections accepted from a single request
+MAX_TOTAL_SECTIONS = 5000
+
+# Below this many section placements (options x sections) the worker pool's
+# start-up and pickling costs more than building the options serially
+PARALLEL_MIN_WORK = 500
+
+# Hottest functions returned by profile_generation
+PROFILE_TOP = 30
+
+# Placement attempts between two progress callbacks
+PROGRESS_EVERY = 16
+
+# Priority weights of WorkloadBalancer; the instructor with the lowest weighted
+# sum picks next. Load dominates (the other two stay below 1) so sections are
+# still dealt in rounds; within a round, fill and breadth decide the order.
+BALANCE_WEIGHTS = {
+    "load": 1.0,        # sections the instructor already teaches
+    "fill": 0.5,        # share of their maxSections already taken
+    "breadth": 0.25     # share of theory slots they accept: narrow ones pick first
+}
+
+# Position of each theory slot, used to keep an instructor's classes close together
+TIME_SLOT_INDEX = {t: i for i, t in enumerate(TIME_SLOTS)}
+
+
+def parse_time_to_minutes(time_str):
+    """Parse time string like '08:00 AM' to minutes from midnight"""
+    parts = time_str.strip().split()
+    time_part = parts[0]
+    period = parts[1] if len(parts) > 1 else 'AM'
+
+    hours, minutes = map(int, time_part.split(':'))
+    if period == 'PM' and hours != 12:
+        hours += 12
+    elif period == 'AM' and hours == 12:
+        hours = 0
+
+    return hours * 60 + minutes
+
+def get_time_range(slot):
+    """Get start and end times from a slot like '08:00 AM - 09:30 AM'"""
+    parts = slot.split(' - ')
+    start = parse_time_to_minutes(parts[0])
+    end = parse_time_to_minutes(parts[1])
+    return start, end
+
+def check_time_overlap(time1, time2):
+    """Check if two time slots overlap"""
+    try:
+        start1, end1 = get_time_range(time1)
+        start2, end2 = get_time_range(time2)
+
+        # Check for overlap
+        return start1 < end2 and start2 < end1
+    except:
+        return False
+
+def expand_days(day_pattern):
+    """Expand a day pattern to its single days: 'ST' -> {'S', 'T'}, 'S' -> {'S'}"""
+    if len(day_pattern) == 2:
+        return set(day_pattern)
+    return {day_pattern}
+
+# Time slot strings accepted from clients: "08:00 AM - 09:30 AM"
+SLOT_TIME_FORMAT = re.compile(r'(1[0-2]|0?[1-9]):([0-5]\d) (AM|PM) - (1[0-2]|0?[1-9]):([0-5]\d) (AM|PM)')
+
+def validate_days(days):
+    """Raise ValueError unless days is a single day (S, M, T, W, R, A) or a pair of them ("ST", "MW", "RA")"""
+    if not isinstance(days, str) or not 1 <= len(days) <= 2 or not set(days) <= set(SINGLE_DAYS) or len(set(days)) != len(days):
+        raise ValueError(f"Unknown day pattern: {days!r}")
+
+def validate_time(time_str):
+    """Raise ValueError unless time_str is "HH:MM AM - HH:MM PM" with the start before the end"""
+    if not isinstance(time_str, str) or not SLOT_TIME_FORMAT.fullmatch(time_str):
+        raise ValueError(f"Time slot must look like '08:00 AM - 09:30 AM', got {time_str!r}")
+    start, end = get_time_range(time_str)
+    if start >= end:
+        raise ValueError(f"Time slot ends before it starts: {time_str!r}")
+
+def validate_slot(days, time_str):
+    """
+    Check client-supplied slot strings before they reach a SlotTable.
+
+    Args:
+        days: a single day (S, M, T, W, R, A) or a pair of them ("ST", "MW", "RA")
+        time_str: "HH:MM AM - HH:MM PM" with the start before the end
+
+    Raises:
+        ValueError: naming what is wrong with the slot
+    """
+    validate_days(days)
+    validate_time(time_str)
+
+def parse_integer(value, field, default=None):
+    """
+    Read an integer sent by a client.
+
+    Args:
+        value: the JSON value; ints, integral floats and digit strings are accepted
+        field: name used in the error message
+        default: returned when value is None
+
+    Returns:
+        int: the value, or default
+
+    Raises:
+        ValueError: for booleans, non-integral floats and anything else int() rejects
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{field} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{field} must be an integer")
+
+def validate_instructors(instructors):
+    """
+    Check the instructor rows of a generation request.
+
+    Args:
+        instructors: list of instructor dicts as sent by the AI schedule modal
+
+    Returns:
+        list: copies of the rows with maxSections as an int and the day and
+            time lists filled in (an omitted or null list means "any")
+
+    Raises:
+        ValueError: naming the first row and field that is wrong
+    """
+    if not isinstance(instructors, list) or not instructors:
+        raise ValueError("No instructor data provided")
+    checked = []
+    for position, inst in enumerate(instructors):
+        if not isinstance(inst, dict):
+            raise ValueError(f"instructors[{position}] must be an object")
+        name = inst.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"instructors[{position}].name must be a non-empty string")
+        if not isinstance(inst.get('courseCode', ''), str):
+            raise ValueError(f"instructors[{position}].courseCode must be a string")
+        max_sections = parse_integer(inst.get('maxSections'), f"instructors[{position}].maxSections", 3)
+        if max_sections < 1 or max_sections > MAX_TOTAL_SECTIONS:
+            raise ValueError(f"instructors[{position}].maxSections must be between 1 and {MAX_TOTAL_SECTIONS}")
+        row = dict(inst, maxSections=max_sections, hasLab=bool(inst.get('hasLab', False)))
+        for field, check in (('preferredDays', validate_days), ('availableTimes', validate_time),
+                             ('labDays', validate_days), ('labTimes', validate_time)):
+            values = inst.get(field) or []
+            if not isinstance(values, list):
+                raise ValueError(f"instructors[{position}].{field} must be a list")
+            try:
+                for value in values:
+                    check(value)
+            except ValueError as e:
+                raise ValueError(f"instructors[{position}].{field}: {e}")
+            row[field] = values
+        checked.append(row)
+    return checked
+
+def check_day_overlap(day1, day2):
+    """
+    Check if two day patterns overlap.
+    Handles both single days (S, M, T, W, R, A) and double day patterns (ST, MW, RA).
+    Returns True if any day in day1 overlaps with any day in day2.
+    """
+    return bool(expand_days(day1) & expand_days(day2))
+
+
+class SlotTable:
+    """
+    Interns day patterns, time slots and rooms into integer IDs.
+
+    Each (day pattern, time slot) pair gets a slot ID and an occupancy mask:
+    one bit per 5-minute block of every single day the pattern covers. The
+    table also keeps, for every slot, the set of slots that overlap it, so
+    "which booked class blocks this lab" never re-parses strings.
+
+    A frozen table (SLOT_TABLE, the campus configuration) refuses new
+    strings; a request interns its own into scoped(), a private copy that is
+    dropped with it, so client input never grows the shared table.
+    """
+
+    def __init__(self, days=(), times=(), rooms=()):
+        self.day_ids = {}
+        self.days = []
+        self.time_ids = {}
+        self.times = []
+        self.room_ids = {}
+        self.rooms = []
+        self.slot_ids = {}      # (day_id, time_id) -> slot_id
+        self.slots = []         # slot_id -> (day pattern, time slot)
+        self.slot_masks = []    # slot_id -> full occupancy mask
+        self.overlaps = []      # slot_id -> set of overlapping slot_ids
+        self.single_day_index = {d: i for i, d in enumerate(SINGLE_DAYS)}
+        self._day_bits = []     # day_id -> tuple of single-day indices
+        self._time_bits = []    # time_id -> block mask within one day
+        self.intervals = {}     # slot_id -> per-day (day, start, end), see slot_intervals
+        self.frozen = False
+        self._lock = threading.RLock()
+
+        for d in days:
+            self.day_id(d)
+        for t in times:
+            self.time_id(t)
+        for r in rooms:
+            self.room_id(r)
+
+    def freeze(self):
+        """Refuse new strings from now on; requests intern theirs into scoped()"""
+        self.frozen = True
+
+    def scoped(self):
+        """
+        Table to intern one request's strings into.
+
+        A frozen table is copied, with every ID and mask it holds, so the
+        strings a request adds live only as long as the copy; any other
+        table is returned as it is.
+        """
+        if not self.frozen:
+            return self
+        table = SlotTable.__new__(SlotTable)
+        table.__dict__.update(self.__dict__)
+        for name in ('day_ids', 'time_ids', 'room_ids', 'slot_ids', 'single_day_index', 'intervals'):
+            setattr(table, name, dict(getattr(self, name)))
+        for name in ('days', 'times', 'rooms', 'slots', 'slot_masks', '_day_bits', '_time_bits'):
+            setattr(table, name, list(getattr(self, name)))
+        table.overlaps = [set(overlapping) for overlapping in self.overlaps]
+        table.frozen = False
+        table._lock = threading.RLock()
+        return table
+
+    def _check_open(self, value):
+        if self.frozen:
+            raise RuntimeError(f"{value!r} is not in the frozen slot table; intern it into table.scoped()")
+
+    def day_id(self, pattern):
+        day_id = self.day_ids.get(pattern)
+        if day_id is None:
+            self._check_open(pattern)
+            day_id = len(self.days)
+            self.day_ids[pattern] = day_id
+            self.days.append(pattern)
+            indices = []
+            for d in sorted(expand_days(pattern)):
+                if d not in self.single_day_index:
+                    self.single_day_index[d] = len(self.single_day_index)
+                indices.append(self.single_day_index[d])
+            self._day_bits.append(tuple(indices))
+        return day_id
+
+    def time_id(self, time_str):
+        time_id = self.time_ids.get(time_str)
+        if time_id is None:
+            self._check_open(time_str)
+            time_id = len(self.times)
+            self.time_ids[time_str] = time_id
+            self.times.append(time_str)
+            try:
+                start, end = get_time_range(time_str)
+            except (ValueError, IndexError, AttributeError):
+                # Unparseable slots ("TBD") never conflict, matching check_time_overlap
+                start, end = 0, 0
+            first = start // BLOCK_MINUTES
+            last = -(-end // BLOCK_MINUTES)
+            self._time_bits.append(((1 << last) - (1 << first)) if last > first else 0)
+        return time_id
+
+    def room_id(self, room):
+        room_id = self.room_ids.get(room)
+        if room_id is None:
+            self._check_open(room)
+            room_id = len(self.rooms)
+            self.room_ids[room] = room_id
+            self.rooms.append(room)
+        return room_id
+
+    def slot_id(self, days, time_str):
+        """Intern a (day pattern, time slot) pair and return its slot ID"""
+        slot_id = self.slot_ids.get((self.day_ids.get(days), self.time_ids.get(time_str)))
+        if slot_id is not None:
+            return slot_id
+
+        # New pairs are rare (custom times); intern them under a lock so
+        # concurrent requests never hand out the same ID twice
+        with self._lock:
+            key = (self.day_id(days), self.time_id(time_str))
+            slot_id = self.slot_ids.get(key)
+            if slot_id is not None:
+                return slot_id
+            self._check_open((days, time_str))
+
+            time_bits = self._time_bits[key[1]]
+            mask = 0
+            for index in self._day_bits[key[0]]:
+                mask |= time_bits << (index * BLOCKS_PER_DAY)
+
+            slot_id = len(self.slots)
+            self.slots.append((days, time_str))
+            self.slot_masks.append(mask)
+
+            # Extend the overlap table with the new row and column
+            overlapping = {slot_id} if mask else set()
+            for other, other_mask in enumerate(self.slot_masks[:-1]):
+                if mask & other_mask:
+                    overlapping.add(other)
+                    self.overlaps[other].add(slot_id)
+            self.overlaps.append(overlapping)
+            self.slot_ids[key] = slot_id
+        return slot_id
+
+    def mask(self, days, time_str):
+        """Occupancy mask for day pattern and time strings; a frozen table only probes"""
+        if self.frozen:
+            return self.probe_mask(days, time_str)
+        return self.slot_masks[self.slot_id(days, time_str)]
+
+    def probe_mask(self, days, time_str):
+        """
+        Occupancy mask for day pattern and time strings, without interning them.
+
+        For strings from requests or stored rows: an unknown pair is computed
+        on the spot and never added to the table, so arbitrary input cannot
+        grow it. Unknown days and unparseable times give 0, as in time_id;
+        callers that must reject them use validate_slot first.
+        """
+        slot_id = self.slot_ids.get((self.day_ids.get(days), self.time_ids.get(time_str)))
+        if slot_id is not None:
+            return self.slot_masks[slot_id]
+        try:
+            start, end = get_time_range(time_str)
+        except (ValueError, IndexError, AttributeError):
+            return 0
+        first = start // BLOCK_MINUTES
+        last = -(-end // BLOCK_MINUTES)
+        if last <= first:
+            return 0
+        time_bits = (1 << last) - (1 << first)
+        mask = 0
+        for d in expand_days(days):
+            index = self.single_day_index.get(d)
+            if index is not None:
+                mask |= time_bits << (index * BLOCKS_PER_DAY)
+        return mask
+
+
+class OccupancyIndex:
+    """
+    Per-room and per-instructor occupancy for one schedule.
+
+    Booking a slot ORs its mask into the room and instructor bitsets, so an
+    availability test is one AND regardless of how many classes are placed.
+    Each instructor also keeps the slot IDs they are booked in, which lets a
+    conflict be named through the table's overlap sets instead of a scan.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.room_busy = {}
+        self.instructor_busy = {}
+        self.instructor_slots = {}
+
+    def room_free(self, room_id, mask):
+        return not (self.room_busy.get(room_id, 0) & mask)
+
+    def instructor_free(self, name, mask):
+        return not (self.instructor_busy.get(name, 0) & mask)
+
+    def book(self, name, room_id, slot_id):
+        """Book a slot; room_id None blocks only the instructor"""
+        mask = self.table.slot_masks[slot_id]
+        if room_id is not None:
+            self.room_busy[room_id] = self.room_busy.get(room_id, 0) | mask
+        self.instructor_busy[name] = self.instructor_busy.get(name, 0) | mask
+        booked = self.instructor_slots.setdefault(name, {})
+        booked[slot_id] = booked.get(slot_id, 0) + 1
+
+    def instructor_conflict(self, name, slot_id):
+        """Return a booked slot ID of the instructor that overlaps slot_id, or None"""
+        if self.instructor_free(name, self.table.slot_masks[slot_id]):
+            return None
+        booked = self.instructor_slots[name]
+        overlapping = self.table.overlaps[slot_id]
+        if len(booked) < len(overlapping):
+            return next(s for s in booked if s in overlapping)
+        return next(s for s in overlapping if s in booked)
+
+
+class WorkloadBalancer:
+    """
+    Priority queue that hands out the next instructor to receive a section.
+
+    Entries are (priority, sequence, index) on a heap, so picking the next
+    instructor is O(log n); the sequence keeps equal priorities first-in,
+    first-out, which preserves the shuffled order as a tiebreak. Instructors
+    at maxSections are never pushed back, and one that could not be placed
+    is retired by simply not pushing it again. Entries of a name that appears
+    twice (one person, two courses) go stale when the other entry takes a
+    section; pop re-prices them lazily.
+
+    Args:
+        instructors: instructor dicts, in tiebreak order
+        workload: dict of name -> sections taken, shared with the generator
+        breadth: per instructor, the share of candidate slots they accept (0-1]
+        weights: priority weights, see BALANCE_WEIGHTS
+    """
+
+    def __init__(self, instructors, workload, breadth, weights=BALANCE_WEIGHTS):
+        self.names = [inst.get('name') for inst in instructors]
+        self.capacities = [int(inst.get('maxSections', 3)) for inst in instructors]
+        self.workload = workload
+        self.weight_load = weights["load"]
+        self.weight_fill = weights["fill"]
+        self.base = [weights["breadth"] * b for b in breadth]
+        self.shared = {name for name in self.names if self.names.count(name) > 1}
+        self.heap = []
+        self.sequence = 0
+        for index in range(len(instructors)):
+            self.push(index)
+
+    def priority(self, index):
+        load = self.workload.get(self.names[index], 0)
+        capacity = self.capacities[index]
+        return self.weight_load * load + self.weight_fill * load / capacity + self.base[index]
+
+    def push(self, index):
+        """Queue an instructor again unless they are at maxSections"""
+        if self.workload.get(self.names[index], 0) < self.capacities[index]:
+            heapq.heappush(self.heap, (self.priority(index), self.sequence, index))
+            self.sequence += 1
+
+    def pop(self):
+        """Return the index of the next instructor, or None when all are retired"""
+        while self.heap:
+            priority, _, index = heapq.heappop(self.heap)
+            name = self.names[index]
+            if name in self.shared:
+                if self.workload.get(name, 0) >= self.capacities[index]:
+                    continue
+                if self.priority(index) > priority:
+                    self.push(index)
+                    continue
+            return index
+        return None
+
+    def __len__(self):
+        return len(self.heap)
+
+
+def fixed_bookings(fixed, table):
+    """
+    Intern committed classes that a generation run must work around.
+
+    Args:
+        fixed: (faculty, days, time, room) tuples; room is None for a block
+            that only makes the instructor unavailable
+        table: SlotTable to intern them in
+
+    Returns:
+        list: (faculty, room ID or None, slot ID) for every placed entry
+    """
+    bookings = []
+    for name, days, time_str, room in fixed or ():
+        if not days or not time_str or days == "TBD" or time_str == "TBD":
+            continue
+        bookings.append((name, table.room_id(room) if room else None, table.slot_id(days, time_str)))
+    return bookings
+
+def fixed_workload(fixed):
+    """
+    Theory sections each instructor already teaches among committed classes.
+
+    Args:
+        fixed: (faculty, days, time, room) tuples, see fixed_bookings; labs
+            (lab rooms) and unavailability blocks (no room) are not counted
+
+    Returns:
+        dict: name -> committed theory sections, to count against maxSections
+    """
+    workload = {}
+    for name, days, time_str, room in fixed or ():
+        if room and room not in LAB_ROOMS and days != "TBD" and time_str != "TBD":
+            workload[name] = workload.get(name, 0) + 1
+    return workload
+
+def fixed_occupancy(fixed, table):
+    """
+    Room and instructor masks of committed classes.
+
+    Returns:
+        tuple: (room_busy: room ID -> mask, instructor_busy: name -> mask)
+    """
+    occupancy = OccupancyIndex(table)
+    for name, room_id, slot_id in fixed_bookings(fixed, table):
+        occupancy.book(name, room_id, slot_id)
+    return occupancy.room_busy, occupancy.instructor_busy
+
+def validate_instructor_availability_for_lab(occupancy, instructor_name, lab_day, lab_time):
+    """
+    Validate instructor availability for a lab slot against the occupancy index.
+
+    Catches theory classes and other labs during the lab time, including
+    3-hour labs that partially overlap 1.5-hour theory slots.
+
+    Args:
+        occupancy: OccupancyIndex of the schedule being built
+        instructor_name: Name of the instructor
+        lab_day: Proposed lab day
+        lab_time: Proposed lab time slot
+
+    Returns:
+        tuple: (is_available: bool, conflict_message: str or None)
+    """
+    conflict = occupancy.instructor_conflict(instructor_name, occupancy.table.slot_id(lab_day, lab_time))
+    if conflict is None:
+        return True, None
+
+    existing_day, existing_time = occupancy.table.slots[conflict]
+    return False, f"Instructor {instructor_name} has a conflict: Conflict with existing class on {existing_day} at {existing_time}"
+
+
+def unassigned_class(section):
+    """
+    Placeholder row of a theory section no instructor could take.
+
+    Args:
+        section: two-digit section number, e.g. "07"
+
+    Returns:
+        dict: the UNASSIGNED class generate_option reports for it
+    """
+    return {
+        "courseCode": "UNASSIGNED",
+        "section": section,
+        "faculty": "Unassigned (No Slots)",
+        "days": "TBD",
+        "time": "TBD",
+        "room": "TBD",
+        "type": "theory",
+        "rationale": "Could not find valid slot for any instructor"
+    }
+
+
+def class_rationale(cls):
+    """Why a placed class sits where it does; conflict rows carry their reason instead"""
+    if cls.get("type") == "lab":
+        return f"Lab for {cls['courseCode'][:-1]} section {cls['section']}"
+    return f"Matched {cls['days']} {cls['time']}"
+
+def with_rationales(classes):
+    """
+    The classes with a rationale on every placed one, for responses that ask for them.
+
+    Generators leave placed classes without one so that options which are
+    scored and discarded, or stored and paged later, never build the strings.
+    """
+    return [
+        cls if "rationale" in cls or cls.get("days") == "TBD" else dict(cls, rationale=class_rationale(cls))
+        for cls in classes
+    ]
+
+
+class ClassColumns:
+    """
+    Compact, columnar record of the classes of one option.
+
+    Each class is one row across parallel integer arrays: instructor and
+    course as indices into small interned lists, section number, slot and
+    room IDs (-1 for TBD), a lab flag and a conflict reason index (-1 for
+    none). Class dicts are only produced by to_dicts, so options that are
+    scored and thrown away (ranking) never build them, and an option pickled
+    back from a worker costs a few bytes per class.
+    Slot and room names seen by the rows are kept alongside, so the columns
+    can be read without the SlotTable that produced them.
+    """
+
+    __slots__ = (
+        'faculty', 'course', 'section', 'slot', 'room', 'lab', 'reason',
+        'names', 'name_ids', 'courses', 'course_ids', 'reasons',
+        'slot_keys', 'room_names', 'unassigned_from', 'unassigned'
+    )
+
+    def __init__(self):
+        self.faculty = array('i')
+        self.course = array('i')
+        self.section = array('i')
+        self.slot = array('i')
+        self.room = array('i')
+        self.lab = array('b')
+        self.reason = array('i')
+        self.names = []
+        self.name_ids = {}
+        self.courses = []
+        self.course_ids = {}
+        self.reasons = []
+        self.slot_keys = {}     # slot ID -> (day pattern, time slot)
+        self.room_names = {}    # room ID -> room
+        self.unassigned_from = 0
+        self.unassigned = 0
+
+    def __len__(self):
+        return len(self.section)
+
+    def add(self, table, name, course, section, lab, slot_id=-1, room_id=-1, reason=None):
+        """Append a class; returns its row"""
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        course_id = self.course_ids.get(course)
+        if course_id is None:
+            course_id = self.course_ids[course] = len(self.courses)
+            self.courses.append(course)
+        self.faculty.append(name_id)
+        self.course.append(course_id)
+        self.section.append(section)
+        self.lab.append(lab)
+        self.slot.append(-1)
+        self.room.append(-1)
+        self.reason.append(-1)
+        row = len(self.section) - 1
+        if slot_id >= 0:
+            self.place(table, row, slot_id, room_id)
+        if reason is not None:
+            self.reason[row] = len(self.reasons)
+            self.reasons.append(reason)
+        return row
+
+    def place(self, table, row, slot_id, room_id):
+        """Put a row in a slot and room, clearing any conflict"""
+        if slot_id not in self.slot_keys:
+            self.slot_keys[slot_id] = table.slots[slot_id]
+        if room_id not in self.room_names:
+            self.room_names[room_id] = table.rooms[room_id]
+        self.slot[row] = slot_id
+        self.room[row] = room_id
+        self.reason[row] = -1
+
+    def to_dicts(self):
+        """The class dicts the client expects; placed classes get their rationale from with_rationales"""
+        classes = []
+        for row in range(len(self.section)):
+            course = self.courses[self.course[row]]
+            section = f"{self.section[row]:02d}"
+            cls = {
+                "courseCode": f"{course}L" if self.lab[row] else course,
+                "section": section,
+                "faculty": self.names[self.faculty[row]],
+                "days": "TBD",
+                "time": "TBD",
+                "room": "TBD",
+                "type": "lab" if self.lab[row] else "theory"
+            }
+            if self.reason[row] >= 0:
+                cls["conflict"] = True
+                cls["rationale"] = self.reasons[self.reason[row]]
+            else:
+                days, time_str = self.slot_keys[self.slot[row]]
+                cls["days"] = days
+                cls["time"] = time_str
+                cls["room"] = self.room_names[self.room[row]]
+            classes.append(cls)
+        for section in range(self.unassigned_from, self.unassigned_from + self.unassigned):
+            classes.append(unassigned_class(f"{section:02d}"))
+        return classes
+
+
+def expand_option(option):
+    """Turn a compact option (built with compact=True) into the usual one with "classes"; others pass through"""
+    if "columns" not in option:
+        return option
+    option = dict(option)
+    option["classes"] = option.pop("columns").to_dicts()
+    return option
+
+
+class LabAllocator:
+    """
+    Lab-allocation stage: re-places TBD labs by augmenting paths.
+
+    Every lab request is a node on one side; (lab slot, lab room) cells are the
+    other. Starting from the labs the generator already placed, each TBD lab
+    searches for an augmenting path: a free cell it may use, or a cell held by
+    exactly one lab that can itself move elsewhere, and so on. A cell is only
+    usable when the instructor has no theory class over it and neither the room
+    nor the instructor holds another lab at an overlapping time. Each search
+    is linear in cells x labs, and a lab placed by the generator is only ever
+    moved, never dropped, so the stage can only remove lab conflicts. The
+    visited set lets every lab move at most once per search.
+
+    Args:
+        columns: the option's ClassColumns, updated in place
+        requests: (row, instructor name, candidate slot IDs) per lab
+        table: SlotTable the slots come from
+        lab_room_ids: room IDs labs may use
+        fixed: committed classes that stay where they are, see fixed_bookings
+    """
+
+    def __init__(self, columns, requests, table, lab_room_ids, fixed=None):
+        self.columns = columns
+        self.requests = requests
+        self.table = table
+        self.lab_room_ids = lab_room_ids
+        self.fixed_rooms, fixed_instructors = fixed_occupancy(fixed, table)
+        self.theory_busy = dict(fixed_instructors)
+        for row in range(len(columns)):
+            if not columns.lab[row] and columns.slot[row] >= 0:
+                name = columns.names[columns.faculty[row]]
+                self.theory_busy[name] = self.theory_busy.get(name, 0) | table.slot_masks[columns.slot[row]]
+
+        self.assigned = {}      # request -> (slot, room)
+        self.room_labs = {}     # room -> {request: slot}
+        self.faculty_labs = {}  # name -> {request: slot}
+        for request, (row, _, _) in enumerate(requests):
+            if columns.reason[row] < 0:
+                self._assign(request, columns.slot[row], columns.room[row])
+
+    def _assign(self, request, slot, room):
+        name = self.requests[request][1]
+        self.assigned[request] = (slot, room)
+        self.room_labs.setdefault(room, {})[request] = slot
+        self.faculty_labs.setdefault(name, {})[request] = slot
+
+    def _unassign(self, request):
+        slot, room = self.assigned.pop(request)
+        del self.room_labs[room][request]
+        del self.faculty_labs[self.requests[request][1]][request]
+        return slot, room
+
+    def _blockers(self, request, slot, room):
+        mask = self.table.slot_masks[slot]
+        masks = self.table.slot_masks
+        blockers = {r for r, s in self.room_labs.get(room, {}).items() if masks[s] & mask}
+        name = self.requests[request][1]
+        blockers.update(r for r, s in self.faculty_labs.get(name, {}).items() if masks[s] & mask)
+        blockers.discard(request)
+        return blockers
+
+    def _augment(self, request, visited):
+        name = self.requests[request][1]
+        theory_busy = self.theory_busy.get(name, 0)
+        for slot in self.requests[request][2]:
+            if theory_busy & self.table.slot_masks[slot]:
+                continue
+            for room in self.lab_room_ids:
+                if self.fixed_rooms.get(room, 0) & self.table.slot_masks[slot]:
+                    continue
+                blockers = self._blockers(request, slot, room)
+                if not blockers:
+                    self._assign(request, slot, room)
+                    return True
+                if len(blockers) > 1:
+                    continue
+                other = blockers.pop()
+                if other in visited:
+                    continue
+                visited.add(other)
+                previous = self._unassign(other)
+                self._assign(request, slot, room)
+                if self._augment(other, visited):
+                    return True
+                self._unassign(request)
+                self._assign(other, *previous)
+        return False
+
+    def run(self):
+        """Place as many TBD labs as augmenting paths allow; returns how many were placed"""
+        placed = 0
+        for request in range(len(self.requests)):
+            if request not in self.assigned and self._augment(request, {request}):
+                placed += 1
+        if placed:
+            self._write_back()
+        return placed
+
+    def _write_back(self):
+        for request, (slot, room) in self.assigned.items():
+            self.columns.place(self.table, self.requests[request][0], slot, room)
+
+
+class GenerationCancelled(Exception):
+    """Raised from a progress callback to stop a generation run"""
+
+
+class GenerationStats:
+    """
+    Phase timers and counters filled in by an instrumented generation run.
+
+    Engines take an optional stats argument and only touch it when one is
+    passed, so uninstrumented runs pay nothing beyond an is-None check.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+
+    def add_time(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        return {
+            "phasesMs": {phase: round(seconds * 1000, 3) for phase, seconds in self.phases.items()},
+            "counters": dict(self.counters)
+        }
+
+
+def conflict_summary(classes):
+    """
+    Recount an option's conflict fields from its classes.
+
+    Args:
+        classes: class dicts of one option
+
+    Returns:
+        dict: conflict, conflictCount and conflictMessage as generate_option reports them
+    """
+    unassigned = sum(1 for c in classes if c.get("courseCode") == "UNASSIGNED")
+    lab_conflicts = sum(1 for c in classes if c.get("conflict"))
+    return conflict_fields(unassigned, lab_conflicts)
+
+
+def conflict_fields(unassigned, lab_conflicts):
+    """
+    Conflict fields of an option from its counts, for engines that keep counts
+    rather than class dicts.
+
+    Args:
+        unassigned: theory sections left UNASSIGNED
+        lab_conflicts: labs that could not be placed
+
+    Returns:
+        dict: conflict, conflictCount and conflictMessage
+    """
+    conflict_message = None
+    if unassigned or lab_conflicts:
+        messages = []
+        if unassigned:
+            messages.append(f"Could not schedule {unassigned} section(s)")
+        if lab_conflicts:
+            messages.append(f"Could not schedule {lab_conflicts} lab(s)")
+        conflict_message = " and ".join(messages) + " due to availability conflicts."
+    return {
+        "conflict": unassigned + lab_conflicts > 0,
+        "conflictCount": unassigned + lab_conflicts,
+        "conflictMessage": conflict_message
+    }
+
+
+# Built once at import so every generation run reuses the parsed masks
+SLOT_TABLE = SlotTable(rooms=THEORY_ROOMS + LAB_ROOMS)
+
+# Precompute the overlap table for every standard theory and lab slot
+for _days, _times in ((THEORY_DAYS, TIME_SLOTS), (SINGLE_DAYS, LAB_TIME_SLOTS)):
+    for _d in _days:
+        for _t in _times:
+            SLOT_TABLE.slot_id(_d, _t)
+
+# Only the campus configuration lives here; requests intern into SLOT_TABLE.scoped()
+SLOT_TABLE.freeze()
+
+
+def generate_option(instructors, total_sections, option_num=1, rng=None, table=SLOT_TABLE, progress=None, rooms=None, stats=None, fixed=None, compact=False):
+    """
+    Build one schedule option with the greedy round-robin generator.
+
+    Args:
+        instructors: list of instructor dicts as sent by the AI schedule modal
+        total_sections: number of theory sections to place
+        option_num: option number reported back to the client
+        rng: random.Random used for shuffles (defaults to a fresh unseeded one)
+        table: SlotTable used to intern days, times and rooms
+        progress: optional callback(sections_placed, attempts), called every
+            PROGRESS_EVERY attempts; it may raise GenerationCancelled
+        rooms: optional (theory rooms, lab rooms) replacing THEORY_ROOMS and LAB_ROOMS
+        stats: optional GenerationStats to fill with phase times and counters
+        fixed: optional committed classes to build around (warm start), as
+            (faculty, days, time, room) tuples; they are booked up front and
+            never moved or returned
+        compact: return the classes as ClassColumns under "columns" instead
+            of dicts under "classes"; see expand_option
+
+    Returns:
+        dict: the option with its classes, conflict summary and workload
+    """
+    if stats is not None:
+        phase_start = time.perf_counter()
+    rng = rng or random.Random()
+    table = table.scoped()
+    theory_rooms, lab_rooms = rooms or (THEORY_ROOMS, LAB_ROOMS)
+    occupancy = OccupancyIndex(table)
+    for name, room_id, slot_id in fixed_bookings(fixed, table):
+        occupancy.book(name, room_id, slot_id)
+    theory_room_ids = [table.room_id(r) for r in theory_rooms]
+    lab_room_ids = [table.room_id(r) for r in lab_rooms]
+
+    columns = ClassColumns()
+
+    # Shuffle instructors to get different results each time
+    current_instructors = instructors.copy()
+    rng.shuffle(current_instructors)
+
+    # Use sequential section numbers
+    section_counter = 1
+
+    # Track instructor schedules: {instructor_name: set( (day, time) ) }
+    instructor_schedules = {}
+    # Track assigned sections count, starting from the committed ones so
+    # maxSections covers the instructor's whole load
+    committed = fixed_workload(fixed)
+    instructor_workload = {}
+    # Track primary assigned day pattern per instructor
+    instructor_primary_day = {}
+
+    for inst in instructors:
+        name = inst.get('name')
+        instructor_schedules[name] = set()
+        instructor_workload[name] = committed.get(name, 0)
+        instructor_primary_day[name] = None
+
+    # Intern each instructor's candidate slots once instead of on every pass
+    theory_candidates = {}
+    for inst in current_instructors:
+        target_days = inst.get('preferredDays', []) or THEORY_DAYS
+        target_times = inst.get('availableTimes', []) or TIME_SLOTS
+        # Unparseable slots have an empty mask and would never conflict
+        theory_candidates[id(inst)] = [
+            (d, t, slot_id) for d, t, slot_id in
+            ((d, t, table.slot_id(d, t)) for d in target_days for t in target_times)
+            if table.slot_masks[slot_id]
+        ]
+
+    # Weighted priority queue that deals sections out in rounds
+    widest = max((len(c) for c in theory_candidates.values()), default=0) or 1
+    balancer = WorkloadBalancer(
+        current_instructors,
+        instructor_workload,
+        [len(theory_candidates[id(inst)]) / widest for inst in current_instructors]
+    )
+
+    # Limit iterations to prevent infinite loops
+    max_attempts = total_sections * 10
+    attempts = 0
+
+    # Track lab conflicts
+    lab_conflict_count = 0
+    # (row, instructor, candidate slot IDs) of every lab, for LabAllocator
+    lab_requests = []
+
+    if stats is not None:
+        stats.add_time("setup", time.perf_counter() - phase_start)
+
+    while section_counter <= total_sections and attempts < max_attempts:
+        attempts += 1
+        if progress and attempts % PROGRESS_EVERY == 0:
+            progress(section_counter - 1, attempts)
+
+        inst_index = balancer.pop()
+        if inst_index is None:
+            break
+        inst = current_instructors[inst_index]
+
+        section_num = section_counter
+
+        assigned = False
+        name = inst.get('name', 'Unknown')
+        course = inst.get('courseCode', 'Unknown')
+
+        # Lab configuration
+        has_lab = inst.get('hasLab', False)
+        lab_days_pref = inst.get('labDays', [])
+        lab_times_pref = inst.get('labTimes', [])
+
+        if stats is not None:
+            phase_start = time.perf_counter()
+
+        inst_schedule = instructor_schedules.get(name, set())
+        primary_day = instructor_primary_day.get(name)
+
+        tier1_slots = []
+        tier2_slots = []
+
+        for slot in theory_candidates[id(inst)]:
+            if primary_day and slot[0] == primary_day:
+                tier1_slots.append(slot)
+            else:
+                tier2_slots.append(slot)
+
+        existing_indices = [TIME_SLOT_INDEX.get(t, 0) for d, t in inst_schedule if d == primary_day]
+        if existing_indices and tier1_slots:
+            tier1_slots.sort(key=lambda slot: min(abs(TIME_SLOT_INDEX.get(slot[1], 0) - idx) for idx in existing_indices))
+        else:
+            rng.shuffle(tier1_slots)
+
+        rng.shuffle(tier2_slots)
+
+        if stats is not None:
+            now = time.perf_counter()
+            stats.add_time("tiering", now - phase_start)
+            phase_start = now
+            lab_seconds = 0.0
+
+        # Try to find a room & time for theory class
+        for day_val, time_val, slot_id in tier1_slots + tier2_slots:
+            slot_mask = table.slot_masks[slot_id]
+            if stats is not None:
+                stats.count("slotsTried")
+            if not occupancy.instructor_free(name, slot_mask):
+                if stats is not None:
+                    stats.count("instructorBusy")
+                continue
+
+            current_rooms = theory_room_ids.copy()
+            rng.shuffle(current_rooms)
+
+            room_id = None
+            for probes, candidate in enumerate(current_rooms, 1):
+                if occupancy.room_free(candidate, slot_mask):
+                    room_id = candidate
+                    break
+            if stats is not None:
+                stats.count("roomProbes", probes if current_rooms else 0)
+            if room_id is None:
+                continue
+
+            # Assign theory class
+            occupancy.book(name, room_id, slot_id)
+            inst_schedule.add((day_val, time_val))
+            instructor_workload[name] = instructor_workload.get(name, 0) + 1
+
+            if not instructor_primary_day[name]:
+                instructor_primary_day[name] = day_val
+
+            columns.add(table, name, course, section_num, False, slot_id, room_id)
+            assigned = True
+
+            # If instructor has lab enabled, schedule lab class with same section
+            if has_lab:
+                if stats is not None:
+                    lab_start = time.perf_counter()
+                lab_assigned = False
+                lab_target_days = lab_days_pref if lab_days_pref else SINGLE_DAYS
+                lab_target_times = lab_times_pref if lab_times_pref else LAB_TIME_SLOTS
+
+                # Shuffle for variety
+                lab_day_list = list(lab_target_days)
+                lab_time_list = list(lab_target_times)
+                rng.shuffle(lab_day_list)
+                rng.shuffle(lab_time_list)
+
+                lab_conflict_reason = None
+
+                for lab_day in lab_day_list:
+                    if lab_assigned: break
+                    for lab_time in lab_time_list:
+                        if lab_assigned: break
+
+                        lab_slot_id = table.slot_id(lab_day, lab_time)
+                        if not table.slot_masks[lab_slot_id]:
+                            continue
+
+                        # Instructor must be free of theory classes and other labs
+                        # for the whole lab (3-hour labs vs 1.5-hour theory included)
+                        is_available, conflict_msg = validate_instructor_availability_for_lab(
+                            occupancy,
+                            name,
+                            lab_day,
+                            lab_time
+                        )
+
+                        if stats is not None:
+                            stats.count("labValidations")
+                        if not is_available:
+                            if stats is not None:
+                                stats.count("labRejections")
+                            lab_conflict_reason = conflict_msg
+                            continue
+
+                        # Try to find available lab room
+                        lab_mask = table.slot_masks[lab_slot_id]
+                        available_lab_rooms = lab_room_ids.copy()
+                        rng.shuffle(available_lab_rooms)
+
+                        for lab_room_id in available_lab_rooms:
+                            if stats is not None:
+                                stats.count("labRoomProbes")
+                            if occupancy.room_free(lab_room_id, lab_mask):
+                                # Assign lab class
+                                occupancy.book(name, lab_room_id, lab_slot_id)
+                                inst_schedule.add((lab_day, lab_time))
+
+                                # Same section and faculty as the theory class
+                                lab_row = columns.add(table, name, course, section_num, True, lab_slot_id, lab_room_id)
+                                lab_assigned = True
+                                break
+
+                # If lab couldn't be assigned, add conflict entry with detailed reason
+                if not lab_assigned:
+                    lab_conflict_count += 1
+                    conflict_detail = lab_conflict_reason or "No available lab room/time slot"
+                    lab_row = columns.add(table, name, course, section_num, True, reason=conflict_detail)
+                lab_requests.append((
+                    lab_row,
+                    name,
+                    [slot_id for slot_id in (table.slot_id(d, t) for d in lab_day_list for t in lab_time_list)
+                     if table.slot_masks[slot_id]]
+                ))
+
+                if stats is not None:
+                    lab_seconds += time.perf_counter() - lab_start
+
+            break
+
+        if stats is not None:
+            stats.add_time("labPlacement", lab_seconds)
+            stats.add_time("roomSearch", time.perf_counter() - phase_start - lab_seconds)
+
+        if assigned:
+            section_counter += 1
+            balancer.push(inst_index)
+        elif stats is not None:
+            # Not pushed back: an instructor with no free slot now never gets one later
+            stats.count("instructorsRetired")
+
+    if progress:
+        progress(section_counter - 1, attempts)
+
+    # Greedy placement takes the first free lab cell; when that left labs TBD,
+    # re-place them by augmenting paths, moving already placed labs if needed
+    if lab_conflict_count:
+        if stats is not None:
+            phase_start = time.perf_counter()
+        recovered = LabAllocator(columns, lab_requests, table, lab_room_ids, fixed).run()
+        lab_conflict_count -= recovered
+        if stats is not None:
+            stats.add_time("labMatching", time.perf_counter() - phase_start)
+            stats.count("labsRecovered", recovered)
+
+    if stats is not None:
+        stats.count("attempts", attempts)
+        stats.count("sectionsPlaced", section_counter - 1)
+        stats.count("labsUnplaced", lab_conflict_count)
+        phase_start = time.perf_counter()
+
+    # Post-check: If we couldn't fill all sections, the rest are reported UNASSIGNED
+    conflict_count = max(0, total_sections - section_counter + 1)
+    columns.unassigned_from = section_counter
+    columns.unassigned = conflict_count
+
+    # Prepare Workload Summary
+    workload_summary = [{"name": k, "count": v - committed.get(k, 0)} for k, v in instructor_workload.items()]
+
+    if stats is not None:
+        stats.add_time("postCheck", time.perf_counter() - phase_start)
+
+    option = {"option": option_num}
+    if compact:
+        option["columns"] = columns
+    else:
+        option["classes"] = columns.to_dicts()
+    option.update(conflict_fields(conflict_count, lab_conflict_count))
+    option["workload"] = workload_summary
+    return option
+
+
+_option_pool = None
+_option_pool_workers = 0
+_option_pool_lock = threading.Lock()
+
+def get_option_pool():
+    """Process pool shared by all generation requests, created on first use"""
+    global _option_pool, _option_pool_workers
+    with _option_pool_lock:
+        if _option_pool is None:
+            _option_pool_workers = int(os.environ.get('SCHEDULER_WORKERS', 0)) or os.cpu_count() or 1
+            _option_pool = ProcessPoolExecutor(
+                max_workers=_option_pool_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _option_pool
+
+def reset_option_pool():
+    """Drop the shared pool, e.g. after a worker crashed and broke it"""
+    global _option_pool
+    with _option_pool_lock:
+        if _option_pool is not None:
+            _option_pool.shutdown(wait=False, cancel_futures=True)
+            _option_pool = None
+
+def option_seeds(seed, num_options):
+    """Derive one RNG seed per option from the run seed"""
+    seeder = random.Random(seed)
+    return [seeder.getrandbits(32) for _ in range(num_options)]
+
+def get_engine(engine):
+    """Return the option builder for an engine name"""
+    if engine == 'csp':
+        # Imported here: csp_solver builds on this module
+        from csp_solver import solve_option
+        return solve_option
+    return generate_option
+
+def solve_shard(instructors, total_sections, option_num, seed, engine='greedy', time_budget_ms=0, progress=None, stats=False, fixed=None, compact=False):
+    """
+    Build one option for exactly these instructors; the unit of work on the option pool.
+
+    With stats, the option carries a "stats" dict of phase times and counters.
+    fixed lists committed classes to build around, see generate_option; with
+    compact (and no optimizer run) the classes stay ClassColumns.
+    """
+    rng = random.Random(seed)
+    collector = GenerationStats() if stats else None
+    started = time.perf_counter()
+    option = get_engine(engine)(
+        instructors, total_sections, option_num, rng,
+        progress=progress, stats=collector, fixed=fixed, compact=compact and not time_budget_ms
+    )
+    if time_budget_ms:
+        from schedule_optimizer import optimize_option
+        option = optimize_option(option, instructors, time_budget_ms, rng, progress=progress, stats=collector, fixed=fixed)
+    option["seed"] = seed
+    if collector is not None:
+        option["stats"] = dict(
+            collector.to_dict(),
+            option=option_num,
+            engine=engine,
+            wallMs=round((time.perf_counter() - started) * 1000, 3)
+        )
+    return option
+
+def combine_stats(parts):
+    """Sum the stats dicts of an option's shards"""
+    phases = {}
+    counters = {}
+    for part in parts:
+        for phase, ms in part["phasesMs"].items():
+            phases[phase] = round(phases.get(phase, 0.0) + ms, 3)
+        for name, value in part["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+    return {
+        "phasesMs": phases,
+        "counters": counters,
+        "option": parts[0]["option"],
+        "engine": parts[0]["engine"],
+        "wallMs": round(sum(part["wallMs"] for part in parts), 3),
+        "shards": len(parts)
+    }
+
+def optimizer_ms(options):
+    """Optimizer time the options spent, in milliseconds"""
+    return sum(option.get("optimizer", {}).get("elapsedMs", 0) for option in options)
+
+def merge_option(instructors, total_sections, option_num, seed, engine, time_budget_ms, stats, shard_options, fixed=None, plan=None):
+    """
+    Merge an option's solved shards.
+
+    Sections a shard could not place are first moved to shards with room
+    (see rebalance_shards). Sharding must never cost a section: if the merged
+    option still has conflicts, or the merge check fails, the option is also
+    solved whole and the sharded one is kept only when it is strictly better.
+
+    time_budget_ms is the whole option's budget: the shards were given shares
+    of it, and the rebalance and the whole solve only get what they left.
+    """
+    from schedule_shards import ShardMergeError, merge_shards, rebalance_shards
+    shard_options = [expand_option(shard) for shard in shard_options]
+    remaining = max(0, time_budget_ms - int(optimizer_ms(shard_options)))
+    if plan is not None:
+        solved = shard_options
+        shard_options = rebalance_shards(plan, shard_options, option_num, seed, engine, remaining, stats, fixed)
+        resolved = [shard for shard, before in zip(shard_options, solved) if shard is not before]
+        remaining = max(0, remaining - int(optimizer_ms(resolved)))
+    try:
+        option = merge_shards(shard_options, total_sections, option_num)
+    except ShardMergeError as e:
+        print(f"Shard merge failed, building option {option_num} unsharded: {e}")
+        return solve_shard(instructors, total_sections, option_num, seed, engine, remaining, stats=stats, fixed=fixed)
+    if option["conflictCount"]:
+        whole = solve_shard(instructors, total_sections, option_num, seed, engine, remaining, stats=stats, fixed=fixed)
+        if whole["conflictCount"] <= option["conflictCount"]:
+            return whole
+    # Instructors of shards that got no sections are listed with count 0,
+    # as an unsharded option lists them
+    counts = {}
+    for entry in option["workload"]:
+        counts[entry["name"]] = counts.get(entry["name"], 0) + entry["count"]
+    option["workload"] = [
+        {"name": name, "count": counts.get(name, 0)}
+        for name in dict.fromkeys(inst.get('name') for inst in instructors)
+    ]
+    option["seed"] = seed
+    option["shards"] = len(shard_options)
+    if any(shard.get("timedOut") for shard in shard_options):
+        option["timedOut"] = True
+    if stats:
+        option["stats"] = combine_stats([shard["stats"] for shard in shard_options])
+    return option
+
+def build_option(instructors, total_sections, option_num, seed, engine='greedy', time_budget_ms=0, progress=None, stats=False, fixed=None):
+    """
+    Build one option from its own seed, solving its independent shards one after another.
+
+    Used by profiling and by schedule jobs when the option pool is broken;
+    generate_options spreads the same shards over the option pool instead,
+    and both give the same option for the same seed.
+    """
+    from schedule_shards import plan_shards, shard_budgets
+    plan = plan_shards(instructors, total_sections, fixed=fixed)
+    if len(plan) == 1:
+        return solve_shard(instructors, total_sections, option_num, seed, engine, time_budget_ms, progress, stats, fixed)
+
+    shard_options = []
+    offset = 0
+    budgets = shard_budgets([quota for _, quota in plan], time_budget_ms)
+    for (shard_instructors, quota), shard_seed, budget in zip(plan, option_seeds(seed, len(plan)), budgets):
+        shard_progress = None
+        if progress:
+            shard_progress = lambda placed, attempts, offset=offset: progress(offset + placed, attempts)
+        shard_options.append(
+            solve_shard(shard_instructors, quota, option_num, shard_seed, engine, budget, shard_progress, stats, fixed)
+        )
+        offset += quota
+    return merge_option(instructors, total_sections, option_num, seed, engine, time_budget_ms, stats, shard_options, fixed, plan)
+
+def new_seed():
+    """Fresh run seed for requests that did not ask for one"""
+    return random.SystemRandom().getrandbits(32)
+
+def offset_sections(option, offset):
+    """
+    Number an option's sections after offset existing ones, in place.
+
+    Warm-started runs fill only the missing sections, so their "01", "02"...
+    continue after the highest section already committed.
+    """
+    if not offset:
+        return option
+    for cls in option["classes"]:
+        cls["section"] = f"{int(cls['section']) + offset:02d}"
+        if cls.get("type") == "lab" and not cls.get("conflict"):
+            cls["rationale"] = f"Lab for {cls['courseCode'][:-1]} section {cls['section']}"
+    return option
+
+def option_tasks(instructors, total_sections, seeds, time_budget_ms=0, fixed=None):
+    """
+    Split options into their pool tasks, one per (option, shard).
+
+    Independent shards of every option are separate tasks, so a single large
+    option still spreads over the pool; each shard gets its share of the
+    option's time budget (see shard_budgets).
+
+    Args:
+        seeds: one seed per option, from option_seeds
+        instructors, total_sections, time_budget_ms, fixed: as for generate_options
+
+    Returns:
+        tuple: (plan from plan_shards,
+                tasks: (instructors, total_sections, option_num, seed) per task,
+                budgets: time budget per task), tasks grouped by option in option order
+    """
+    from schedule_shards import plan_shards, shard_budgets
+    plan = plan_shards(instructors, total_sections, fixed=fixed)
+    budgets = shard_budgets([quota for _, quota in plan], time_budget_ms)
+    tasks = []
+    for n, s in enumerate(seeds, start=1):
+        if len(plan) == 1:
+            tasks.append((instructors, total_sections, n, s))
+        else:
+            for (shard_instructors, quota), shard_seed in zip(plan, option_seeds(s, len(plan))):
+                tasks.append((shard_instructors, quota, n, shard_seed))
+    return plan, tasks, budgets * len(seeds)
+
+def generate_options(instructors, total_sections, num_options=3, seed=None, engine='greedy', time_budget_ms=0, stats=False, fixed=None, compact=False):
+    """
+    Build independent schedule options, in parallel when the work is large enough.
+
+    Args:
+        instructors: list of instructor dicts
+        total_sections: number of theory sections per option
+        num_options: how many options to build
+        seed: run seed; the same seed reproduces the same options
+        engine: one of ENGINES
+        time_budget_ms: local-search budget per option (0 skips the optimizer)
+        stats: attach per-option phase times and counters, see build_option
+        fixed: committed classes every option is built around, see generate_option
+        compact: leave unsharded options as ClassColumns, for callers that score
+            options before keeping a few of them (see expand_option)
+
+    Returns:
+        tuple: (options: list of option dicts in option order, seed: int)
+    """
+    if seed is None:
+        seed = new_seed()
+    seeds = option_seeds(seed, num_options)
+    numbers = range(1, num_options + 1)
+
+    plan, tasks, task_budgets = option_tasks(instructors, total_sections, seeds, time_budget_ms, fixed)
+
+    results = None
+    if len(tasks) > 1 and (time_budget_ms or num_options * total_sections >= PARALLEL_MIN_WORK):
+        pool = get_option_pool()
+        chunksize = max(1, len(tasks) // (_option_pool_workers * 4))
+        try:
+            results = list(pool.map(
+                solve_shard, *zip(*tasks), repeat(engine), task_budgets, repeat(None), repeat(stats),
+                repeat(fixed), repeat(compact), chunksize=chunksize
+            ))
+        except BrokenProcessPool:
+            print("Option pool broke, building options serially")
+            reset_option_pool()
+    if results is None:
+        results = [
+            solve_shard(*task, engine, budget, stats=stats, fixed=fixed, compact=compact)
+            for task, budget in zip(tasks, task_budgets)
+        ]
+
+    if len(plan) == 1:
+        return results, seed
+    options = []
+    for index, (n, s) in enumerate(zip(numbers, seeds)):
+        shard_options = results[index * len(plan):(index + 1) * len(plan)]
+        options.append(merge_option(instructors, total_sections, n, s, engine, time_budget_ms, stats, shard_options, fixed, plan))
+    return options, seed
+
+def profile_generation(instructors, total_sections, num_options=3, seed=None, engine='greedy', time_budget_ms=0, top=PROFILE_TOP, fixed=None):
+    """
+    Build options serially under cProfile to show where a slow input spends its time.
+
+    Runs in this process so the profiler sees every call, which also means it
+    never uses the option pool; options carry stats as with stats=True.
+
+    Returns:
+        tuple: (options, seed, hottest functions by cumulative time)
+    """
+    import cProfile
+    import pstats
+
+    if seed is None:
+        seed = new_seed()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        options = [
+            build_option(instructors, total_sections, n, s, engine, time_budget_ms, stats=True, fixed=fixed)
+            for n, s in zip(range(1, num_options + 1), option_seeds(seed, num_options))
+        ]
+    finally:
+        profiler.disable()
+
+    rows = []
+    for (filename, line, function), (primitive, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "calls": calls,
+            "primitiveCalls": primitive,
+            "totalMs": round(own * 1000, 3),
+            "cumulativeMs": round(cumulative * 1000, 3)
+        })
+    rows.sort(key=lambda row: row["cumulativeMs"], reverse=True)
+    return options, seed, rows[:top]
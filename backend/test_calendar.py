@@ -0,0 +1,105 @@
+"""Tests for the calendar PDF pipeline used by /api/upload-calendar and /api/calendar-jobs"""
+import io
+import json
+
+import calendar_store
+from bench_calendar import reference_categorize_event, reference_parse_events, synthetic_text
+from calendar_jobs import CalendarJob, CalendarJobManager
+from calendar_parser import (
+    EventJsonWriter, categorize_event, iter_events, iter_lines, page_ranges, parse_events_from_text
+)
+
+def test_calendar_events_stream_before_later_pages_are_read(tmp_path):
+    def pages():
+        yield "Fall 2025\n6-Sep-25 Saturday First day of classes\n"
+        raise AssertionError("second page read before the first event was used")
+
+    assert next(iter_events(iter_lines(pages())))["date"] == "2025-09-06"
+
+    text = "6-Sep-25 Saturday Mid-term exam week\n15 January 2026 Spring registration\nno date here"
+    events = list(iter_events(iter_lines([text])))
+    assert [(e["date"], e["type"]) for e in events] == [("2025-09-06", "exam"), ("2026-01-15", "registration")]
+    path = tmp_path / "events.json"
+    with EventJsonWriter(str(path)) as writer:
+        for event in events:
+            writer(event)
+    assert path.read_text(encoding="utf-8") == json.dumps(events, indent=2, ensure_ascii=False)
+    with EventJsonWriter(str(path)):
+        pass
+    assert json.loads(path.read_text(encoding="utf-8")) == []
+
+def test_pdf_page_ranges_cover_every_page_in_order():
+    for page_count, workers in ((1, 4), (16, 2), (301, 8), (7, 1)):
+        ranges = page_ranges(page_count, workers)
+        assert [page for start, stop in ranges for page in range(start, stop)] == list(range(page_count))
+        assert len(ranges) <= workers * 4
+
+def test_calendar_store_dedupes_uploads_and_caches_parses(tmp_path, monkeypatch):
+    store = calendar_store.CalendarStore(str(tmp_path))
+    digest, path, duplicate = store.save(io.BytesIO(b"%PDF-1.4 calendar"))
+    assert not duplicate and path.endswith(f"{digest}.pdf")
+    assert store.save(io.BytesIO(b"%PDF-1.4 calendar")) == (digest, path, True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([f"{digest}.pdf", "parsed"])
+
+    parsed = []
+    event = {"date": "2025-09-06", "title": "First day of classes", "type": "other", "dayOfWeek": "Saturday"}
+    monkeypatch.setattr(calendar_store, "iter_pdf_events", lambda pdf_path, progress: parsed.append(pdf_path) or iter([event]))
+    assert store.parse(digest) == ([event], False)
+    seen = []
+    assert store.parse(digest, sink=seen.append) == ([event], True)
+    assert seen == [event] and parsed == [path]
+
+def test_calendar_job_streams_events_and_page_progress(tmp_path):
+    events = [{"date": "2025-09-06", "title": "Classes begin", "type": "other", "dayOfWeek": "Saturday"},
+              {"date": "2025-12-16", "title": "Final exams", "type": "exam", "dayOfWeek": "Tuesday"}]
+
+    class PagedStore:
+        def parse(self, digest, sink=None, progress=None):
+            progress(0, 2)
+            for page, event in enumerate(events, start=1):
+                sink(event)
+                progress(page, 2)
+            return events, False
+
+    manager = CalendarJobManager(workers=1)
+    job = manager.submit_job(CalendarJob(PagedStore(), "abc", "abc.pdf", False, str(tmp_path / "events.json")))
+    stream = list(manager.stream(job, heartbeat=1.0))
+    assert [e for batch in stream if batch["event"] == "events" for e in batch["events"]] == events
+    assert stream[-1]["event"] == "done"
+    assert stream[-1]["progress"] == {"pagesProcessed": 2, "pageCount": 2, "eventsFound": 2}
+    assert json.loads((tmp_path / "events.json").read_text(encoding="utf-8")) == events
+
+def test_calendar_job_stops_when_cancelled_and_fails_on_parse_errors(tmp_path, monkeypatch):
+    store = calendar_store.CalendarStore(str(tmp_path))
+    digest, _, _ = store.save(io.BytesIO(b"%PDF-1.4 calendar"))
+    event = {"date": "2025-09-06", "title": "Classes begin", "type": "other", "dayOfWeek": "Saturday"}
+
+    def unreadable(pdf_path, progress):
+        yield event
+        raise ValueError("page 2 is unreadable")
+
+    monkeypatch.setattr(calendar_store, "iter_pdf_events", unreadable)
+    job = CalendarJob(store, digest, "cal.pdf", False, str(tmp_path / "events.json"))
+    job.run()
+    assert (job.status, job.error, job.events) == ("failed", "page 2 is unreadable", [event])
+    assert store.cached_events(digest) is None and not (tmp_path / "events.json").exists()
+
+    def pages(pdf_path, progress):
+        for page in range(1, 4):
+            progress(page, 3)
+            yield dict(event, title=f"Event on page {page}")
+            job.cancel_event.set()      # the client cancels once the first event is in
+
+    monkeypatch.setattr(calendar_store, "iter_pdf_events", pages)
+    job = CalendarJob(store, digest, "cal.pdf", False, str(tmp_path / "events.json"))
+    job.run()
+    assert job.status == "cancelled" and len(job.events) == 1
+    assert store.cached_events(digest) is None
+
+def test_compiled_calendar_parser_matches_the_reference():
+    text = synthetic_text(2000, seed=3) + "\n15 March 2026 until 2025-Sep-25 Monday Eid holiday\n1-jan-26 Thursday New Year"
+    events = parse_events_from_text(text)
+    assert events == reference_parse_events(text)
+    assert events[-2]["date"] == "2025-09-25" and events[-1]["type"] == "holiday"
+    for title in ("Final exam", "Course evaluation feedback", "Add/Drop", "Spring break", "Convocation", "midterm advising"):
+        assert categorize_event(title) == reference_categorize_event(title)
@@ -0,0 +1,645 @@
+"""Tests for the scheduling core used by /api/generate-schedule"""
+import random
+
+import pytest
+
+import scheduler
+from csp_solver import solve_option
+from schedule_optimizer import optimize_option
+from schedule_repair import repair_option
+from scheduler import (
+    SLOT_TABLE, SlotTable, OccupancyIndex, generate_option,
+    generate_options, check_day_overlap, check_time_overlap, validate_instructor_availability_for_lab
+)
+
+def make_instructors(count=4, has_lab=False):
+    return [
+        {
+            "name": f"INS{i}",
+            "courseCode": f"CSE{100 + i}",
+            "preferredDays": [],
+            "availableTimes": [],
+            "maxSections": 3,
+            "hasLab": has_lab,
+            "labDays": [],
+            "labTimes": []
+        }
+        for i in range(count)
+    ]
+
+def assert_no_overlaps(classes):
+    placed = [c for c in classes if c["days"] != "TBD"]
+    for i, a in enumerate(placed):
+        for b in placed[i + 1:]:
+            if not (check_day_overlap(a["days"], b["days"]) and check_time_overlap(a["time"], b["time"])):
+                continue
+            assert a["room"] != b["room"], (a, b)
+            assert a["faculty"] != b["faculty"], (a, b)
+
+def test_slot_masks_match_string_overlap():
+    table = SlotTable()
+    patterns = ['ST', 'MW', 'RA', 'S', 'T', 'W']
+    times = ['08:00 AM - 09:30 AM', '09:40 AM - 11:10 AM', '08:00 AM - 11:10 AM', '12:50 PM - 04:10 PM', '11:20 AM - 12:50 PM']
+    for d1 in patterns:
+        for t1 in times:
+            for d2 in patterns:
+                for t2 in times:
+                    expected = check_day_overlap(d1, d2) and check_time_overlap(t1, t2)
+                    assert bool(table.mask(d1, t1) & table.mask(d2, t2)) == expected
+
+def test_unparseable_slots_never_conflict():
+    assert SLOT_TABLE.mask('TBD', 'TBD') == 0
+
+def test_occupancy_index_books_rooms_and_instructors():
+    occupancy = OccupancyIndex(SLOT_TABLE)
+    room = SLOT_TABLE.room_id('LIB601')
+    occupancy.book('RJP', room, SLOT_TABLE.slot_id('S', '08:00 AM - 11:10 AM'))
+    assert not occupancy.room_free(room, SLOT_TABLE.mask('S', '09:40 AM - 12:50 PM'))
+    assert not occupancy.instructor_free('RJP', SLOT_TABLE.mask('ST', '09:40 AM - 11:10 AM'))
+    assert occupancy.instructor_free('RJP', SLOT_TABLE.mask('MW', '09:40 AM - 11:10 AM'))
+
+def test_overlap_table_links_theory_and_lab_slots():
+    theory = SLOT_TABLE.slot_id('ST', '09:40 AM - 11:10 AM')
+    assert SLOT_TABLE.slot_id('S', '08:00 AM - 11:10 AM') in SLOT_TABLE.overlaps[theory]
+    assert SLOT_TABLE.slot_id('T', '11:20 AM - 02:30 PM') not in SLOT_TABLE.overlaps[theory]
+    assert SLOT_TABLE.slot_id('M', '08:00 AM - 11:10 AM') not in SLOT_TABLE.overlaps[theory]
+
+def test_lab_validation_names_the_blocking_class():
+    occupancy = OccupancyIndex(SLOT_TABLE)
+    occupancy.book('RJP', SLOT_TABLE.room_id('NAC210'), SLOT_TABLE.slot_id('ST', '09:40 AM - 11:10 AM'))
+    available, message = validate_instructor_availability_for_lab(occupancy, 'RJP', 'T', '08:00 AM - 11:10 AM')
+    assert not available
+    assert message.endswith("Conflict with existing class on ST at 09:40 AM - 11:10 AM")
+    assert validate_instructor_availability_for_lab(occupancy, 'RJP', 'M', '08:00 AM - 11:10 AM') == (True, None)
+
+def test_generate_option_places_all_sections_without_overlaps():
+    option = generate_option(make_instructors(4, has_lab=True), 10, rng=random.Random(7))
+    theory = [c for c in option["classes"] if c["type"] == "theory"]
+    assert len(theory) == 10
+    assert all(c["courseCode"] != "UNASSIGNED" for c in theory)
+    assert_no_overlaps(option["classes"])
+
+def test_generate_option_reports_unassigned_sections():
+    option = generate_option(make_instructors(1), 5, rng=random.Random(1))
+    assert option["conflictCount"] == 2
+    assert sum(1 for c in option["classes"] if c["courseCode"] == "UNASSIGNED") == 2
+
+def test_generate_options_is_reproducible_from_seed():
+    instructors = make_instructors(5, has_lab=True)
+    first, seed = generate_options(instructors, 8, num_options=4, seed=42)
+    second, _ = generate_options(instructors, 8, num_options=4, seed=seed)
+    assert [o["option"] for o in first] == [1, 2, 3, 4]
+    assert first == second
+
+def test_parallel_options_match_serial(monkeypatch):
+    instructors = make_instructors(5, has_lab=True)
+    serial, _ = generate_options(instructors, 8, num_options=4, seed=3)
+    monkeypatch.setattr(scheduler, "PARALLEL_MIN_WORK", 1)
+    try:
+        parallel, _ = generate_options(instructors, 8, num_options=4, seed=3)
+    finally:
+        scheduler.reset_option_pool()
+    assert parallel == serial
+
+def round_robin_loads(instructors, total_sections, takes):
+    """Loads dealt by the list queue WorkloadBalancer replaced"""
+    workload = {inst["name"]: 0 for inst in instructors}
+    queue = instructors.copy()
+    placed = 0
+    while placed < total_sections and queue:
+        inst = queue.pop(0)
+        if workload[inst["name"]] >= inst["maxSections"]:
+            continue
+        queue.append(inst)
+        if workload[inst["name"]] < takes[inst["name"]]:
+            workload[inst["name"]] += 1
+            placed += 1
+        else:
+            queue.pop()
+    return workload
+
+def balancer_loads(instructors, total_sections, takes):
+    workload = {inst["name"]: 0 for inst in instructors}
+    balancer = scheduler.WorkloadBalancer(instructors, workload, [1.0] * len(instructors))
+    placed = 0
+    while placed < total_sections:
+        index = balancer.pop()
+        if index is None:
+            break
+        name = instructors[index]["name"]
+        if workload[name] < takes[name]:
+            workload[name] += 1
+            placed += 1
+            balancer.push(index)
+    return workload
+
+def test_workload_balancer_deals_to_the_least_loaded_instructor():
+    instructors = make_instructors(3)
+    workload = {"INS0": 2, "INS1": 0, "INS2": 1}
+    balancer = scheduler.WorkloadBalancer(instructors, workload, [1.0] * 3)
+    assert balancer.pop() == 1
+    workload["INS1"] += 1
+    balancer.push(1)
+    # Equal loads keep first-in, first-out order
+    assert balancer.pop() == 2
+    assert balancer.pop() == 1
+    assert balancer.pop() == 0
+
+def test_workload_balancer_respects_max_sections():
+    instructors = make_instructors(3)
+    instructors[0]["maxSections"] = 1
+    instructors.append(dict(instructors[1], courseCode="CSE999", maxSections=2))
+    workload = {inst["name"]: 0 for inst in instructors}
+    balancer = scheduler.WorkloadBalancer(instructors, workload, [1.0] * len(instructors))
+    dealt = 0
+    while (index := balancer.pop()) is not None:
+        name = instructors[index]["name"]
+        # A row is never dealt to once its name has maxSections, even when
+        # the other row of the same instructor took them
+        assert workload[name] < instructors[index]["maxSections"]
+        workload[name] += 1
+        balancer.push(index)
+        dealt += 1
+    assert workload == {"INS0": 1, "INS1": 3, "INS2": 3}
+    assert dealt == 7 and len(balancer) == 0
+
+def test_workload_balancer_spread_never_wider_than_round_robin():
+    for seed in range(50):
+        rng = random.Random(seed)
+        instructors = make_instructors(rng.randint(2, 8))
+        rng.shuffle(instructors)
+        for inst in instructors:
+            inst["maxSections"] = rng.randint(1, 5)
+        # Sections each instructor can be placed in before a placement fails
+        takes = {inst["name"]: rng.randint(0, 5) for inst in instructors}
+        total = rng.randint(1, 30)
+        old = round_robin_loads(instructors, total, takes)
+        new = balancer_loads(instructors, total, takes)
+        assert sum(new.values()) >= sum(old.values()), seed
+        assert max(new.values()) - min(new.values()) <= max(old.values()) - min(old.values()), seed
+
+def test_generation_requests_reject_malformed_numbers_and_instructors():
+    from scheduler import parse_integer, validate_instructors
+    assert parse_integer(None, "numOptions", 3) == 3
+    assert parse_integer("4", "numOptions") == parse_integer(4.0, "numOptions") == 4
+    for value in (2.7, "two", [], True, "1e3"):
+        with pytest.raises(ValueError):
+            parse_integer(value, "numOptions")
+
+    checked = validate_instructors([{"name": "A", "courseCode": "CSE115", "maxSections": None, "preferredDays": None}])
+    assert checked[0]["maxSections"] == 3 and checked[0]["preferredDays"] == []
+    for instructors in ("abc", [], ["abc"], [{"courseCode": "CSE115"}], [{"name": "A", "maxSections": "two"}],
+                        [{"name": "A", "maxSections": 0}], [{"name": "A", "preferredDays": "ST"}],
+                        [{"name": "A", "availableTimes": ["8 to 9:30"]}], [{"name": "A", "labDays": ["SX"]}]):
+        with pytest.raises(ValueError):
+            validate_instructors(instructors)
+
+def test_csp_engine_fills_sections_greedy_leaves_unassigned():
+    # Only the 08:00 theory slot leaves room for the single allowed lab slot
+    instructors = [
+        {"name": "X", "courseCode": "CSE115", "preferredDays": ["ST"], "maxSections": 1,
+         "availableTimes": ["08:00 AM - 09:30 AM", "11:20 AM - 12:50 PM"],
+         "hasLab": True, "labDays": ["S"], "labTimes": ["11:20 AM - 02:30 PM"]}
+    ]
+    greedy = [generate_option(instructors, 1, rng=random.Random(s))["conflictCount"] for s in range(20)]
+    assert any(greedy)
+    for seed in range(20):
+        option = solve_option(instructors, 1, rng=random.Random(seed))
+        assert option["conflictCount"] == 0
+        assert_no_overlaps(option["classes"])
+
+def test_csp_engine_packs_labs_without_overlaps():
+    instructors = make_instructors(40, has_lab=True)
+    options, _ = generate_options(instructors, 100, num_options=1, seed=5, engine="csp")
+    option = options[0]
+    assert_no_overlaps(option["classes"])
+    assert sum(1 for c in option["classes"] if c["courseCode"] == "UNASSIGNED") == 0
+    assert option["conflictCount"] == 0
+
+def test_optimizer_keeps_schedule_valid_and_never_worse():
+    instructors = make_instructors(10, has_lab=True)
+    option = generate_option(instructors, 25, rng=random.Random(4))
+    improved = optimize_option(option, instructors, 50, rng=random.Random(4))
+    assert_no_overlaps(improved["classes"])
+    assert improved["score"]["total"] <= improved["optimizer"]["initialScore"]["total"]
+    assert improved["conflictCount"] <= option["conflictCount"]
+    assert len(improved["classes"]) == len(option["classes"])
+    # Moves stay in the instructors' chosen slots, so there is no preference term to report
+    assert set(improved["score"]) == {"total", "labConflicts", "gapMinutes", "extraDayPatterns", "roomChurn"}
+
+def test_optimizer_keeps_to_the_rooms_the_option_was_built_with():
+    instructors = make_instructors(6, has_lab=True)
+    rooms = (["T1", "T2", "T3"], ["L1", "L2"])
+    table = SlotTable()
+    option = generate_option(instructors, 12, rng=random.Random(2), table=table, rooms=rooms)
+    improved = optimize_option(option, instructors, 50, rng=random.Random(2), table=table, rooms=rooms)
+    placed = [c for c in improved["classes"] if c["days"] != "TBD"]
+    assert placed and all(c["room"] in rooms[c["type"] == "lab"] for c in placed)
+    assert_no_overlaps(improved["classes"])
+
+def test_schedule_job_streams_options_then_finishes():
+    from schedule_jobs import DONE, ScheduleJobManager
+    manager = ScheduleJobManager(workers=1)
+    job = manager.submit({
+        "instructors": make_instructors(5, has_lab=True), "total_sections": 8,
+        "num_options": 3, "seed": 11, "engine": "greedy", "time_budget_ms": 0
+    })
+    events = list(manager.stream(job, heartbeat=1.0))
+    options = [e["option"] for e in events if e["event"] == "option"]
+    assert events[-1]["event"] == DONE
+    assert sorted(options, key=lambda o: o["option"]) == job.results()
+    assert job.results() == generate_options(job.params["instructors"], 8, num_options=3, seed=11)[0]
+
+def test_schedule_job_solves_shards_on_the_pool_and_stops_between_them():
+    from schedule_jobs import CANCELLED, DONE, ScheduleJob
+    instructors = []
+    for dept, days in enumerate(["ST", "MW"]):
+        instructors += [{"name": f"D{dept}I{i}", "courseCode": f"C{dept}{i}", "preferredDays": [days],
+                         "maxSections": 2, "hasLab": False} for i in range(3)]
+    params = {"instructors": instructors, "total_sections": 10, "num_options": 4, "seed": 5,
+              "engine": "greedy", "time_budget_ms": 0}
+    job = ScheduleJob(dict(params))
+    job.run()
+    assert job.status == DONE and all(o["shards"] == 2 for o in job.options)
+    assert job.results() == generate_options(instructors, 10, num_options=4, seed=5)[0]
+
+    class CancelledAfterFirstShard(ScheduleJob):
+        def _publish(self):
+            super()._publish()
+            if self.version == 2:
+                self.cancel_event.set()
+
+    job = CancelledAfterFirstShard(dict(params))
+    job.run()
+    assert job.status == CANCELLED and len(job.options) < 4
+
+def test_schedule_job_stream_keeps_options_that_land_as_the_job_finishes():
+    from schedule_jobs import DONE, RUNNING, ScheduleJob, ScheduleJobManager
+
+    class LateOptions(list):
+        """Options that arrive, with the job finishing, right as the stream first counts them"""
+        def __init__(self, job):
+            super().__init__()
+            self.job = job
+            self.landed = False
+
+        def __len__(self):
+            count = super().__len__()
+            if not self.landed:
+                self.landed = True
+                self.extend({"option": n, "conflictCount": 0} for n in (1, 2, 3))
+                self.job._finish(DONE)
+            return count
+
+    job = ScheduleJob({"seed": 1, "num_options": 3})
+    job.status = RUNNING
+    job.options = LateOptions(job)
+    events = list(ScheduleJobManager(workers=1).stream(job, heartbeat=1.0))
+    assert [e["option"]["option"] for e in events if e["event"] == "option"] == [1, 2, 3]
+    assert events[-1]["event"] == DONE
+
+def test_repair_moves_only_affected_sections():
+    instructors = make_instructors(20, has_lab=True)
+    option = generate_option(instructors, 40, rng=random.Random(6))
+    repaired = repair_option(option, instructors, {"removeInstructors": ["INS3"], "removeRooms": ["LIB601"]}, rng=random.Random(6))
+    assert_no_overlaps(repaired["classes"])
+    assert all(c["faculty"] != "INS3" and c["room"] != "LIB601" for c in repaired["classes"])
+    moved = {(c["section"], c["type"]) for c in repaired["repair"]["changes"]}
+    before = {(c["section"], c["type"]): c for c in option["classes"]}
+    for cls in repaired["classes"]:
+        if (cls["section"], cls["type"]) not in moved:
+            assert before[(cls["section"], cls["type"])] == cls
+    assert all(before[key]["faculty"] == "INS3" or before[key]["room"] == "LIB601" for key in moved)
+
+def test_repair_keeps_the_course_of_an_instructor_with_several_rows():
+    instructors = [
+        {"name": "P", "courseCode": "CSE115", "maxSections": 3, "hasLab": False, "preferredDays": ["ST"]},
+        {"name": "P", "courseCode": "CSE215", "maxSections": 3, "hasLab": True, "preferredDays": ["ST"]},
+        {"name": "Q", "courseCode": "CSE115", "maxSections": 3, "hasLab": False}
+    ]
+    option = generate_option(instructors, 6, rng=random.Random(2))
+    before = sorted((c["courseCode"], c["faculty"]) for c in option["classes"])
+    repaired = repair_option(option, instructors, {"updateInstructors": [{"name": "P", "preferredDays": ["MW"]}]},
+                             rng=random.Random(1))
+    assert sorted((c["courseCode"], c["faculty"]) for c in repaired["classes"]) == before
+    assert {c["days"] for c in repaired["classes"] if c["courseCode"] == "CSE215"} == {"MW"}
+    assert repaired["conflictCount"] == 0
+
+def test_repair_hands_orphans_only_to_rows_of_their_course():
+    instructors = [
+        {"name": "A", "courseCode": "CSE101", "maxSections": 2, "hasLab": True, "preferredDays": ["ST"]},
+        {"name": "B", "courseCode": "CSE102", "maxSections": 4, "hasLab": False, "preferredDays": ["MW"]}
+    ]
+    option = generate_option(instructors, 4, rng=random.Random(3))
+    repaired = repair_option(option, instructors, {"removeInstructors": ["A"]}, rng=random.Random(3))
+    assert not any(c["courseCode"].startswith("CSE101") and c["days"] != "TBD" for c in repaired["classes"])
+    assert all(c["faculty"] != "B" or c["courseCode"] == "CSE102" for c in repaired["classes"])
+
+def test_benchmark_scenario_is_deterministic():
+    from bench_scheduler import compare, run_scenario, scenarios
+    scenario = scenarios("quick")[2]
+    first = run_scenario(scenario, repeat=1)
+    second = run_scenario(scenario, repeat=1)
+    assert first["conflictCount"] == second["conflictCount"]
+    assert first["sectionsPlaced"] == scenario["sections"]
+    assert compare([dict(second, conflictCount=second["conflictCount"] + 1)], {"results": [first]}, tolerance=100)
+
+def test_stats_count_greedy_phases_without_changing_output():
+    instructors = make_instructors(6, has_lab=True)
+    plain, _ = generate_options(instructors, 12, num_options=2, seed=9)
+    instrumented, _ = generate_options(instructors, 12, num_options=2, seed=9, stats=True)
+    stats = [option.pop("stats") for option in instrumented]
+    assert instrumented == plain
+    counters = stats[0]["counters"]
+    assert counters["sectionsPlaced"] == 12
+    assert counters["labRejections"] <= counters["labValidations"]
+    assert set(stats[0]["phasesMs"]) >= {"tiering", "roomSearch", "labPlacement", "postCheck"}
+
+def test_result_cache_keys_and_limits():
+    from schedule_cache import ResultCache, request_key
+    params = {"instructors": make_instructors(2), "total_sections": 4, "num_options": 3,
+              "seed": 1, "engine": "greedy", "time_budget_ms": 0}
+    reordered = dict(params, instructors=[dict(reversed(list(i.items()))) for i in params["instructors"]])
+    assert request_key(params) == request_key(reordered)
+    assert request_key(params) != request_key(dict(params, seed=2))
+
+    cache = ResultCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.put("a", "1234")
+    cache.put("b", "1234")
+    assert cache.get("a") == "1234"
+    cache.put("c", "1234")      # over 10 bytes: evicts b, the least recently used
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["evictions"] == 1
+    cache.ttl = -1
+    cache.put("d", "1")
+    assert cache.get("d") is None
+
+def test_only_clock_independent_results_are_cacheable():
+    from schedule_cache import is_cacheable
+    params = {"instructors": make_instructors(2), "total_sections": 4, "num_options": 1,
+              "seed": 1, "engine": "csp", "time_budget_ms": 0, "candidates": None}
+    assert is_cacheable(params)
+    assert not is_cacheable(dict(params, seed=None))
+    assert not is_cacheable(dict(params, time_budget_ms=50))
+    assert not is_cacheable(dict(params, candidates=10))
+
+    timed_out = solve_option(make_instructors(4), 8, rng=random.Random(1), time_limit=-1)
+    assert timed_out["timedOut"]
+    assert not is_cacheable(params, [timed_out])
+    assert is_cacheable(params, [solve_option(make_instructors(4), 8, rng=random.Random(1))])
+
+def test_ranked_generation_returns_best_candidates_first():
+    from schedule_ranking import generate_ranked, score_candidates
+    instructors = make_instructors(8, has_lab=True)
+    candidates, _ = generate_options(instructors, 16, num_options=30, seed=12)
+    scores = score_candidates(candidates, instructors)
+    ranked, _ = generate_ranked(instructors, 16, 30, top_k=3, seed=12)
+    assert [o["rank"] for o in ranked] == [1, 2, 3]
+    assert [o["ranking"]["total"] for o in ranked] == sorted(s["total"] for s in scores)[:3]
+    assert ranked[0]["ranking"] == scores[ranked[0]["candidate"] - 1]
+
+def test_disjoint_departments_are_solved_as_shards():
+    from schedule_shards import conflict_components
+    instructors = []
+    for dept, (days, lab_days) in enumerate([("ST", ["S", "T"]), ("MW", ["M", "W"]), ("RA", ["R", "A"])]):
+        for i in range(4):
+            instructors.append({"name": f"D{dept}I{i}", "courseCode": f"C{dept}{i}", "preferredDays": [days],
+                                "maxSections": 2, "hasLab": True, "labDays": lab_days})
+    instructors.append(dict(instructors[0], courseCode="C99"))     # same person, second course
+    assert [len(c) for c in conflict_components(instructors)] == [5, 4, 4]
+
+    options, _ = generate_options(instructors, 20, num_options=2, seed=8)
+    for option in options:
+        assert option["shards"] == 3
+        assert_no_overlaps(option["classes"])
+        assert sorted({c["section"] for c in option["classes"]}) == [f"{n:02d}" for n in range(1, 21)]
+
+def test_sharded_options_share_one_time_budget_and_list_every_instructor():
+    from schedule_shards import shard_budgets
+    assert shard_budgets([5, 3, 2], 101) == [51, 30, 20]
+    assert shard_budgets([4, 4], 0) == [0, 0]
+
+    # The second department is entitled to nothing, so its shard is dropped
+    instructors = [
+        {"name": "A", "courseCode": "CSE101", "preferredDays": ["ST"], "maxSections": 2, "hasLab": False},
+        {"name": "B", "courseCode": "CSE102", "preferredDays": ["RA"], "maxSections": 0, "hasLab": False},
+        {"name": "C", "courseCode": "CSE103", "preferredDays": ["MW"], "maxSections": 2, "hasLab": False}
+    ]
+    option = scheduler.build_option(instructors, 3, 1, 4)
+    assert option["shards"] == 2
+    whole = generate_option(instructors, 3, 1, random.Random(4))
+    assert [w["name"] for w in option["workload"]] == [w["name"] for w in whole["workload"]] == ["A", "B", "C"]
+    assert {w["name"]: w["count"] for w in option["workload"]}["B"] == 0
+
+def test_sharding_moves_unplaceable_sections_to_shards_with_room():
+    # A can only use two slots but is entitled to half the sections by maxSections
+    instructors = [
+        {"name": "A", "courseCode": "CSE101", "preferredDays": ["ST"], "availableTimes": scheduler.TIME_SLOTS[:2],
+         "maxSections": 8, "hasLab": False},
+        {"name": "B", "courseCode": "CSE102", "preferredDays": ["RA"], "availableTimes": [],
+         "maxSections": 8, "hasLab": False}
+    ]
+    whole = generate_option(instructors, 8, 1, random.Random(3))
+    assert whole["conflictCount"] == 0
+    for engine in ("greedy", "csp"):
+        options, _ = generate_options(instructors, 8, num_options=2, seed=3, engine=engine)
+        options.append(scheduler.build_option(instructors, 8, 3, 5, engine))
+        for option in options:
+            assert option["conflictCount"] == 0
+            assert len([c for c in option["classes"] if c.get("type") != "lab"]) == 8
+            assert_no_overlaps(option["classes"])
+
+def test_lab_allocator_moves_a_placed_lab_to_free_a_slot():
+    table = scheduler.SLOT_TABLE
+    early = table.slot_id("S", "08:00 AM - 11:10 AM")
+    late = table.slot_id("S", "11:20 AM - 02:30 PM")
+    room = table.room_id("LIB601")
+    columns = scheduler.ClassColumns()
+    a = columns.add(table, "A", "A1", 1, True, early, room)
+    b = columns.add(table, "B", "B1", 2, True, reason="No available lab room/time slot")
+    requests = [(a, "A", [early, late]), (b, "B", [early])]
+    assert scheduler.LabAllocator(columns, requests, table, [room]).run() == 1
+
+    classes = columns.to_dicts()
+    assert (classes[0]["time"], classes[1]["time"]) == ("11:20 AM - 02:30 PM", "08:00 AM - 11:10 AM")
+    assert "conflict" not in classes[1] and "rationale" not in classes[1]
+    assert scheduler.with_rationales(classes)[1]["rationale"] == "Lab for B1 section 02"
+    assert_no_overlaps(classes)
+
+def test_warm_start_builds_around_committed_classes():
+    instructors = make_instructors(4, has_lab=True)
+    fixed = [(f"OTHER{room}", "ST", t, room) for t in scheduler.TIME_SLOTS for room in scheduler.THEORY_ROOMS]
+    fixed += [("INS0", "MW", t, None) for t in scheduler.TIME_SLOTS]
+    fixed += [(f"OTHER{room}", "M", "08:00 AM - 11:10 AM", room) for room in scheduler.LAB_ROOMS]
+    committed = [{"courseCode": "X", "section": "01", "faculty": f, "days": d, "time": t, "room": r or f"NONE{i}",
+                  "type": "theory"} for i, (f, d, t, r) in enumerate(fixed)]
+    for engine in ("greedy", "csp"):
+        options, _ = generate_options(instructors, 8, num_options=2, seed=4, engine=engine, fixed=fixed)
+        for option in options:
+            assert option["conflictCount"] == 0
+            assert not any(c["days"] == "ST" or (c["faculty"] == "INS0" and c["days"] == "MW") for c in option["classes"])
+            assert_no_overlaps(option["classes"] + committed)
+    scheduler.offset_sections(options[0], 5)
+    assert sorted({c["section"] for c in options[0]["classes"]}) == [f"{n:02d}" for n in range(6, 14)]
+
+def test_warm_start_counts_committed_sections_against_max_sections():
+    instructors = make_instructors(3)
+    for inst, days in zip(instructors, ("ST", "MW", "RA")):
+        inst["preferredDays"] = [days]
+    fixed = [("INS0", "ST", t, "NAC210") for t in scheduler.TIME_SLOTS[:3]]
+    fixed += [("INS1", "MW", scheduler.TIME_SLOTS[0], "NAC210"), ("INS1", "S", "08:00 AM - 11:10 AM", "LIB601")]
+    assert scheduler.fixed_workload(fixed) == {"INS0": 3, "INS1": 1}
+    for engine in ("greedy", "csp"):
+        options, _ = generate_options(instructors, 6, num_options=2, seed=2, engine=engine, fixed=fixed)
+        for option in options:
+            taught = {}
+            for cls in option["classes"]:
+                taught[cls["faculty"]] = taught.get(cls["faculty"], 0) + 1
+            assert "INS0" not in taught and taught["INS1"] == 2 and taught["INS2"] == 3
+            assert option["conflictCount"] == 1
+            assert {w["name"]: w["count"] for w in option["workload"]} == {"INS0": 0, "INS1": 2, "INS2": 3}
+
+def test_option_store_pages_and_expires():
+    from schedule_store import OptionStore, option_summary, page_classes
+    option = generate_option(make_instructors(4), 10, rng=random.Random(2))
+    store = OptionStore(max_runs=1, ttl=60)
+    schedule_id = store.put([option], 2)
+    assert store.get(schedule_id)["options"][0] is option
+    assert option_summary(option)["classCount"] == 10 and "classes" not in option_summary(option)
+
+    first = page_classes(option, 0, 4, rationale=False)
+    last = page_classes(option, 8, 4)
+    assert first["nextOffset"] == 4 and last["nextOffset"] is None
+    assert "rationale" not in first["classes"][0] and "rationale" in last["classes"][0]
+    placed = [c for c in option["classes"] if c["days"] != "TBD"]
+    assert placed and not any("rationale" in c for c in placed)     # built per page, not when stored
+    assert last["classes"][0]["rationale"] == scheduler.class_rationale(option["classes"][8])
+
+    newer = store.put([option], 3)     # over max_runs: the older run is evicted
+    assert store.get(schedule_id) is None
+    store.ttl = -1
+    store.get(newer)                    # refreshes the entry with the expired TTL
+    assert store.get(newer) is None
+
+def test_compact_options_expand_to_the_same_classes():
+    import pickle
+    from csp_solver import solve_option
+    instructors = make_instructors(6, has_lab=True)
+    for build in (generate_option, solve_option):
+        full = build(instructors, 20, rng=random.Random(9))
+        compact = pickle.loads(pickle.dumps(build(instructors, 20, rng=random.Random(9), compact=True)))
+        assert "classes" not in compact
+        assert scheduler.expand_option(compact) == full
+
+def test_simulation_overlay_reports_conflicts_without_touching_snapshot():
+    from schedule_simulation import TimetableSnapshot
+    rows = [
+        {"id": 1, "courseCode": "CSE101", "section": "01", "faculty": "A", "room": "NAC210", "days": "ST", "time": "08:00 AM - 09:30 AM"},
+        {"id": 2, "courseCode": "CSE102", "section": "01", "faculty": "B", "room": "NAC302", "days": "ST", "time": "08:00 AM - 09:30 AM"},
+        {"id": 3, "courseCode": "CSE101", "section": "02", "faculty": "A", "room": "NAC210", "days": "ST", "time": "02:40 PM - 04:10 PM"}
+    ]
+    snapshot = TimetableSnapshot(rows)
+    overlay = snapshot.overlay()
+    overlay.apply({"op": "move", "id": 2, "room": "NAC210"})
+    assert [(c["type"], c["classId"], c["withClassId"]) for c in overlay.conflicts()] == [("room", 2, 1)]
+    assert snapshot.classes[2]["room"] == "NAC302"
+
+    overlay = snapshot.overlay()
+    overlay.apply({"op": "move", "id": 3, "time": "09:40 AM - 11:10 AM"})   # closes A's idle gap
+    overlay.apply({"op": "swap", "ids": [1, 2]})
+    overlay.apply({"op": "delete", "id": 2})
+    assert overlay.conflicts() == []
+    before, after, delta = overlay.score_delta()
+    assert delta["gapMinutes"] < 0 and delta["total"] == round(after["total"] - before["total"], 2)
+    with pytest.raises(ValueError):
+        overlay.apply({"op": "move", "id": 99, "room": "NAC210"})
+    for bad in ({"op": "move", "id": 1, "time": "sometime"}, {"op": "move", "id": 1, "room": "ROOM-X"},
+                {"op": "move", "room": "NAC210"}, {"op": "delete"}, {"op": "swap", "ids": 1}, ["move", 1]):
+        with pytest.raises(ValueError):
+            overlay.apply(bad)
+
+    # Simulated and batch-checked slots are probed, never added to the shared table
+    interned = len(scheduler.SLOT_TABLE.slots)
+    overlay = snapshot.overlay()
+    overlay.apply({"op": "move", "id": 3, "days": "RA", "time": "07:05 AM - 07:55 AM", "room": "NAC302"})
+    overlay.conflicts()
+    overlay.score_delta()
+    assert len(scheduler.SLOT_TABLE.slots) == interned
+
+def test_conflict_index_finds_true_overlaps_and_tracks_writes():
+    from conflict_index import ConflictIndex
+    index = ConflictIndex()
+    index.load([
+        {"id": 1, "courseCode": "CSE101", "faculty": "A", "room": "NAC210", "days": "ST", "time": "09:40 AM - 11:10 AM"},
+        {"id": 2, "courseCode": "CSE101L", "faculty": "A", "room": "LIB601", "days": "M", "time": "08:00 AM - 11:10 AM"}
+    ])
+    assert [c["id"] for c in index.conflicts("faculty", "A", "S", "08:00 AM - 11:10 AM")] == [1]
+    assert [c["id"] for c in index.conflicts("faculty", "A", "MW", "11:00 AM - 12:30 PM")] == [2]
+    assert index.conflicts("faculty", "A", "S", "08:00 AM - 11:10 AM", exclude=1) == []
+    assert index.conflicts("room", "NAC210", "RA", "09:40 AM - 11:10 AM") == []
+
+    index.put({"id": 1, "courseCode": "CSE101", "faculty": "B", "room": "NAC210", "days": "ST", "time": "09:40 AM - 11:10 AM"})
+    assert index.conflicts("faculty", "A", "T", "09:40 AM - 11:10 AM") == []
+    index.remove(2)
+    assert index.conflicts("faculty", "A", "M", "08:00 AM - 09:30 AM") == []
+    assert index.unions["faculty"]["A"] == 0
+
+def test_request_slots_are_validated_and_never_interned():
+    from conflict_index import ConflictIndex
+    from scheduler import validate_slot
+    for days, time_slot in (("XY", "08:00 AM - 09:30 AM"), ("SS", "08:00 AM - 09:30 AM"),
+                            ("S", "whenever"), ("S", "09:30 AM - 08:00 AM"), ("S", "13:00 PM - 02:00 PM")):
+        with pytest.raises(ValueError):
+            validate_slot(days, time_slot)
+    validate_slot("ST", "08:00 AM - 09:30 AM")
+
+    table = SlotTable(rooms=["NAC210"])
+    table.mask("ST", "08:00 AM - 09:30 AM")
+    index = ConflictIndex(table)
+    index.load([{"id": 1, "courseCode": "CSE101", "faculty": "A", "room": "NAC210", "days": "ST", "time": "08:00 AM - 09:30 AM"}])
+    for minute in range(0, 50, 5):
+        assert [c["id"] for c in index.conflicts("faculty", "A", "S", f"08:{minute:02d} AM - 10:00 AM")] == [1]
+    assert len(table.slots) == 1
+    assert table.probe_mask("S", "08:00 AM - 09:30 AM") == SlotTable().mask("S", "08:00 AM - 09:30 AM")
+
+def test_request_strings_never_grow_the_shared_slot_table():
+    shared = (len(SLOT_TABLE.slots), len(SLOT_TABLE.times), len(SLOT_TABLE.rooms))
+    instructors = make_instructors(4, has_lab=True)
+    instructors[0].update(preferredDays=["S"], availableTimes=["07:05 AM - 07:55 AM"], labDays=["MW"], labTimes=["06:00 PM - 09:00 PM"])
+    for engine in ("greedy", "csp"):
+        options, _ = generate_options(instructors, 8, num_options=2, seed=1, engine=engine, time_budget_ms=5)
+        assert_no_overlaps(options[0]["classes"])
+    assert any(c["time"] == "07:05 AM - 07:55 AM" for c in options[0]["classes"])
+    repair_option(options[0], instructors, {"updateInstructors": [dict(instructors[1], availableTimes=["07:10 PM - 08:40 PM"])]})
+    assert (len(SLOT_TABLE.slots), len(SLOT_TABLE.times), len(SLOT_TABLE.rooms)) == shared
+    with pytest.raises(RuntimeError):
+        SLOT_TABLE.slot_id("S", "07:05 AM - 07:55 AM")
+    assert SLOT_TABLE.mask("S", "07:05 AM - 07:55 AM") == SLOT_TABLE.scoped().mask("S", "07:05 AM - 07:55 AM") != 0
+
+def test_conflict_index_checks_candidates_in_one_batch():
+    from conflict_index import ConflictIndex
+    index = ConflictIndex()
+    index.load([{"id": 1, "courseCode": "CSE101", "faculty": "A", "room": "NAC210", "days": "ST", "time": "08:00 AM - 09:30 AM"}])
+    results = index.check_batch([
+        {"instructorName": "B", "room": "NAC210", "days": "S", "timeSlot": "08:00 AM - 09:30 AM"},
+        {"instructorName": "A", "room": "NAC302", "days": "MW", "timeSlot": "08:00 AM - 09:30 AM"},
+        {"instructorName": "A", "room": "NAC210", "days": "ST", "timeSlot": "08:00 AM - 09:30 AM", "excludeClassId": 1},
+        {"room": "NAC210"},
+        {"instructorName": "A", "days": "ST", "timeSlot": "8 to 9:30"}
+    ])
+    assert [(r.get("available"), len(r.get("instructorConflicts", [])), len(r.get("roomConflicts", []))) for r in results[:3]] == [
+        (False, 0, 1), (True, 0, 0), (True, 0, 0)
+    ]
+    assert "error" in results[3] and "error" in results[4]
+
+def test_batch_candidates_with_non_string_fields_are_rejected():
+    from conflict_index import validate_candidate
+    candidate = {"instructorName": "A", "days": "ST", "timeSlot": "08:00 AM - 09:30 AM", "excludeClassId": "7"}
+    validate_candidate(candidate)
+    assert candidate["excludeClassId"] == 7
+    for bad in ({"instructorName": ["A"]}, {"room": 210}, {"days": {"S": 1}}, {"timeSlot": 8},
+                {"excludeClassId": 1.5}, {"excludeClassId": True}):
+        with pytest.raises(ValueError):
+            validate_candidate(dict(candidate, **bad))
+    with pytest.raises(ValueError):
+        validate_candidate("ST 08:00")